@@ -8,15 +8,19 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import print_function, unicode_literals, absolute_import
 
 from collections import namedtuple
+import copy
 import json
 import logging
 import os
 import os.path
 import stat
 import sys
+import threading
+import time
 import warnings
 import getpass
 from functools import wraps
+from multiprocessing.pool import ThreadPool
 from contextlib import contextmanager
 from types import GeneratorType
 
@@ -35,6 +39,7 @@ from osbs.build.plugins_configuration import (
     SourceContainerPluginsConfiguration,
 )
 from osbs.build.build_response import BuildResponse
+from osbs.build.plugins_cache import PluginsConfigurationCache
 from osbs.build.pod_response import PodResponse
 from osbs.build.config_map_response import ConfigMapResponse
 from osbs.constants import (BUILD_RUNNING_STATES, WORKER_OUTER_TEMPLATE,
@@ -47,10 +52,14 @@ from osbs.constants import (BUILD_RUNNING_STATES, WORKER_OUTER_TEMPLATE,
                             ORCHESTRATOR_SOURCES_OUTER_TEMPLATE,
                             USER_PARAMS_KIND_IMAGE_BUILDS,
                             USER_PARAMS_KIND_SOURCE_CONTAINER_BUILDS,
+                            RESTORE_WORKERS, BACKUP_RESOURCES, WATCH_DELETED, WATCH_ERROR,
                             )
 from osbs.core import Openshift
 from osbs.exceptions import (OsbsException, OsbsValidationException, OsbsResponseException,
                              OsbsOrchestratorNotEnabled)
+from osbs.utils.git_mirror import GitMirrorCache
+from osbs.utils.repo_cache import RepoInfoCache
+from osbs.utils.token_cache import OAuthTokenCache
 from osbs.utils.labels import Labels
 # import utils in this way, so that we can mock standalone functions with flexmock
 from osbs import utils
@@ -60,6 +69,34 @@ from six.moves import http_client, input
 
 
 # Decorator for API methods.
+@contextmanager
+def _osbs_exceptions():
+    try:
+        yield
+    except OsbsException:
+        # Re-raise OsbsExceptions
+        raise
+    except Exception as ex:
+        # Propogate flexmock errors immediately (used in test cases)
+        if getattr(ex, '__module__', None) == 'flexmock':
+            raise
+
+        # Convert anything else to OsbsException
+
+        # Python 3 has implicit exception chaining and enhanced
+        # reporting, so you get the original traceback as well as
+        # the one originating here.
+        # For Python 2, let's do that explicitly.
+        raise OsbsException(cause=ex, traceback=sys.exc_info()[2])
+
+
+def _catch_generator_exceptions(generator):
+    # generators raise while being iterated, not when they are called
+    with _osbs_exceptions():
+        for item in generator:
+            yield item
+
+
 def osbsapi(func):
     @wraps(func)
     def catch_exceptions(*args, **kwargs):
@@ -67,23 +104,11 @@ def osbsapi(func):
         if kwargs.pop("namespace", None):
             warnings.warn("OSBS.%s: the 'namespace' argument is no longer supported" %
                           func.__name__)
-        try:
-            return func(*args, **kwargs)
-        except OsbsException:
-            # Re-raise OsbsExceptions
-            raise
-        except Exception as ex:
-            # Propogate flexmock errors immediately (used in test cases)
-            if getattr(ex, '__module__', None) == 'flexmock':
-                raise
-
-            # Convert anything else to OsbsException
-
-            # Python 3 has implicit exception chaining and enhanced
-            # reporting, so you get the original traceback as well as
-            # the one originating here.
-            # For Python 2, let's do that explicitly.
-            raise OsbsException(cause=ex, traceback=sys.exc_info()[2])
+        with _osbs_exceptions():
+            result = func(*args, **kwargs)
+        if isinstance(result, GeneratorType):
+            return _catch_generator_exceptions(result)
+        return result
 
     return catch_exceptions
 
@@ -140,8 +165,12 @@ class OSBS(object):
                             use_auth=self.os_conf.get_use_auth(),
                             verify_ssl=self.os_conf.get_verify_ssl(),
                             token=self.os_conf.get_oauth2_token(),
-                            namespace=self.os_conf.get_namespace())
+                            namespace=self.os_conf.get_namespace(),
+                            list_page_size=self.os_conf.get_list_page_size(),
+                            token_cache=self._get_oauth_token_cache())
         self._bm = None
+        # EntryCache subclass -> instance
+        self._entry_caches = {}
 
     @osbsapi
     def list_builds(self, field_selector=None, koji_task_id=None, running=None,
@@ -153,6 +182,22 @@ class OSBS(object):
         :param koji_task_id: str, only list builds for Koji Task ID
         :return: BuildResponse list
         """
+        return list(self.iter_builds(field_selector=field_selector, koji_task_id=koji_task_id,
+                                     running=running, labels=labels))
+
+    @osbsapi
+    def iter_builds(self, field_selector=None, koji_task_id=None, running=None,
+                    labels=None, page_size=None):
+        """
+        Iterate over builds with matching fields, they are requested from
+        the server in chunks as the iteration proceeds
+
+        :param field_selector: str, field selector for Builds
+        :param koji_task_id: str, only list builds for Koji Task ID
+        :param page_size: int, number of builds requested at once,
+                          see Configuration.get_list_page_size()
+        :return: generator of BuildResponse
+        """
 
         if running:
             running_fs = ",".join(["status!={status}".format(status=status.capitalize())
@@ -161,14 +206,11 @@ class OSBS(object):
                 field_selector = running_fs
             else:
                 field_selector = ','.join([field_selector, running_fs])
-        response = self.os.list_builds(field_selector=field_selector,
-                                       koji_task_id=koji_task_id, labels=labels)
-        serialized_response = response.json()
-        build_list = []
-        for build in serialized_response["items"]:
-            build_list.append(BuildResponse(build, self))
-
-        return build_list
+        builds = self.os.iter_items(self.os.list_builds, page_size=page_size,
+                                    field_selector=field_selector,
+                                    koji_task_id=koji_task_id, labels=labels)
+        for build in builds:
+            yield BuildResponse(build, self)
 
     def watch_builds(self, field_selector=None):
         kwargs = {}
@@ -195,9 +237,9 @@ class OSBS(object):
         """
         :return: PodResponse object for pod relating to the build
         """
-        pods = self.os.list_pods(label='openshift.io/build.name=%s' % build_id)
-        serialized_response = pods.json()
-        pod_list = [PodResponse(pod) for pod in serialized_response["items"]]
+        pods = self.os.iter_items(self.os.list_pods,
+                                  label='openshift.io/build.name=%s' % build_id)
+        pod_list = [PodResponse(pod) for pod in pods]
         if not pod_list:
             raise OsbsException("No pod for build")
         elif len(pod_list) != 1:
@@ -288,7 +330,8 @@ class OSBS(object):
         return build_response
 
     def _get_running_builds_for_build_config(self, build_config_id):
-        all_builds_for_bc = self.os.list_builds(build_config_id=build_config_id).json()['items']
+        all_builds_for_bc = self.os.iter_items(self.os.list_builds,
+                                               build_config_id=build_config_id)
         running = []
         for b in all_builds_for_bc:
             br = BuildResponse(b, self)
@@ -297,7 +340,8 @@ class OSBS(object):
         return running
 
     def _get_not_cancelled_builds_for_koji_task(self, koji_task_id):
-        all_builds_for_task = self.os.list_builds(koji_task_id=koji_task_id).json()['items']
+        all_builds_for_task = self.os.iter_items(self.os.list_builds,
+                                                 koji_task_id=koji_task_id)
         not_cancelled = []
 
         for b in all_builds_for_task:
@@ -490,9 +534,31 @@ class OSBS(object):
 
         return image_stream_json, image_stream_tag_name, docker_image_repo, insecure
 
+    def _patch_build_config(self, build_config_name, original_bc, updated_bc):
+        """
+        send changes of a BuildConfig as a JSON merge patch, so that concurrent
+        updates of other parts of the BuildConfig don't cause conflicts
+
+        :param build_config_name: str, name of the BuildConfig
+        :param original_bc: dict, BuildConfig as fetched from the server
+        :param updated_bc: dict, BuildConfig with changes applied
+        :return: bool, whether the BuildConfig was changed
+        """
+        if (utils.normalize_build_config(original_bc) ==
+                utils.normalize_build_config(updated_bc)):
+            logger.debug('build config %s is up to date, not updating', build_config_name)
+            return False
+
+        patch = utils.json_merge_patch(original_bc, updated_bc)
+        logger.debug('patching build config %s: %s', build_config_name, patch)
+        self.os.patch_build_config(build_config_name, json.dumps(patch))
+        return True
+
     @retry_on_conflict
-    def _update_build_config_when_exist(self, build_json):
+    def _update_build_config_when_exist(self, build_json, triggers=None):
         existing_bc = self._get_existing_build_config(build_json)
+        original_bc = copy.deepcopy(existing_bc)
+        existing_triggers = existing_bc['spec'].get('triggers')
         self._verify_labels_match(build_json, existing_bc)
         # Existing build config may have a different name if matched by
         # git-repo-name and git-branch labels. Continue using existing
@@ -517,19 +583,31 @@ class OSBS(object):
         # Reset name change that may have occurred during
         # update above, since renaming is not supported.
         existing_bc['metadata']['name'] = build_config_name
+
+        # Triggers are removed until ImageStreamTag is configured. With an
+        # ImageStream, the caller passes no triggers, so they are always
+        # removed here and added back later: two writes per resubmission.
+        # Only triggers without an ImageStreamTag are passed, those are kept
+        # when the same ones are in place already, so without a new
+        # koji-task-id nothing is written.
+        if triggers and (utils.normalize_triggers(existing_triggers) ==
+                         utils.normalize_triggers(triggers)):
+            logger.debug('keeping unchanged triggers of build config %s', build_config_name)
+            existing_bc['spec']['triggers'] = existing_triggers
         logger.debug('build config for %s already exists, updating...',
                      build_config_name)
 
-        self.os.update_build_config(build_config_name, json.dumps(existing_bc))
+        self._patch_build_config(build_config_name, original_bc, existing_bc)
         return existing_bc
 
     @retry_on_conflict
     def _update_build_config_with_triggers(self, build_json, triggers, is_autorebuild=False):
         existing_bc = self._get_existing_build_config(build_json)
+        original_bc = copy.deepcopy(existing_bc)
         existing_bc['spec']['triggers'] = triggers
         build_config_name = existing_bc['metadata']['name']
         existing_bc['metadata']['labels']['is_autorebuild'] = "true" if is_autorebuild else "false"
-        self.os.update_build_config(build_config_name, json.dumps(existing_bc))
+        self._patch_build_config(build_config_name, original_bc, existing_bc)
         return existing_bc
 
     def _create_build_config_and_build(self, build_request):
@@ -550,7 +628,10 @@ class OSBS(object):
 
         if original_bc:
             build_config_name = original_bc['metadata']['name']
-            existing_bc = self._update_build_config_when_exist(build_json)
+            # an ImageChange trigger which stays in place would fire a build on
+            # its own when ensure_image_stream_tag() imports a new parent image
+            existing_bc = self._update_build_config_when_exist(
+                build_json, None if image_stream else triggers)
 
         else:
             logger.debug("build config for %s doesn't exist, creating...",
@@ -710,6 +791,37 @@ class OSBS(object):
 
         return req_labels
 
+    def _get_oauth_token_cache(self):
+        cache_dir = self.os_conf.get_oauth_token_cache_dir()
+        if not cache_dir:
+            return None
+        return OAuthTokenCache(os.path.join(cache_dir,
+                                            '{}.oauth.json'.format(self.os_conf.conf_section)))
+
+    def _get_git_mirror_cache(self):
+        cache_dir = self.os_conf.get_git_mirror_cache_dir()
+        if not cache_dir:
+            return None
+        return GitMirrorCache(cache_dir, max_size=self.os_conf.get_git_mirror_cache_max_size())
+
+    def _get_repo_info_cache(self):
+        cache_dir = self.os_conf.get_repo_info_cache_dir()
+        if not cache_dir:
+            return None
+        return self._get_entry_cache(RepoInfoCache, cache_dir)
+
+    def _get_entry_cache(self, cache_class, cache_dir):
+        """
+        :param cache_class: EntryCache subclass
+        :param cache_dir: str, directory of the cache, None to keep entries in memory only
+        :return: cache_class instance, the same one while cache_dir doesn't
+                 change, so its in-memory entries are kept
+        """
+        cache = self._entry_caches.get(cache_class)
+        if cache is None or cache.cache_dir != cache_dir:
+            cache = self._entry_caches[cache_class] = cache_class(cache_dir)
+        return cache
+
     # Gives flexmock something to mock
     def get_user_params(self, component=None, req_labels=None, **kwargs):
         req_labels = req_labels or {}
@@ -754,8 +866,15 @@ class OSBS(object):
         if not git_branch:
             raise OsbsValidationException("required argument 'git_branch' can't be None")
 
+        repo_info_kwargs = {}
+        mirror_cache = self._get_git_mirror_cache()
+        if mirror_cache:
+            repo_info_kwargs['mirror_cache'] = mirror_cache
+        repo_info_cache = self._get_repo_info_cache()
+        if repo_info_cache:
+            repo_info_kwargs['repo_info_cache'] = repo_info_cache
         repo_info = utils.get_repo_info(git_uri, git_ref, git_branch=git_branch,
-                                        depth=git_commit_depth)
+                                        depth=git_commit_depth, **repo_info_kwargs)
 
         if flatpak and not repo_info.configuration.is_flatpak:
             raise OsbsException(
@@ -1104,6 +1223,19 @@ class OSBS(object):
     def set_annotations_on_build(self, build_id, annotations):
         return self.os.set_annotations_on_build(build_id, annotations)
 
+    @osbsapi
+    def update_metadata_on_builds(self, metadata_by_build, replace=False):
+        """
+        update labels and annotations of many builds concurrently
+
+        :param metadata_by_build: dict, build id -> dict with 'labels' and/or
+                                  'annotations' to set on the build
+        :param replace: bool, replace the whole labels or annotations
+                        instead of updating them
+        :return: dict, build id -> HttpResponse
+        """
+        return self.os.patch_metadata_on_objects('builds', metadata_by_build, replace=replace)
+
     @osbsapi
     def import_image_tags(self, name, tags, repository, insecure=False):
         """Import image tags from specified container repository.
@@ -1250,26 +1382,85 @@ class OSBS(object):
         return quota_json['metadata']['name'], quota_json
 
     @osbsapi
-    def pause_builds(self, quota_name=None):
+    def pause_builds(self, quota_name=None, timeout=None):
+        """
+        Stop new builds from being started and wait for the running ones to finish
+
+        :param quota_name: str, name of the resource quota allowing 0 pods
+        :param timeout: int, seconds to wait for the running builds, forever when None
+        :raises OsbsException: when some builds are still running after timeout;
+                               the quota is not removed, see resume_builds()
+        """
         # First, set quota so 0 pods are allowed to be running
         quota_name, quota_json = self._load_quota_json(quota_name)
         self.os.create_resource_quota(quota_name, quota_json)
 
         # Now wait for running builds to finish
-        while True:
-            field_selector = ','.join(['status=%s' % status.capitalize()
-                                       for status in BUILD_RUNNING_STATES])
-            builds = self.list_builds(field_selector)
-
-            # Double check builds are actually in running state.
-            running_builds = [build for build in builds if build.is_running()]
+        self._wait_for_running_builds(timeout)
 
-            if not running_builds:
-                break
+    def _list_running_builds(self):
+        """
+        :return: tuple, set of names of running builds and resourceVersion of the list
+        """
+        field_selector = ','.join(['status=%s' % status.capitalize()
+                                   for status in BUILD_RUNNING_STATES])
+        running = set()
+        resource_version = None
+        for page in self.os.iter_pages(self.os.list_builds, field_selector=field_selector):
+            if resource_version is None:
+                resource_version = (page.get('metadata') or {}).get('resourceVersion')
+            for build in page.get('items') or []:
+                # Double check builds are actually in running state.
+                if BuildResponse(build, self).is_running():
+                    running.add(build['metadata']['name'])
+        return running, resource_version
+
+    def _wait_for_running_builds(self, timeout=None):
+        """
+        Follow a single watch of all builds until every build running now finishes
 
-            name = running_builds[0].get_build_name()
-            logger.info("waiting for build to finish: %s", name)
-            self.wait_for_build_to_finish(name)
+        :param timeout: int, seconds to wait, forever when None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        running, resource_version = self._list_running_builds()
+
+        while running:
+            logger.info("waiting for %d builds to finish: %s",
+                        len(running), ', '.join(sorted(running)))
+            watch_args = {}
+            if resource_version:
+                # don't miss builds which finished since listing them
+                watch_args['resourceVersion'] = resource_version
+            if deadline is not None:
+                remaining_time = deadline - time.time()
+                if remaining_time <= 0:
+                    raise OsbsException("%d builds still running after %ss: %s" %
+                                        (len(running), timeout, ', '.join(sorted(running))))
+                # the server ends the watch by the deadline
+                watch_args['timeoutSeconds'] = int(remaining_time) + 1
+
+            for changetype, obj in self.os.watch_resource("builds", reconnect=False,
+                                                          **watch_args):
+                if changetype == WATCH_ERROR:
+                    # most likely, resourceVersion is too old to watch from
+                    logger.debug("watch failed, listing builds again: %s", obj.get('message'))
+                    still_running, resource_version = self._list_running_builds()
+                    running &= still_running
+                    break
+
+                metadata = obj.get('metadata') or {}
+                resource_version = metadata.get('resourceVersion') or resource_version
+                name = metadata.get('name')
+                if name not in running:
+                    continue
+                phase = ((obj.get('status') or {}).get('phase') or '').lower()
+                if changetype == WATCH_DELETED or phase in BUILD_FINISHED_STATES:
+                    running.discard(name)
+                    logger.info("build %s is %s, %d builds remaining", name,
+                                phase if phase in BUILD_FINISHED_STATES else changetype,
+                                len(running))
+                    if not running:
+                        break
 
     @osbsapi
     def resume_builds(self, quota_name=None):
@@ -1282,28 +1473,176 @@ class OSBS(object):
         utils.graceful_chain_del(resource, 'metadata', 'resourceVersion')
 
     @osbsapi
-    def dump_resource(self, resource_type):
-        return self.os.dump_resource(resource_type).json()
+    def get_snapshot_resource_version(self):
+        """
+        Find the current resourceVersion, which all resource types can be
+        dumped at to get a consistent snapshot without pausing builds
+
+        :return: str, resourceVersion
+        """
+        response = self.os.dump_resource(BACKUP_RESOURCES[0], limit=1)
+        return response.json()['metadata']['resourceVersion']
+
+    def _iter_resource_pages(self, resource_type, page_size, resource_version):
+        pages = self.os.iter_pages(self.os.dump_resource, page_size=page_size,
+                                   resource_type=resource_type,
+                                   resource_version=resource_version)
+        try:
+            for page in pages:
+                # servers which don't know resourceVersionMatch return the
+                # latest version instead; graceful_chain_get() would copy the page
+                listed_version = (page.get('metadata') or {}).get('resourceVersion')
+                if resource_version and listed_version != resource_version:
+                    raise OsbsException("%s listed at resourceVersion %s instead of %s, "
+                                        "the server doesn't support snapshots" %
+                                        (resource_type, listed_version, resource_version))
+                yield page
+        except OsbsResponseException as ex:
+            if resource_version and ex.status_code == http_client.GONE:
+                raise OsbsException("resourceVersion %s of the snapshot is too old, "
+                                    "dumping %s took too long" %
+                                    (resource_version, resource_type),
+                                    cause=ex, traceback=sys.exc_info()[2])
+            raise
+
+    @osbsapi
+    def dump_resource(self, resource_type, page_size=None, resource_version=None):
+        """
+        :param resource_type: str, one of BACKUP_RESOURCES
+        :param page_size: int, number of resources requested at once,
+                          see Configuration.get_list_page_size()
+        :param resource_version: str, dump the resources as they were at this
+                                 resourceVersion, see get_snapshot_resource_version()
+        :return: dict, list of all resources of the type
+        """
+        resources = None
+        for page in self._iter_resource_pages(resource_type, page_size, resource_version):
+            if resources is None:
+                resources = page
+            else:
+                resources['items'].extend(page.get('items') or [])
+        # the list is complete, there's nothing to continue with
+        for key in ('continue', 'remainingItemCount'):
+            utils.graceful_chain_del(resources, 'metadata', key)
+        return resources
 
     @osbsapi
-    def restore_resource(self, resource_type, resources, continue_on_error=False):
-        nfailed = 0
-        for r in resources["items"]:
-            name = utils.graceful_chain_get(r, 'metadata', 'name') or '(no name)'
-            logger.debug("restoring %s/%s", resource_type, name)
+    def dump_resource_to_file(self, resource_type, fileobj, page_size=None,
+                              resource_version=None, manifest=None, since=None):
+        """
+        Write the same list as dump_resource() returns to a file, as JSON;
+        only one page of resources is held in memory at a time
+
+        :param resource_type: str, one of BACKUP_RESOURCES
+        :param fileobj: file, opened for writing bytes
+        :param page_size: int, number of resources requested at once,
+                          see Configuration.get_list_page_size()
+        :param resource_version: str, dump the resources as they were at this
+                                 resourceVersion, see get_snapshot_resource_version()
+        :param manifest: list, utils.make_manifest_entry() of every listed
+                         resource is appended to it, including skipped ones
+        :param since: set, (uid, resourceVersion) of resources which are not
+                      written, because an earlier backup contains them already
+        :return: int, number of resources written
+        """
+        count = 0
+        first_page = True
+        kind = None
+        for page in self._iter_resource_pages(resource_type, page_size, resource_version):
+            if first_page:
+                first_page = False
+                # the rest of the first page describes the whole list; the page
+                # itself must not be modified, iter_pages() reads the continue token
+                header = dict((key, value) for key, value in page.items() if key != 'items')
+                if isinstance(header.get('metadata'), dict):
+                    header['metadata'] = dict(
+                        (key, value) for key, value in header['metadata'].items()
+                        if key not in ('continue', 'remainingItemCount'))
+                header = json.dumps(header)[:-1]
+                if header != '{':
+                    header += ', '
+                fileobj.write((header + '"items": [').encode('ascii'))
+                # items of lists don't say what they are
+                kind = page.get('kind', '')
+                if kind.endswith('List'):
+                    kind = kind[:-len('List')]
+            for item in page.get('items') or []:
+                if manifest is not None:
+                    manifest.append(utils.make_manifest_entry(resource_type, kind, item))
+                if since and utils.get_manifest_version(item) in since:
+                    continue
+                separator = ', ' if count else ''
+                fileobj.write((separator + json.dumps(item)).encode('ascii'))
+                count += 1
+        fileobj.write(b']}')
+        return count
+
+    @osbsapi
+    def restore_resource(self, resource_type, resources, continue_on_error=False,
+                         checkpoint=None, max_workers=RESTORE_WORKERS):
+        """
+        Create resources from a backup, up to max_workers of them at a time
+
+        :param resource_type: str, one of BACKUP_RESOURCES
+        :param resources: dict, list of resources as returned by dump_resource(),
+                          or an iterable of resources, which is consumed only as
+                          fast as the resources are created
+        :param continue_on_error: bool, log failures and continue with other resources
+        :param checkpoint: utils.Checkpoint, resources recorded in it are skipped
+                           and restored ones are added to it
+        :param max_workers: int, maximum number of resources created concurrently
+        :return: int, number of resources which failed to be restored
+        """
+        if isinstance(resources, dict):
+            resources = resources["items"]
+
+        failures = []
+        # bounds the requests in flight as well as the resources read ahead
+        slots = threading.BoundedSemaphore(max_workers)
+
+        def restore(resource, name):
             try:
-                self._prepare_resource(r)
-                self.os.restore_resource(resource_type, r)
-            except Exception:
+                self._prepare_resource(resource)
+                self.os.restore_resource(resource_type, resource)
+            except Exception as exc:
                 if continue_on_error:
                     logger.exception("failed to restore %s/%s", resource_type, name)
-                    nfailed += 1
-                else:
-                    raise
+                failures.append(exc)
+            else:
+                if checkpoint is not None and name is not None:
+                    checkpoint.add('%s/%s' % (resource_type, name))
+            finally:
+                slots.release()
 
-        if continue_on_error:
-            ntotal = len(resources["items"])
-            logger.info("restored %s/%s %s", ntotal - nfailed, ntotal, resource_type)
+        ntotal = nskipped = 0
+        pool = ThreadPool(max_workers)
+        try:
+            for r in resources:
+                ntotal += 1
+                name = utils.graceful_chain_get(r, 'metadata', 'name')
+                if checkpoint is not None and '%s/%s' % (resource_type, name) in checkpoint:
+                    logger.debug("skipping %s/%s, restored before", resource_type, name)
+                    nskipped += 1
+                    continue
+
+                slots.acquire()
+                if failures and not continue_on_error:
+                    slots.release()
+                    break
+                logger.debug("restoring %s/%s", resource_type, name or '(no name)')
+                pool.apply_async(restore, (r, name))
+        finally:
+            # let the requests in flight finish, so that they are checkpointed
+            pool.close()
+            pool.join()
+
+        if failures and not continue_on_error:
+            raise failures[0]
+
+        if continue_on_error or nskipped:
+            logger.info("restored %s/%s %s, %s of them before", ntotal - len(failures),
+                        ntotal, resource_type, nskipped)
+        return len(failures)
 
     @osbsapi
     def list_resource_quotas(self):
@@ -1376,15 +1715,36 @@ class OSBS(object):
         yield
         self.os.retries_enabled = True
 
+    def _get_plugins_configuration_cache(self):
+        cache_dir = self.os_conf.get_plugins_configuration_cache_dir()
+        return self._get_entry_cache(PluginsConfigurationCache, cache_dir)
+
     @osbsapi
     def render_plugins_configuration(self, user_params_json):
+        """
+        render plugins configuration for user params
+
+        Rendered configurations are cached by user params and content of
+        the templates, see PluginsConfigurationCache.
+
+        :param user_params_json: str, user params of the build
+        :return: str, plugins configuration JSON
+        """
         user_params = load_user_params_from_json(user_params_json)
 
         if user_params.KIND == USER_PARAMS_KIND_IMAGE_BUILDS:
-            return PluginsConfiguration(user_params).render()
+            plugins_configuration = PluginsConfiguration(user_params)
         elif user_params.KIND == USER_PARAMS_KIND_SOURCE_CONTAINER_BUILDS:
-            return SourceContainerPluginsConfiguration(user_params).render()
+            plugins_configuration = SourceContainerPluginsConfiguration(user_params)
         else:
             raise RuntimeError(
                 "Unexpected user params kind: {}".format(user_params.KIND)
             )
+
+        cache = self._get_plugins_configuration_cache()
+        key = cache.make_key(user_params, plugins_configuration.pt.source_paths)
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = plugins_configuration.render()
+            cache.put(key, rendered)
+        return rendered
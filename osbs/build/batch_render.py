@@ -0,0 +1,142 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+Offline rendering of build JSON and plugins configuration for many
+user params records at once, without access to the cluster.
+"""
+from __future__ import print_function, absolute_import, unicode_literals
+
+import copy
+import json
+import logging
+import multiprocessing
+
+from osbs.build.build_requestv2 import BuildRequestV2, SourceBuildRequest
+from osbs.build.plugins_configuration import (PluginsConfiguration,
+                                              SourceContainerPluginsConfiguration)
+from osbs.build.user_params import load_user_params_from_json
+from osbs.constants import (USER_PARAMS_KIND_IMAGE_BUILDS,
+                            USER_PARAMS_KIND_SOURCE_CONTAINER_BUILDS)
+from osbs.utils.yaml import safe_load
+
+
+logger = logging.getLogger(__name__)
+
+# records sent to a worker process at once
+BATCH_RENDER_CHUNKSIZE = 16
+
+
+class LocalReactorConfig(object):
+    """
+    Stand-in for the OSBS API object used by build requests,
+    it serves reactor config from a local file instead of the config map
+    """
+
+    def __init__(self, reactor_config_data):
+        """
+        :param reactor_config_data: dict, parsed reactor config
+        """
+        self.reactor_config_data = reactor_config_data or {}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(safe_load(f))
+
+    def get_config_map(self, name):  # pylint: disable=unused-argument
+        return self
+
+    def get_data_by_key(self, name):  # pylint: disable=unused-argument
+        # build requests modify data they get, every build gets its own copy
+        return copy.deepcopy(self.reactor_config_data)
+
+
+def render_user_params(user_params_json, reactor_config, build_json_dir=None):
+    """
+    render build JSON and plugins configuration for user params
+
+    :param user_params_json: str, user params as serialized by to_json()
+    :param reactor_config: LocalReactorConfig, used for builds referring
+                           to reactor config map
+    :param build_json_dir: str, optional directory with templates, overrides
+                           build_json_dir of user params
+    :return: dict, with 'build_json' and 'plugins_configuration' keys
+    """
+    user_params = load_user_params_from_json(user_params_json)
+    if build_json_dir:
+        user_params.build_json_dir = build_json_dir
+
+    if user_params.KIND == USER_PARAMS_KIND_IMAGE_BUILDS:
+        build_request = BuildRequestV2(reactor_config, user_params=user_params)
+        plugins_configuration_class = PluginsConfiguration
+    elif user_params.KIND == USER_PARAMS_KIND_SOURCE_CONTAINER_BUILDS:
+        build_request = SourceBuildRequest(reactor_config, user_params=user_params)
+        plugins_configuration_class = SourceContainerPluginsConfiguration
+    else:
+        raise RuntimeError("Unexpected user params kind: {}".format(user_params.KIND))
+
+    build_json = build_request.render()
+    # atomic-reactor gets user params updated by rendering of the build
+    plugins_configuration = plugins_configuration_class(build_request.user_params).render()
+    return {
+        'build_json': build_json,
+        'plugins_configuration': json.loads(plugins_configuration),
+    }
+
+
+_worker_args = None
+
+
+def _init_worker(reactor_config, build_json_dir):
+    global _worker_args  # pylint: disable=global-statement
+    _worker_args = (reactor_config, build_json_dir)
+
+
+def _render_record(record):
+    index, user_params_json = record
+    result = {'index': index}
+    try:
+        result.update(render_user_params(user_params_json, *_worker_args))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.debug("rendering record %d failed", index, exc_info=True)
+        result['error'] = '{}: {}'.format(type(exc).__name__, exc)
+    return result
+
+
+def render_batch(user_params_jsons, reactor_config, build_json_dir=None, processes=None):
+    """
+    render build JSON and plugins configuration for every user params record
+
+    Records are rendered in a pool of worker processes and results are
+    yielded in the order of records. Failures are reported per record,
+    they don't stop rendering of other records.
+
+    :param user_params_jsons: iterable of str, user params as serialized by to_json(),
+                              blank lines are skipped
+    :param reactor_config: LocalReactorConfig
+    :param build_json_dir: str, optional directory with templates
+    :param processes: int, number of worker processes, defaults to number of CPUs,
+                      1 renders in the current process
+    :return: generator of dicts with 'index' (0-based number of the record) and
+             either 'build_json' and 'plugins_configuration', or 'error'
+    """
+    records = ((index, line) for index, line in enumerate(user_params_jsons) if line.strip())
+
+    if processes == 1:
+        _init_worker(reactor_config, build_json_dir)
+        for record in records:
+            yield _render_record(record)
+        return
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                initargs=(reactor_config, build_json_dir))
+    try:
+        for result in pool.imap(_render_record, records, chunksize=BATCH_RENDER_CHUNKSIZE):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
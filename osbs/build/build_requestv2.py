@@ -12,8 +12,6 @@ import json
 import logging
 import re
 import os
-import yaml
-from pkg_resources import parse_version
 import six
 
 from osbs.build.user_params import (
@@ -26,8 +24,9 @@ from osbs.constants import (SECRETS_PATH, DEFAULT_OUTER_TEMPLATE,
                             BUILD_TYPE_WORKER, ISOLATED_RELEASE_FORMAT)
 from osbs.exceptions import OsbsException, OsbsValidationException
 from osbs.utils.labels import Labels
+from osbs.utils.yaml import safe_dump
 from osbs.utils import (git_repo_humanish_part_from_uri, sanitize_strings_for_openshift,
-                        RegistryURI, ImageName)
+                        RegistryURI, ImageName, parse_version)
 
 logger = logging.getLogger(__name__)
 
@@ -205,7 +204,7 @@ class BaseBuildRequest(object):
         if reactor_config_override:
             reactor_config = {
                 'name': 'REACTOR_CONFIG',
-                'value': yaml.safe_dump(reactor_config_override)
+                'value': safe_dump(reactor_config_override)
             }
         elif reactor_config_map:
             reactor_config = {
@@ -573,8 +572,9 @@ class BuildRequestV2(BaseBuildRequest):
 
             platform_ns = self.user_params.platform_node_selector
 
-            # platform nodeselector
+            # platform nodeselector, don't modify selector stored in user params
             if platform_ns:
+                node_selector = dict(node_selector or {})
                 node_selector.update(platform_ns)
             self.template['spec']['nodeSelector'] = node_selector
 
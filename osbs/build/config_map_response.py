@@ -7,16 +7,70 @@ of the BSD license. See the LICENSE file for details.
 """
 from __future__ import print_function, absolute_import, unicode_literals
 
+import copy
 import logging
 import json
-import yaml
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from osbs.utils import graceful_chain_get
+from osbs.utils.yaml import safe_load
 
 
 logger = logging.getLogger(__name__)
 
 
+def is_yaml(name):
+    return name.rsplit('.', 1)[-1] in ('yaml', 'yml')
+
+
+class ConfigMapData(Mapping):
+    """
+    Read-only mapping of ConfigMap data
+
+    Values are decoded from YAML or JSON, according to the key, when they
+    are accessed for the first time and then remembered. Every access
+    returns a new copy, so callers may modify it.
+    """
+
+    def __init__(self, data):
+        """
+        :param data: dict, key -> encoded value, as stored in the ConfigMap
+        """
+        self._raw = data
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        try:
+            value = self._decoded[key]
+        except KeyError:
+            raw = self._raw[key]
+            value = safe_load(raw) if is_yaml(key) else json.loads(raw)
+            self._decoded[key] = value
+        return copy.deepcopy(value)
+
+    def __contains__(self, key):
+        # don't decode the value just to find out it exists
+        return key in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def get_raw(self, key):
+        """
+        :param key: str
+        :return: str, value as stored in the ConfigMap, without decoding
+        :raises KeyError: when key is not in the ConfigMap
+        """
+        return self._raw[key]
+
+
 class ConfigMapResponse(object):
     """
     Wrapper for JSON describing a ConfigMap
@@ -27,15 +81,23 @@ class ConfigMapResponse(object):
         :param config_map: dict, data to be stored in the ConfigMap
         """
         self._json = config_map
+        self._data = None
 
     @property
     def json(self):
         return self._json
 
     def is_yaml(self, name):
-        if name.rsplit('.', 1)[-1] in ('yaml', 'yml'):
-            return True
-        return False
+        return is_yaml(name)
+
+    @property
+    def data(self):
+        """
+        :return: ConfigMapData, lazily decoded data of the ConfigMap
+        """
+        if self._data is None:
+            self._data = ConfigMapData(graceful_chain_get(self.json, "data") or {})
+        return self._data
 
     def get_data(self):
         """
@@ -43,18 +105,7 @@ class ConfigMapResponse(object):
 
         :return: dict, the json of the data data that was passed into the ConfigMap on creation
         """
-        data = graceful_chain_get(self.json, "data")
-        if data is None:
-            return {}
-
-        data_dict = {}
-        for key in data:
-            if self.is_yaml(key):
-                data_dict[key] = yaml.safe_load(data[key])
-            else:
-                data_dict[key] = json.loads(data[key])
-
-        return data_dict
+        return dict(self.data)
 
     def get_data_by_key(self, name):
         """
@@ -62,11 +113,19 @@ class ConfigMapResponse(object):
 
         :return: str or dict, the json of the str or dict stored in the ConfigMap at that location
         """
-        data = graceful_chain_get(self.json, "data")
-
-        if data is None or name not in data:
+        if name not in self.data:
             return {}
 
         if self.is_yaml(name):
-            return yaml.safe_load(data[name]) or {}
-        return json.loads(data[name])
+            return self.data[name] or {}
+        return self.data[name]
+
+    def get_raw_data_by_key(self, name):
+        """
+        Find the string stored in the ConfigMap at key 'name', without decoding it
+
+        :return: str, None when there is no such key
+        """
+        if name not in self.data:
+            return None
+        return self.data.get_raw(name)
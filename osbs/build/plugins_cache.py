@@ -0,0 +1,130 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import json
+import logging
+import os
+from hashlib import sha256
+
+from osbs.utils.cache import EntryCache
+from osbs.version import __version__
+
+
+logger = logging.getLogger(__name__)
+
+# bump when format of cached entries changes
+PLUGINS_CACHE_FORMAT = 1
+
+# (path, inode, size, mtime) -> digest of file content
+_file_digests = {}
+
+
+def file_digest(path):
+    """
+    :param path: str, path to file
+    :return: str, digest of file content, None if the file doesn't exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stat_key = (path, st.st_ino, st.st_size, st.st_mtime)
+    digest = _file_digests.get(stat_key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = sha256(f.read()).hexdigest()
+        _file_digests[stat_key] = digest
+    return digest
+
+
+class PluginsConfigurationCache(EntryCache):
+    """
+    Cache of rendered plugins configurations
+
+    Entries are keyed by serialized user params and content of the templates
+    they were rendered from.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=64, max_disk_entries=1024):
+        """
+        :param cache_dir: str, optional directory to store entries in
+        :param max_entries: int, number of entries kept in memory
+        :param max_disk_entries: int, number of entries kept in cache_dir,
+                                 least recently used ones are removed
+        """
+        super(PluginsConfigurationCache, self).__init__(cache_dir, max_entries)
+        self.max_disk_entries = max_disk_entries
+
+    @staticmethod
+    def make_key(user_params, template_paths):
+        """
+        :param user_params: BuildCommon, user params the configuration is rendered for
+        :param template_paths: list of str, files the configuration is rendered from
+        :return: str
+        """
+        data = [PLUGINS_CACHE_FORMAT, __version__, user_params.to_json()]
+        data.extend([path, file_digest(path)] for path in template_paths)
+        return sha256(json.dumps(data).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        :param key: str, see make_key()
+        :return: str, rendered plugins configuration, None if not cached;
+                 it is immutable, so callers can't modify cached entries
+        """
+        rendered = self._recall(key)
+        if rendered is None and self.cache_dir:
+            entry_path = self._entry_path(key)
+            try:
+                with open(entry_path) as f:
+                    rendered = f.read()
+                # mtime of the entry marks when it was used for the last time
+                os.utime(entry_path, None)
+            except (IOError, OSError):
+                pass
+            else:
+                self._remember(key, rendered)
+
+        if rendered is None:
+            logger.debug("plugins configuration %s not cached", key)
+        else:
+            logger.debug("using cached plugins configuration %s", key)
+        return rendered
+
+    def put(self, key, rendered):
+        """
+        :param key: str, see make_key()
+        :param rendered: str, rendered plugins configuration
+        """
+        self._remember(key, rendered)
+        if self.cache_dir and self._store(key, rendered):
+            self._evict()
+
+    def _evict(self):
+        """
+        remove least recently used entries from cache_dir over max_disk_entries
+        """
+        entries = []
+        for entry in os.listdir(self.cache_dir):
+            if not entry.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, entry)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                # removed by another process meanwhile
+                continue
+
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_disk_entries, 0)]:
+            logger.debug("evicting plugins configuration cache entry %s", path)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
@@ -11,6 +11,7 @@ import abc
 import logging
 import os
 import json
+from collections import OrderedDict
 
 import six
 
@@ -20,9 +21,63 @@ from osbs.exceptions import OsbsException
 logger = logging.getLogger(__name__)
 
 
+class PluginsPhase(object):
+    """
+    Ordered plugins of one phase, indexed by plugin name
+    """
+
+    def __init__(self, plugins):
+        """
+        :param plugins: list of dicts, plugin configurations in order of execution
+        """
+        self._plugins = OrderedDict()
+        self._keys_by_name = {}
+        self._next_key = 0
+        for plugin in plugins:
+            self.append(plugin)
+
+    def append(self, plugin):
+        key = self._next_key
+        self._next_key += 1
+        self._plugins[key] = plugin
+        self._keys_by_name.setdefault(plugin.get('name'), []).append(key)
+
+    def get_all(self, name):
+        """
+        :return: list of dicts, configurations of plugin name, in order
+        """
+        return [self._plugins[key] for key in self._keys_by_name.get(name, [])]
+
+    def get(self, name):
+        """
+        :return: dict, first configuration of plugin name, None if not configured
+        """
+        keys = self._keys_by_name.get(name)
+        return self._plugins[keys[0]] if keys else None
+
+    def remove(self, name):
+        """
+        remove first configuration of plugin name
+
+        :return: bool, whether the plugin was configured
+        """
+        keys = self._keys_by_name.get(name)
+        if not keys:
+            return False
+        del self._plugins[keys.pop(0)]
+        if not keys:
+            del self._keys_by_name[name]
+        return True
+
+    def to_list(self):
+        return list(self._plugins.values())
+
+
 class PluginsTemplate(object):
     def __init__(self, build_json_dir, template_path, customize_conf_path=None):
         self._template = None
+        self._phases = {}
+        self._modified_phases = set()
         self._customize_conf = None
         self._build_json_dir = build_json_dir
         self._template_path = template_path
@@ -30,6 +85,10 @@ class PluginsTemplate(object):
 
     @property
     def template(self):
+        """
+        Template with plugins of all phases, it must be modified only by
+        methods of this class
+        """
         if self._template is None:
             path = os.path.join(self._build_json_dir, self._template_path)
             logger.debug("loading template from path %s", path)
@@ -39,8 +98,35 @@ class PluginsTemplate(object):
             except (IOError, OSError) as ex:
                 raise OsbsException("Can't open template '%s': %s" %
                                     (path, repr(ex)))
+        # plugins are shared by template lists and phases,
+        # lists only have to be updated when plugins are added or removed
+        for phase in self._modified_phases:
+            self._template[phase] = self._phases[phase].to_list()
+        self._modified_phases.clear()
         return self._template
 
+    @property
+    def source_paths(self):
+        """
+        :return: list of str, paths of files the template is loaded from
+        """
+        paths = [os.path.join(self._build_json_dir, self._template_path)]
+        if self._customize_conf_path is not None:
+            paths.append(os.path.join(self._build_json_dir, self._customize_conf_path))
+        return paths
+
+    def _get_phase(self, phase):
+        """
+        :return: PluginsPhase
+        :raises KeyError: if the template doesn't have plugins phase
+        """
+        try:
+            return self._phases[phase]
+        except KeyError:
+            plugins_phase = PluginsPhase(self.template[phase])
+            self._phases[phase] = plugins_phase
+            return plugins_phase
+
     @property
     def customize_conf(self):
         if self._customize_conf is None:
@@ -62,26 +148,23 @@ class PluginsTemplate(object):
         """
         if config contains plugin, remove it
         """
-        for p in self.template[phase]:
-            if p.get('name') == name:
-                self.template[phase].remove(p)
-                if reason:
-                    logger.info('Removing %s:%s, %s', phase, name, reason)
-                break
+        if self._get_phase(phase).remove(name):
+            self._modified_phases.add(phase)
+            if reason:
+                logger.info('Removing %s:%s, %s', phase, name, reason)
 
     def add_plugin(self, phase, name, args, reason=None):
         """
         if config has plugin, override it, else add it
         """
-        plugin_modified = False
-
-        for plugin in self.template[phase]:
-            if plugin['name'] == name:
-                plugin['args'] = args
-                plugin_modified = True
-
-        if not plugin_modified:
-            self.template[phase].append({"name": name, "args": args})
+        plugins_phase = self._get_phase(phase)
+        plugins = plugins_phase.get_all(name)
+        for plugin in plugins:
+            plugin['args'] = args
+
+        if not plugins:
+            plugins_phase.append({"name": name, "args": args})
+            self._modified_phases.add(phase)
             if reason:
                 logger.info('%s:%s with args %s, %s', phase, name, args, reason)
 
@@ -92,17 +175,18 @@ class PluginsTemplate(object):
         Raises KeyError if there are no plugins of that type.
         Raises IndexError if the named plugin is not listed.
         """
-        match = [x for x in self.template[phase] if x.get('name') == name]
-        return match[0]
+        plugin = self._get_phase(phase).get(name)
+        if plugin is None:
+            raise IndexError(name)
+        return plugin
 
     def has_plugin_conf(self, phase, name):
         """
         Check whether a plugin is configured.
         """
         try:
-            self.get_plugin_conf(phase, name)
-            return True
-        except (KeyError, IndexError):
+            return self._get_phase(phase).get(name) is not None
+        except KeyError:
             return False
 
     def _get_plugin_conf_or_fail(self, phase, name):
@@ -27,6 +27,8 @@ logger = logging.getLogger(__name__)
 
 KIND_KEY = 'kind'
 
+BUILD_ID_RE = re.compile(r"^(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?$")
+
 # keeps map between kind name and object registered with decorator
 # @register_user_params
 user_param_kinds = {}
@@ -56,12 +58,11 @@ class BuildIDParam(BuildParam):
             logger.warning("'%s' is too long, changing to '%s'", value, new_name)
             value = new_name
 
-        build_id_re = re.compile(r"^(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?$")
-        match = build_id_re.match(value)
+        match = BUILD_ID_RE.match(value)
         if not match:
             logger.error("'%s' is not valid build ID", value)
             raise OsbsValidationException("Build ID '%s', doesn't match regex '%s'" %
-                                          (value, build_id_re))
+                                          (value, BUILD_ID_RE))
         super(BuildIDParam, self).__set__(obj, value)
 
 
@@ -75,7 +76,7 @@ def load_user_params_from_json(user_params_json):
     json_dict = json.loads(user_params_json)
     kind = json_dict.pop(KIND_KEY, BuildUserParams.KIND)  # BW comp. default to BuildUserParams
     user_params_class = user_param_kinds[kind]
-    return user_params_class.from_json(user_params_json)
+    return user_params_class.from_dict(json_dict)
 
 
 class BuildCommon(BuildParamsBase):
@@ -106,10 +107,6 @@ class BuildCommon(BuildParamsBase):
     user = BuildParam("user", required=True)
     worker_deadline = BuildParam("worker_deadline")
 
-    def __setattr__(self, name, value):
-        super(BuildCommon, self).__setattr__(name, value)
-        logger.debug("%s = %s", name, value)
-
     @classmethod
     def make_params(cls,
                     build_conf=None,
@@ -254,6 +251,9 @@ class BuildCommon(BuildParamsBase):
         if missing:
             missing_repr = ", ".join(repr(p.name) for p in missing)
             raise OsbsValidationException("Missing required params: {}".format(missing_repr))
+        if logger.isEnabledFor(logging.DEBUG):
+            # once for all params, rather than on every assignment
+            logger.debug("params of %s: %s", self.__class__.__name__, self.to_json())
 
     @classmethod
     def from_json(cls, user_params_json):
@@ -264,6 +264,14 @@ class BuildCommon(BuildParamsBase):
         except ValueError:
             logger.debug('failed to convert %s', user_params_json)
             raise
+        return cls.from_dict(json_dict)
+
+    @classmethod
+    def from_dict(cls, json_dict):
+        """
+        :param json_dict: dict, decoded output of to_json()
+        :return: instance of cls
+        """
         # Drop invalid keys
         json_dict = {k: v for k, v in json_dict.items() if cls.get_param(k) is not None}
         return cls(**json_dict)
@@ -276,12 +284,29 @@ class BuildCommon(BuildParamsBase):
                 retdict[key] = value
         return retdict
 
-    def to_json(self):
-        # pylint: disable=not-an-iterable; pylint does not understand metaclass properties
-        keys = (p.name for p in self.__class__.params if p.include_in_json)
-        json_dict = self.to_dict(keys)
-        json_dict[KIND_KEY] = self.KIND
-        return json.dumps(json_dict, sort_keys=True)
+    def to_json(self, compact=False):
+        """
+        Serialize params for the USER_PARAMS environment variable
+
+        Serialized params are cached until any param is set again, values
+        changed in place have to be assigned again to be serialized.
+
+        :param compact: bool, skip sorting of keys and whitespace, for
+                        transport where stable output is not needed
+        :return: str
+        """
+        cache = self._derived_cache()
+        cache_key = ('json', compact)
+        if cache_key not in cache:
+            # pylint: disable=not-an-iterable; pylint does not understand metaclass properties
+            keys = (p.name for p in self.__class__.json_params)
+            json_dict = self.to_dict(keys)
+            json_dict[KIND_KEY] = self.KIND
+            if compact:
+                cache[cache_key] = json.dumps(json_dict, separators=(',', ':'))
+            else:
+                cache[cache_key] = json.dumps(json_dict, sort_keys=True)
+        return cache[cache_key]
 
 
 @register_user_params
@@ -12,6 +12,10 @@ import six
 
 from osbs.exceptions import OsbsValidationException
 
+# key in instance dict of BuildParams holding data derived from param values
+# (e.g. serialized params), it is dropped whenever any param is set
+DERIVED_CACHE_KEY = '__derived_cache__'
+
 
 class BuildParam(object):
     """
@@ -65,15 +69,17 @@ class BuildParam(object):
         return "{self.__class__.__name__}({self.name!r})".format(self=self)
 
     def __get__(self, obj, objtype=None):
-        try:
-            # Bypass potential __getattr__ redefinition in class
-            return object.__getattribute__(obj, self._mangled_name)
-        except AttributeError:
+        if obj is None:
             return self._default
+        # Bypass potential __getattr__ redefinition in class, unset params
+        # are common, so avoid raising AttributeError for them
+        return obj.__dict__.get(self._mangled_name, self._default)
 
     def __set__(self, obj, value):
         # Bypass potential __setattr__ redefinition in class
-        object.__setattr__(obj, self._mangled_name, value)
+        obj_dict = obj.__dict__
+        obj_dict[self._mangled_name] = value
+        obj_dict.pop(DERIVED_CACHE_KEY, None)
 
 
 class BuildParamsMeta(type):
@@ -86,6 +92,10 @@ class BuildParamsMeta(type):
         Create a new BuildParams class. Collect all BuildParam attributes
         from class namespace, check that their names match the attribute names
         and give the class a __params_dict__ attribute.
+
+        Params of the class and all its parents are then merged into flat
+        tables, so that looking up and iterating params doesn't have to walk
+        the MRO or sort the params again.
         """
         pdict = {
             attr_name: attr for attr_name, attr in namespace.items()
@@ -95,7 +105,19 @@ class BuildParamsMeta(type):
             if param_name != param.name:
                 raise TypeError("Mismatched param name: {} = {!r}".format(param_name, param))
         namespace["__params_dict__"] = pdict
-        return super(BuildParamsMeta, cls).__new__(cls, name, bases, namespace)
+        new_cls = super(BuildParamsMeta, cls).__new__(cls, name, bases, namespace)
+
+        # Respects MRO (if child class redefines a param, the child param wins)
+        all_params = {}
+        for cls_or_base in reversed(new_cls.__mro__):
+            all_params.update(vars(cls_or_base).get("__params_dict__", {}))
+        sorted_params = tuple(sorted(all_params.values(), key=lambda param: param.name))
+
+        new_cls._all_params = all_params
+        new_cls._sorted_params = sorted_params
+        new_cls._required_params = tuple(p for p in sorted_params if p.required)
+        new_cls._json_params = tuple(p for p in sorted_params if p.include_in_json)
+        return new_cls
 
     @property
     def params_dict(cls):
@@ -106,39 +128,34 @@ class BuildParamsMeta(type):
         Respects MRO (if child class redefines a param, returns the child param,
         not the parent one).
         """
-        pdict = {}
-        for cls_or_base in reversed(cls.__mro__):
-            pdict.update(getattr(cls_or_base, "__params_dict__", {}))
-        return pdict
+        return dict(cls._all_params)
 
     def get_param(cls, name):
         """
         Get BuildParam instance defined on class or any of its parents by name.
-
-        May be preferrable over cls.params_dict.get(name) because this does not
-        construct an entire params dictionary.
         """
-        for cls_or_base in cls.__mro__:
-            param = getattr(cls_or_base, "__params_dict__", {}).get(name)
-            if param is not None:
-                return param
-        return None
+        return cls._all_params.get(name)
 
     @property
     def params(cls):
         """
         Get all params for a class
         """
-        # pylint: disable=no-member; pylint does not understand metaclass properties
-        return sorted(cls.params_dict.values(), key=lambda param: param.name)
+        return list(cls._sorted_params)
 
     @property
     def required_params(cls):
         """
         Get all required params for a class
         """
-        # pylint: disable=not-an-iterable; pylint does not understand metaclass properties
-        return [p for p in cls.params if p.required]
+        return list(cls._required_params)
+
+    @property
+    def json_params(cls):
+        """
+        Get all params for a class which are included in to_json() output
+        """
+        return list(cls._json_params)
 
 
 @six.add_metaclass(BuildParamsMeta)
@@ -151,8 +168,8 @@ class BuildParamsBase(object):
         """
         Set all params from keyword arguments, fail if any are unknown
         """
-        pdict = self.__class__.params_dict
-        unexpected = set(kwargs) - set(pdict)
+        pdict = self.__class__._all_params
+        unexpected = [pname for pname in kwargs if pname not in pdict]
         if unexpected:
             unexpected_repr = ", ".join(repr(pname) for pname in sorted(unexpected))
             raise OsbsValidationException("Got unexpected params: {}".format(unexpected_repr))
@@ -161,7 +178,7 @@ class BuildParamsBase(object):
 
     def __repr__(self):
         params_repr = ", ".join(
-            "{}={!r}".format(p.name, p.__get__(self)) for p in self.__class__.params
+            "{}={!r}".format(p.name, p.__get__(self)) for p in self.__class__._sorted_params
         )
         return "{}({})".format(self.__class__.__name__, params_repr)
 
@@ -169,8 +186,20 @@ class BuildParamsBase(object):
         """
         Set attribute only if it is defined as a BuildParam on this class (or parent)
         """
-        param = self.__class__.get_param(name)
+        param = self.__class__._all_params.get(name)
         if param is not None:
             param.__set__(self, value)
         else:
             raise AttributeError("No such param: {!r}".format(name))
+
+    def _derived_cache(self):
+        """
+        Get cache for data derived from param values, the cache is emptied
+        when any param is set.
+
+        Values modified in place (e.g. appending to a list param) are not
+        detected, params have to be assigned again to invalidate the cache.
+
+        :return: dict
+        """
+        return self.__dict__.setdefault(DERIVED_CACHE_KEY, {})
@@ -0,0 +1,271 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+`osbs daemon` runs commands for short-lived osbs processes of the same
+user, so that they don't need to read the configuration, authenticate and
+connect to OpenShift every time.
+
+Clients send one JSON line describing the command over a UNIX socket; the
+daemon responds with JSON lines carrying what the command writes to stdout
+and stderr, and finally its exit code:
+
+    {"version": 1, "command": "get-build", "args": {...}}
+    {"stdout": "..."}
+    {"stderr": "..."}
+    {"exit": 0}
+
+A daemon which can't run the command responds with {"error": "..."} only;
+the client runs the command itself then.
+"""
+from __future__ import print_function, absolute_import, unicode_literals
+
+import argparse
+import errno
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+from six.moves import socketserver
+
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 1
+
+
+class ThreadLocalStream(object):
+    """
+    Replacement of sys.stdout or sys.stderr, which writes to the stream set
+    for the current thread, or to the original one
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    @property
+    def current(self):
+        return getattr(self._local, 'stream', None) or self.default
+
+    def redirect(self, stream):
+        """
+        :param stream: file, where the current thread writes to; None for the default
+        """
+        self._local.stream = stream
+
+    def write(self, data):
+        return self.current.write(data)
+
+    def flush(self):
+        self.current.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+class FrameWriter(object):
+    """
+    Text stream sending what's written to it as JSON lines
+    """
+
+    def __init__(self, wfile, name, lock):
+        """
+        :param wfile: file, opened for writing bytes to the client
+        :param name: str, name of the stream, e.g. 'stdout'
+        :param lock: threading.Lock, shared by all writers to wfile
+        """
+        self.wfile = wfile
+        self.name = name
+        self.lock = lock
+
+    def write(self, data):
+        send_frame(self.wfile, {self.name: data}, self.lock)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def send_frame(wfile, frame, lock=None):
+    line = (json.dumps(frame) + '\n').encode('utf-8')
+    if lock is None:
+        wfile.write(line)
+        wfile.flush()
+        return
+    with lock:
+        wfile.write(line)
+        wfile.flush()
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode('utf-8'))
+        if request.get('version') != PROTOCOL_VERSION:
+            send_frame(self.wfile, {'error': 'unsupported protocol version'})
+            return
+        if request.get('command') not in self.server.commands:
+            send_frame(self.wfile, {'error': 'unsupported command'})
+            return
+
+        lock = threading.Lock()
+        self.server.stdout.redirect(FrameWriter(self.wfile, 'stdout', lock))
+        self.server.stderr.redirect(FrameWriter(self.wfile, 'stderr', lock))
+        try:
+            exit_code = self.server.run(request['command'], request['args'])
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("%s failed", request['command'])
+            exit_code = -1
+        finally:
+            self.server.stdout.redirect(None)
+            self.server.stderr.redirect(None)
+        send_frame(self.wfile, {'exit': exit_code}, lock)
+
+
+class OsbsDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Server running osbs commands, each connection in its own thread
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, commands, global_options, make_osbs, run_command):
+        """
+        :param socket_path: str, path of the UNIX socket to listen on
+        :param commands: dict, command name -> function taking args and osbs
+        :param global_options: list of strs, names of arguments which select
+                               the OSBS instance a command is run with
+        :param make_osbs: callable, takes args and an OSBS instance to reuse,
+                          returns a new OSBS instance
+        :param run_command: callable, takes args and OSBS instance, returns exit code
+        """
+        self.socket_path = socket_path
+        self.commands = commands
+        self.global_options = global_options
+        self.make_osbs = make_osbs
+        self.run_command = run_command
+        # global options -> (mtime of configuration file, OSBS instance)
+        self._instances = {}
+        self._lock = threading.Lock()
+
+        self._remove_stale_socket()
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir and not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir, 0o700)
+        # the daemon authenticates as the user, nobody else may connect
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+
+        # commands print their output, it goes to the client running them
+        self.stdout = sys.stdout = ThreadLocalStream(sys.stdout)
+        self.stderr = sys.stderr = ThreadLocalStream(sys.stderr)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error:
+            # left behind by a daemon which didn't exit cleanly
+            os.remove(self.socket_path)
+        else:
+            raise RuntimeError("osbs daemon is already listening on %s" % self.socket_path)
+        finally:
+            sock.close()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        sys.stdout = self.stdout.default
+        sys.stderr = self.stderr.default
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def get_osbs(self, args):
+        """
+        :param args: argparse.Namespace, arguments of the command
+        :return: OSBS instance, sharing connections with earlier commands
+                 which used the same global options
+        """
+        key = json.dumps([getattr(args, name, None) for name in self.global_options])
+        try:
+            # changes of the configuration file take effect
+            mtime = os.path.getmtime(getattr(args, 'config', None))
+        except (TypeError, OSError):
+            mtime = None
+
+        with self._lock:
+            cached_mtime, cached = self._instances.get(key, (None, None))
+            if cached is None or cached_mtime != mtime:
+                logger.info("connecting to OpenShift for %s", args.instance)
+                # replaces the instance made for an outdated configuration
+                cached = self.make_osbs(args)
+                self._instances[key] = (mtime, cached)
+                return cached
+        return self.make_osbs(args, cached)
+
+    def run(self, command, arguments):
+        """
+        :param command: str, name of the command
+        :param arguments: dict, parsed arguments of the command
+        :return: int, exit code
+        """
+        args = argparse.Namespace(func=self.commands[command], **arguments)
+        logger.debug("running %s", command)
+        return self.run_command(args, self.get_osbs(args))
+
+
+def forward(socket_path, command, arguments, stdout=None, stderr=None):
+    """
+    Run the command in the daemon listening on socket_path
+
+    :param socket_path: str, path of the daemon's socket
+    :param command: str, name of the command
+    :param arguments: dict, parsed arguments of the command, paths absolute
+    :param stdout: file, where to write output of the command, sys.stdout by default
+    :param stderr: file, where to write errors of the command, sys.stderr by default
+    :return: int, exit code of the command; None when no daemon can run it
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(socket_path)
+        except socket.error as ex:
+            if ex.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                logger.warning("cannot connect to osbs daemon at %s: %s", socket_path, ex)
+            return None
+
+        request = {'version': PROTOCOL_VERSION, 'command': command, 'args': arguments}
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+
+        streams = {'stdout': stdout, 'stderr': stderr}
+        for line in sock.makefile('rb'):
+            frame = json.loads(line.decode('utf-8'))
+            if 'exit' in frame:
+                return frame['exit']
+            if 'error' in frame:
+                logger.debug("osbs daemon can't run %s: %s", command, frame['error'])
+                return None
+            for name, data in frame.items():
+                streams[name].write(data)
+                streams[name].flush()
+    finally:
+        sock.close()
+
+    # the command may have done something already, it can't be run again
+    logger.error("osbs daemon closed the connection before %s finished", command)
+    return -1
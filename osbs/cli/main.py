@@ -7,10 +7,10 @@ of the BSD license. See the LICENSE file for details.
 """
 from __future__ import print_function, absolute_import, unicode_literals
 import collections
+import copy
 
 import json
 import logging
-import pkg_resources
 
 from textwrap import dedent
 import codecs
@@ -18,29 +18,52 @@ import time
 import os.path
 import sys
 import argparse
-from osbs import set_logging
-from osbs.api import OSBS
-from osbs.build.build_response import BuildResponse
-from osbs.cli.render import TablePrinter
-from osbs.conf import Configuration
+# Only light modules are imported here, so that `osbs --help` and friends
+# start quickly; the API and its dependencies are imported when needed.
+from osbs import set_logging, __version__
+from osbs.cli.render import LiveTable
 from osbs.constants import (DEFAULT_CONFIGURATION_FILE, DEFAULT_CONFIGURATION_SECTION,
                             CLI_LIST_BUILDS_DEFAULT_COLS, PY3, BACKUP_RESOURCES,
-                            BUILD_FINISHED_STATES, CLI_WATCH_BUILDS_DEFAULT_COLS)
-from osbs.exceptions import (OsbsNetworkException, OsbsException, OsbsAuthException,
-                             OsbsResponseException)
-from osbs.cli.capture import setup_json_capture
-from osbs.utils import (paused_builds, TarReader, TarWriter, get_time_from_rfc3339,
-                        graceful_chain_get, ImageName)
-from six.moves.urllib.parse import urljoin
+                            BACKUP_COMPRESSIONS, BACKUP_RESTORE_ORDER, RESTORE_WORKERS,
+                            BACKUP_MANIFEST, BACKUP_MANIFEST_VERSION, DEFAULT_DAEMON_SOCKET,
+                            BUILD_FINISHED_STATES, CLI_WATCH_BUILDS_DEFAULT_COLS,
+                            CLI_WATCH_BUILDS_KEEP_FINISHED, WATCH_DELETED)
 
 logger = logging.getLogger('osbs')
 
+# commands which `osbs daemon` runs, they don't read from standard input
+# and the only local files they read are given by DAEMON_PATH_OPTIONS
+DAEMON_COMMANDS = ('list-builds', 'watch-build', 'watch-builds', 'get-build', 'cancel-build',
+                   'get-token', 'get-user', 'build-logs', 'get-quota', 'build',
+                   'build-source-container', 'get-build-image-id', 'print-token-url')
+# options with paths, which are made absolute for the daemon
+DAEMON_PATH_OPTIONS = ('config', 'client_cert', 'client_key', 'kerberos_keytab',
+                       'kerberos_ccache', 'token_file', 'build_json_dir')
+# global options which don't affect the OSBS instance running the command
+DAEMON_IGNORED_OPTIONS = ('help', 'version', 'quiet', 'output', 'capture_dir',
+                          'daemon_socket', 'no_daemon')
+
 
 def print_json_nicely(decoded_json):
     print(json.dumps(decoded_json, indent=2))
 
 
+def print_json_list_nicely(items):
+    """
+    print items the same way print_json_nicely(list(items)) does,
+    but one by one as they are generated
+    """
+    separator = "[\n"
+    for item in items:
+        sys.stdout.write(separator + "  " + json.dumps(item, indent=2).replace("\n", "\n  "))
+        sys.stdout.flush()
+        separator = ",\n"
+    print("[]" if separator == "[\n" else "\n]")
+
+
 def cmd_get_all_resource_quota(args, osbs):
+    from osbs.utils import graceful_chain_get
+
     quota_name = args.QUOTA_NAME
     logger.debug("quota name = %s", quota_name)
     if quota_name is None:
@@ -58,12 +81,28 @@ def cmd_watch_builds(args, osbs):
     if args.columns:
         cols_to_display = args.columns.split(",")
 
-    data = [{
+    header = {
         "changetype": "CHANGE",
         "status": "STATUS",
         "created": "CREATED",
         "name": "NAME",
-    }]
+    }
+    table = None
+    if args.output == 'text':
+        table = LiveTable(header, cols_to_display, keep_finished=args.keep_finished)
+        # finished builds are removed even when no other builds change
+        table.start()
+
+    try:
+        _watch_builds(args, osbs, field_selector, table)
+    finally:
+        if table is not None:
+            table.close()
+
+
+def _watch_builds(args, osbs, field_selector, table):
+    from osbs.utils import get_time_from_rfc3339
+
     for changetype, obj in osbs.watch_builds(field_selector=field_selector):
         try:
             name = obj['metadata']['name']
@@ -89,16 +128,19 @@ def cmd_watch_builds(args, osbs):
                 "status": status,
                 "created": created,
             }
-            data.append(b)
         if args.output == 'json':
             print(json.dumps(b))
             sys.stdout.flush()
         elif args.output == 'text':
-            tp = TablePrinter(data, cols_to_display)
-            tp.render()
+            # builds leaving the field selector are reported as deleted
+            finished = changetype == WATCH_DELETED or status.lower() in BUILD_FINISHED_STATES
+            table.update(b["name"], b, finished=finished)
 
 
 def cmd_list_builds(args, osbs):
+    from osbs.build.build_response import BuildResponse
+    from osbs.utils import ImageName, external_sort
+
     kwargs = {}
     if args.running:
         kwargs['running'] = args.running
@@ -107,19 +149,17 @@ def cmd_list_builds(args, osbs):
         with open(args.from_json) as fp:
             builds = [BuildResponse(build, osbs) for build in json.load(fp)]
     else:
-        builds = osbs.list_builds(**kwargs)
+        # builds are requested in chunks as they are printed
+        builds = osbs.iter_builds(**kwargs)
 
     if args.output == 'json':
-        json_output = []
-        for build in builds:
-            json_output.append(build.json)
-        print_json_nicely(json_output)
+        print_json_list_nicely(build.json for build in builds)
     elif args.output == 'text':
         if args.columns:
             cols_to_display = args.columns.split(",")
         else:
             cols_to_display = CLI_LIST_BUILDS_DEFAULT_COLS
-        data = [{
+        header = {
             "base_image": "BASE IMAGE NAME",
             "base_image_id": "BASE IMAGE ID",
             "commit": "COMMIT",
@@ -130,34 +170,44 @@ def cmd_list_builds(args, osbs):
             "name": "BUILD ID",
             "status": "STATUS",
             "time_created": "TIME CREATED",
-        }]
-        for build in sorted(builds,
-                            key=lambda x: x.get_time_created_in_seconds()):
-            unique_image = build.get_image_tag()
-            try:
-                image = \
-                    ImageName.parse(build.get_repositories()["primary"][0]).to_str(registry=False)
-            except (TypeError, KeyError, IndexError):
-                image = ""  # "" or unique_image? failed builds don't have that ^
-            if args.FILTER and args.FILTER not in image:
-                continue
-            if args.running and not build.is_in_progress():
-                continue
-            b = {
-                "base_image": build.get_base_image_name() or '',
-                "base_image_id": build.get_base_image_id() or '',
-                "commit": build.get_commit_id(),
-                "image": image,
-                "unique_image": unique_image,
-                "image_id": build.get_image_id() or '',
-                "koji_build_id": build.get_koji_build_id() or '',
-                "name": build.get_build_name(),
-                "status": build.status,
-                "time_created": build.get_time_created(),
-            }
-            data.append(b)
-        tp = TablePrinter(data, cols_to_display)
-        tp.render()
+        }
+        table = LiveTable(header, cols_to_display, interactive=False)
+
+        def rows():
+            for build in builds:
+                unique_image = build.get_image_tag()
+                try:
+                    image = ImageName.parse(
+                        build.get_repositories()["primary"][0]).to_str(registry=False)
+                except (TypeError, KeyError, IndexError):
+                    image = ""  # "" or unique_image? failed builds don't have that ^
+                if args.FILTER and args.FILTER not in image:
+                    continue
+                if args.running and not build.is_in_progress():
+                    continue
+                b = {
+                    "base_image": build.get_base_image_name() or '',
+                    "base_image_id": build.get_base_image_id() or '',
+                    "commit": build.get_commit_id(),
+                    "image": image,
+                    "unique_image": unique_image,
+                    "image_id": build.get_image_id() or '',
+                    "koji_build_id": build.get_koji_build_id() or '',
+                    "name": build.get_build_name(),
+                    "status": build.status,
+                    "time_created": build.get_time_created(),
+                }
+                table.fit(b)
+                yield build.get_time_created_in_seconds(), b
+
+        if args.no_sort:
+            for _, row in rows():
+                table.append(row)
+        else:
+            # all rows are seen before the first one is printed,
+            # so columns are wide enough for all of them
+            for _, row in external_sort(rows(), key=lambda entry: entry[0]):
+                table.append(row)
 
 
 def make_digests_str(digests):
@@ -497,6 +547,11 @@ def cmd_get_build_image_id(args, osbs):
 
 
 def cmd_backup(args, osbs):
+    from multiprocessing.pool import ThreadPool
+    import tempfile
+    from osbs.utils import (paused_builds, TarWriter, read_backup_manifest,
+                            get_manifest_version)
+
     dirname = time.strftime("osbs-backup-{}-%Y-%m-%d-%H%M%S"
                             .format(args.instance))
     if args.filename == '-':
@@ -504,52 +559,221 @@ def cmd_backup(args, osbs):
     elif args.filename:
         outfile = args.filename
     else:
-        outfile = dirname + ".tar.bz2"
+        outfile = dirname + ".tar." + args.compression
 
-    with paused_builds(osbs, quota_name='pause-backup',
-                       ignore_quota_errors=args.ignore_quota_errors):
-        with TarWriter(outfile, dirname) as t:
-            for resource_type in BACKUP_RESOURCES:
-                try:
-                    logger.info("dumping %s", resource_type)
-                    resources = osbs.dump_resource(resource_type)
-                    t.write_file(resource_type + ".json", json.dumps(resources).encode('ascii'))
-                except Exception as e:
-                    if args.continue_on_error:
-                        logger.warning(
-                            "Error during %s backup", resource_type, exc_info=True
-                        )
-                    else:
-                        raise e
+    if args.base:
+        base = read_backup_manifest(args.base)
+        # resources which are in the base or the backups it's based on
+        since = set(get_manifest_version(entry) for entry in base['resources'])
+        logger.info("backing up changes since %s", base['name'])
+    else:
+        base = since = None
+
+    def dump(resource_type):
+        logger.info("dumping %s", resource_type)
+        # resources are streamed to disk, tar needs to know the size in advance
+        dump_file = tempfile.TemporaryFile()
+        entries = []
+        try:
+            count = osbs.dump_resource_to_file(resource_type, dump_file,
+                                               resource_version=resource_version,
+                                               manifest=entries, since=since)
+        except Exception:
+            dump_file.close()
+            if args.continue_on_error:
+                logger.warning(
+                    "Error during %s backup", resource_type, exc_info=True
+                )
+                return None, None
+            raise
+        logger.info("dumped %d of %d %s", count, len(entries), resource_type)
+        return dump_file, entries
+
+    def write_backup():
+        manifest = {
+            'version': BACKUP_MANIFEST_VERSION,
+            'name': dirname,
+            'base': base['name'] if base else None,
+            'resourceVersion': resource_version,
+            # complete state, including resources which are only in the base
+            'resources': [],
+            # resources which are in the base, but not anymore
+            'deleted': [],
+        }
+        pool = ThreadPool(len(BACKUP_RESOURCES))
+        try:
+            with TarWriter(outfile, dirname, compression=args.compression,
+                           parallel=True) as t:
+                # resource types are dumped concurrently and archived in order
+                dumps = pool.imap(dump, BACKUP_RESOURCES)
+                for resource_type, (dump_file, entries) in zip(BACKUP_RESOURCES, dumps):
+                    base_entries = [entry for entry in (base or {}).get('resources', [])
+                                    if entry['resource'] == resource_type]
+                    if dump_file is None:
+                        # nothing is known about them now, the base is the best guess
+                        manifest['resources'].extend(base_entries)
+                        continue
+
+                    manifest['resources'].extend(entries)
+                    current = set((entry['name'], entry['uid']) for entry in entries)
+                    manifest['deleted'].extend(entry for entry in base_entries
+                                               if (entry['name'], entry['uid']) not in current)
+                    with dump_file:
+                        size = dump_file.tell()
+                        dump_file.seek(0)
+                        t.add_file(resource_type + ".json", dump_file, size)
+
+                t.write_file(BACKUP_MANIFEST, json.dumps(manifest).encode('ascii'))
+        finally:
+            pool.close()
+            pool.join()
+
+        if base:
+            logger.info("%d resources were deleted since %s",
+                        len(manifest['deleted']), base['name'])
+
+    if args.snapshot:
+        # all resource types as they were at one point, builds keep running
+        resource_version = osbs.get_snapshot_resource_version()
+        logger.info("backing up resources at resourceVersion %s", resource_version)
+        write_backup()
+    else:
+        resource_version = None
+        with paused_builds(osbs, quota_name='pause-backup',
+                           ignore_quota_errors=args.ignore_quota_errors,
+                           timeout=args.pause_timeout):
+            write_backup()
 
     if not hasattr(outfile, "write"):
         logger.info("backup archive created: %s", outfile)
 
 
 def cmd_restore(args, osbs):
-    if args.BACKUP_ARCHIVE == '-':
-        infile = sys.stdin.buffer if PY3 else sys.stdin  # pylint: disable=no-member
+    import shutil
+    import tempfile
+    from osbs.utils import (paused_builds, TarReader, Checkpoint, iter_json_items,
+                            read_backup_manifest, get_manifest_version, graceful_chain_get)
+
+    archives = args.BACKUP_ARCHIVE
+    if len(archives) > 1:
+        # the last incremental backup describes the state to restore, the
+        # resources are in any of the backups
+        manifest = read_backup_manifest(archives[-1])
+        wanted = dict(((entry['resource'], entry['name']), get_manifest_version(entry))
+                      for entry in manifest['resources'])
+        logger.info("restoring %d resources backed up in %s and %d earlier backups",
+                    len(wanted), manifest['name'], len(archives) - 1)
     else:
-        infile = args.BACKUP_ARCHIVE
-    asciireader = codecs.getreader('ascii')
-
-    with paused_builds(osbs, quota_name='pause-backup',
-                       ignore_quota_errors=args.ignore_quota_errors):
-        for f in TarReader(infile):
-            resource_type = os.path.basename(f.filename).split('.')[0]
-            if resource_type not in BACKUP_RESOURCES:
-                logger.warning("Unknown resource type for %s, skipping", f.filename)
-                continue
-
-            logger.info("restoring %s", resource_type)
-            osbs.restore_resource(resource_type, json.load(asciireader(f.fileobj)),
-                                  continue_on_error=args.continue_on_error)
-            f.fileobj.close()
+        wanted = None
+
+    utf8reader = codecs.getreader('utf-8')
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    nfailed = 0
+
+    def select(resource_type, resources):
+        for resource in resources:
+            if wanted is not None:
+                key = (resource_type, graceful_chain_get(resource, 'metadata', 'name'))
+                if wanted.get(key) != get_manifest_version(resource):
+                    # changed or deleted later
+                    continue
+                del wanted[key]
+            yield resource
+
+    def restore(resource_type, fileobj):
+        logger.info("restoring %s", resource_type)
+        resources = select(resource_type, iter_json_items(utf8reader(fileobj)))
+        return osbs.restore_resource(resource_type, resources,
+                                     continue_on_error=args.continue_on_error,
+                                     checkpoint=checkpoint, max_workers=args.workers)
 
+    try:
+        with paused_builds(osbs, quota_name='pause-backup',
+                           ignore_quota_errors=args.ignore_quota_errors,
+                           timeout=args.pause_timeout):
+            # resources which have to wait for others, each archive is read
+            # only once, so they are copied aside
+            spooled = []
+            for index, archive in enumerate(archives):
+                if archive == '-':
+                    archive = sys.stdin.buffer if PY3 else sys.stdin  # pylint: disable=no-member
+                last = index == len(archives) - 1
+                restored = []
+                for f in TarReader(archive):
+                    if os.path.basename(f.filename) == BACKUP_MANIFEST:
+                        continue
+                    resource_type = os.path.basename(f.filename).split('.')[0]
+                    if resource_type not in BACKUP_RESTORE_ORDER:
+                        logger.warning("Unknown resource type for %s, skipping", f.filename)
+                        continue
+
+                    # later archives may have more of the earlier resource types
+                    earlier = BACKUP_RESTORE_ORDER[:BACKUP_RESTORE_ORDER.index(resource_type)]
+                    if not earlier or (last and all(t in restored for t in earlier) and
+                                       not any(t in earlier for t, _ in spooled)):
+                        nfailed += restore(resource_type, f.fileobj)
+                        restored.append(resource_type)
+                    else:
+                        logger.debug("%s will be restored later", resource_type)
+                        spool = tempfile.TemporaryFile()
+                        shutil.copyfileobj(f.fileobj, spool)
+                        spool.seek(0)
+                        spooled.append((resource_type, spool))
+                    f.fileobj.close()
+
+            for resource_type in BACKUP_RESTORE_ORDER:
+                for spooled_type, spool in spooled:
+                    if spooled_type == resource_type:
+                        with spool:
+                            nfailed += restore(resource_type, spool)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    if wanted:
+        logger.warning("%d resources were not found in the backups, e.g. %s",
+                       len(wanted), '%s/%s' % next(iter(wanted)))
+    if checkpoint is not None and not nfailed:
+        # a complete restore must not be skipped when the file is used again
+        checkpoint.remove()
     logger.info("backup recovery complete!")
 
 
+def cmd_render_batch(args, osbs):
+    from osbs.build.batch_render import LocalReactorConfig, render_batch
+
+    reactor_config = LocalReactorConfig.from_file(args.reactor_config)
+    build_json_dir = osbs.os_conf.get_build_json_store()
+
+    infile = sys.stdin if args.INPUT == '-' else codecs.open(args.INPUT, encoding='utf-8')
+    outfile = sys.stdout if args.output_file == '-' else open(args.output_file, 'w')
+
+    rendered = failed = 0
+    start = time.time()
+    try:
+        for result in render_batch(infile, reactor_config, build_json_dir=build_json_dir,
+                                   processes=args.processes):
+            if 'error' in result:
+                failed += 1
+                logger.error("record %d: %s", result['index'], result['error'])
+            else:
+                rendered += 1
+            outfile.write(json.dumps(result, sort_keys=True) + '\n')
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    elapsed = time.time() - start
+    logger.info("rendered %d records, %d failed, in %.2f s (%.1f records/s)",
+                rendered, failed, elapsed, (rendered + failed) / elapsed if elapsed else 0)
+    return -1 if failed else 0
+
+
 def cmd_print_token_url(args, osbs):
+    from six.moves.urllib.parse import urljoin
+
     uri = urljoin(osbs.os_conf.get_openshift_base_uri(), "oauth/token/request")
     print("To complete authentication please navigate to:\n\n{}\n\n".format(uri) +
           "Set token or token_file in configuration to authenticate requests.")
@@ -585,12 +809,7 @@ def str_on_2_unicode_on_3(s):
         return s
 
 
-def cli():
-    try:
-        version = pkg_resources.get_distribution("osbs-client").version
-    except pkg_resources.DistributionNotFound:
-        version = "GIT"
-
+def make_parser():
     parser = argparse.ArgumentParser(
         description="OpenShift Build Service client"
     )
@@ -599,9 +818,9 @@ def cli():
     # that the option was not specified
     exclusive_group.add_argument("--verbose", action="store_true", default=None)
     exclusive_group.add_argument("-q", "--quiet", action="store_true")
-    exclusive_group.add_argument("-V", "--version", action="version", version=version)
+    exclusive_group.add_argument("-V", "--version", action="version", version=__version__)
 
-    subparsers = parser.add_subparsers(help='commands')
+    subparsers = parser.add_subparsers(help='commands', dest='command')
 
     list_builds_parser = subparsers.add_parser(str_on_2_unicode_on_3('list-builds'),
                                                help='list builds in OSBS',
@@ -618,6 +837,9 @@ def cli():
                                     action="store_true")
     list_builds_parser.add_argument("--from-json",
                                     help="fetch builds list from JSON file instead of from server")
+    list_builds_parser.add_argument("--no-sort", action="store_true", default=False,
+                                    help="print builds as they are received instead of "
+                                    "sorting them by time of creation")
 
     list_builds_parser.set_defaults(func=cmd_list_builds)
 
@@ -631,6 +853,10 @@ def cli():
     watch_builds_parser.add_argument("--columns",
                                      help="comma-separated list of columns to display, possible "
                                      "values: changetype, status, created, name")
+    watch_builds_parser.add_argument("--keep-finished", type=int, metavar="SECONDS",
+                                     default=CLI_WATCH_BUILDS_KEEP_FINISHED,
+                                     help="how long to display finished builds for, "
+                                     "default is %(default)s seconds")
     watch_builds_parser.set_defaults(func=cmd_watch_builds)
 
     get_build_parser = subparsers.add_parser(str_on_2_unicode_on_3('get-build'),
@@ -842,9 +1068,23 @@ def cli():
                                            help='dump builder data (admin)',
                                            description='create backup of all OSBS data')
     backup_builder.add_argument("-f", "--filename",
-                                help="name of the resulting tar.bz2 file (use - for stdout)")
+                                help="name of the resulting tar archive (use - for stdout)")
+    backup_builder.add_argument("--compression", choices=BACKUP_COMPRESSIONS,
+                                default=BACKUP_COMPRESSIONS[0],
+                                help="compression of the archive, default is %(default)s; "
+                                "multi-threaded pigz, lbzip2 or xz is used when installed")
     backup_builder.add_argument("--ignore-quota-errors", action='store_true',
                                 help="ignore resourcequota errors")
+    backup_builder.add_argument("--pause-timeout", action='store', type=int, metavar='SECONDS',
+                                help="give up when running builds don't finish in SECONDS, "
+                                "by default wait as long as it takes")
+    backup_builder.add_argument("--base", action='store', metavar='ARCHIVE',
+                                help="create an incremental backup, with only the resources "
+                                "which were created or changed since the backup ARCHIVE")
+    backup_builder.add_argument("--snapshot", action='store_true',
+                                help="don't pause builds, dump all resources as they were "
+                                "at the same resourceVersion instead (requires "
+                                "OpenShift 4.6 or newer)")
     backup_builder.add_argument("--continue-on-error", action='store_true',
                                 help="don't stop when backing up a resource fails")
     backup_builder.set_defaults(func=cmd_backup)
@@ -852,14 +1092,44 @@ def cli():
     restore_builder = subparsers.add_parser(str_on_2_unicode_on_3('restore-builder'),
                                             help='restore builder data (admin)',
                                             description='restore OSBS data from backup')
-    restore_builder.add_argument("BACKUP_ARCHIVE",
-                                 help="name of the tar.bz2 archive to restore (use - for stdin)")
+    restore_builder.add_argument("BACKUP_ARCHIVE", nargs='+',
+                                 help="name of the tar archive to restore (use - for stdin), "
+                                 "followed by incremental backups based on it, oldest first")
     restore_builder.add_argument("--continue-on-error", action='store_true',
                                  help="don't stop when restoring a resource fails")
     restore_builder.add_argument("--ignore-quota-errors", action='store_true',
                                  help="ignore resourcequota errors")
+    restore_builder.add_argument("--pause-timeout", action='store', type=int, metavar='SECONDS',
+                                 help="give up when running builds don't finish in SECONDS, "
+                                 "by default wait as long as it takes")
+    restore_builder.add_argument("--checkpoint", action='store', metavar='FILE',
+                                 help="record restored resources in FILE and skip those "
+                                      "already recorded there, to resume an interrupted "
+                                      "restore; removed when all resources are restored")
+    restore_builder.add_argument("--workers", action='store', type=int,
+                                 default=RESTORE_WORKERS, metavar='N',
+                                 help="number of resources created concurrently "
+                                      "(default: %(default)s)")
     restore_builder.set_defaults(func=cmd_restore)
 
+    render_batch_parser = subparsers.add_parser(
+        str_on_2_unicode_on_3('render-batch'),
+        help='render build JSON for many builds offline',
+        description='render build JSON and plugins configuration for JSONL stream of user '
+                    'params, without access to the cluster')
+    render_batch_parser.add_argument("--reactor-config", action='store', metavar="PATH",
+                                     required=True,
+                                     help="reactor config file used instead of the config map")
+    render_batch_parser.add_argument("--build-json-dir", action="store", metavar="PATH",
+                                     help="directory with build jsons")
+    render_batch_parser.add_argument("INPUT", nargs='?', default='-',
+                                     help="JSONL file with user params (default: stdin)")
+    render_batch_parser.add_argument("--output-file", action='store', default='-',
+                                     help="JSONL file for results (default: stdout)")
+    render_batch_parser.add_argument("-j", "--processes", action='store', type=int,
+                                     help="number of worker processes (default: number of CPUs)")
+    render_batch_parser.set_defaults(func=cmd_render_batch)
+
     token_url_builder = subparsers.add_parser(str_on_2_unicode_on_3('print-token-url'),
                                               description='print a url to oauth authentication '
                                               'page')
@@ -874,6 +1144,14 @@ def cli():
                                         help="name of the service account")
     serviceaccount_builder.set_defaults(func=cmd_serviceaccount_token)
 
+    daemon_parser = subparsers.add_parser(
+        str_on_2_unicode_on_3('daemon'),
+        help='run commands for other osbs processes',
+        description='keep connections to OpenShift, tokens and caches for osbs commands '
+                    'run by the same user; they are passed to the daemon over '
+                    'the --daemon-socket')
+    daemon_parser.set_defaults(func=cmd_daemon)
+
     parser.add_argument("--openshift-uri", action='store', metavar="URL",
                         help="openshift URL to remote API")
     parser.add_argument("--registry-uri", action='store', metavar="URL",
@@ -920,6 +1198,16 @@ def cli():
                         help="OAuth 2.0 token")
     parser.add_argument("--token-file", metavar="TOKENFILE", action="store",
                         help="Read oauth 2.0 token from file")
+    parser.add_argument("--daemon-socket", metavar="PATH", action="store",
+                        default=DEFAULT_DAEMON_SOCKET,
+                        help="UNIX socket of `osbs daemon`, default %s" % DEFAULT_DAEMON_SOCKET)
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="don't pass the command to `osbs daemon` even if it's running")
+    return parser
+
+
+def cli():
+    parser = make_parser()
     args = parser.parse_args()
 
     if getattr(args, 'func', None) is cmd_build_source_container:
@@ -929,45 +1217,52 @@ def cli():
                 "--sources-for-koji-build-nvr has to be specified"
             )
 
-    return parser, args
-
+    if getattr(args, 'func', None) is cmd_restore:
+        if len(args.BACKUP_ARCHIVE) > 1 and '-' in args.BACKUP_ARCHIVE:
+            parser.error("incremental backups can't be restored from stdin")
 
-def main():
-    parser, args = cli()
-    try:
-        os_conf = Configuration(conf_file=args.config,
-                                conf_section=args.instance,
-                                cli_args=args)
-        build_conf = Configuration(conf_file=args.config,
-                                   conf_section=args.instance,
-                                   cli_args=args)
-    except OsbsException as ex:
-        logger.error("Configuration error: %s", ex.message)
-        return -1
-
-    is_verbose = os_conf.get_verbosity()
-
-    if args.quiet:
-        set_logging(level=logging.WARNING)
-    elif is_verbose:
-        set_logging(level=logging.DEBUG)
-        logger.debug("Logging level set to debug")
-    else:
-        set_logging(level=logging.INFO)
+    return parser, args
 
-    osbs = OSBS(os_conf, build_conf)
 
-    if args.capture_dir is not None:
-        setup_json_capture(osbs, os_conf, args.capture_dir)
+def make_osbs(args, cached=None):
+    """
+    :param args: argparse.Namespace, parsed command line
+    :param cached: OSBS, created for the same global options before, its
+                   connection to OpenShift and caches are reused
+    :return: OSBS
+    :raises OsbsException: when the configuration is invalid
+    """
+    from osbs.api import OSBS
+    from osbs.conf import Configuration
+
+    os_conf = Configuration(conf_file=args.config,
+                            conf_section=args.instance,
+                            cli_args=args)
+    build_conf = Configuration(conf_file=args.config,
+                               conf_section=args.instance,
+                               cli_args=args)
+    if cached is None:
+        return OSBS(os_conf, build_conf)
+
+    # the build configuration comes from the command's arguments
+    osbs = copy.copy(cached)
+    osbs.os_conf = os_conf
+    osbs.build_conf = build_conf
+    return osbs
+
+
+def run_command(args, osbs):
+    """
+    :param args: argparse.Namespace, parsed command line
+    :param osbs: OSBS
+    :return: int, exit code
+    """
+    from osbs.exceptions import OsbsNetworkException, OsbsAuthException, OsbsResponseException
 
+    is_verbose = osbs.os_conf.get_verbosity()
     return_value = -1
     try:
         return_value = args.func(args, osbs)
-    except AttributeError:
-        if hasattr(args, 'func'):
-            raise
-        else:
-            parser.print_help()
     except KeyboardInterrupt:
         print("Quitting on user request.")
         return -1
@@ -1003,5 +1298,104 @@ def main():
     return return_value
 
 
+def can_forward(args):
+    """
+    :param args: argparse.Namespace, parsed command line
+    :return: bool, whether `osbs daemon` can run the command
+    """
+    return (args.command in DAEMON_COMMANDS and not args.no_daemon and
+            args.capture_dir is None and
+            # interactive use needs the terminal and isn't what the daemon is for
+            not sys.stdout.isatty())
+
+
+def forward_command(args):
+    """
+    Run the command in `osbs daemon`
+
+    :param args: argparse.Namespace, parsed command line
+    :return: int, exit code; None when the daemon isn't running
+    """
+    from osbs.cli.daemon import forward
+
+    forwarded = dict((name, value) for name, value in vars(args).items() if name != 'func')
+    # the daemon runs in another directory
+    for name in DAEMON_PATH_OPTIONS:
+        if forwarded.get(name):
+            forwarded[name] = os.path.abspath(os.path.expanduser(forwarded[name]))
+    try:
+        return forward(os.path.expanduser(args.daemon_socket), args.command, forwarded)
+    except KeyboardInterrupt:
+        print("Quitting on user request.")
+        return -1
+
+
+def cmd_daemon(args, parser):
+    from osbs.cli.daemon import OsbsDaemon
+
+    # options which select the OpenShift instance and how to talk to it, the
+    # daemon keeps one OSBS instance for each combination of them
+    global_options = [action.dest for action in parser._actions  # pylint: disable=W0212
+                      if action.option_strings and action.dest not in DAEMON_IGNORED_OPTIONS]
+    commands = dict((name, subparser.get_default('func'))
+                    for action in parser._actions  # pylint: disable=W0212
+                    if isinstance(action, argparse._SubParsersAction)  # pylint: disable=W0212
+                    for name, subparser in action.choices.items()
+                    if name in DAEMON_COMMANDS)
+
+    daemon = OsbsDaemon(os.path.expanduser(args.daemon_socket), commands, global_options,
+                        make_osbs, run_command)
+    # after the daemon redirects output of commands to their clients
+    set_logging(level=logging.DEBUG if args.verbose else
+                logging.WARNING if args.quiet else logging.INFO)
+    logger.info("osbs daemon listening on %s", daemon.socket_path)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+    return 0
+
+
+def main():
+    parser, args = cli()
+    from osbs.cli.capture import setup_json_capture
+    from osbs.exceptions import OsbsException
+
+    if getattr(args, 'func', None) is cmd_daemon:
+        return cmd_daemon(args, parser)
+
+    if can_forward(args):
+        return_value = forward_command(args)
+        if return_value is not None:
+            return return_value
+        logger.debug("osbs daemon isn't running, running %s directly", args.command)
+
+    try:
+        osbs = make_osbs(args)
+    except OsbsException as ex:
+        logger.error("Configuration error: %s", ex.message)
+        return -1
+
+    is_verbose = osbs.os_conf.get_verbosity()
+
+    if args.quiet:
+        set_logging(level=logging.WARNING)
+    elif is_verbose:
+        set_logging(level=logging.DEBUG)
+        logger.debug("Logging level set to debug")
+    else:
+        set_logging(level=logging.INFO)
+
+    if args.capture_dir is not None:
+        setup_json_capture(osbs, osbs.os_conf, args.capture_dir)
+
+    if not hasattr(args, 'func'):
+        parser.print_help()
+        return -1
+    return run_command(args, osbs)
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -10,10 +10,16 @@ from __future__ import print_function, absolute_import, unicode_literals
 import sys
 import logging
 import subprocess
+import threading
+import time
+from collections import OrderedDict
 
 
 logger = logging.getLogger(__name__)
 
+# ANSI control sequence introducer
+CSI = '\x1b['
+
 
 def get_terminal_size():
     """
@@ -195,3 +201,254 @@ class TablePrinter(TableFormatter):
         print(self.header_format_str.format(**self.header_data), file=sys.stderr)
         for row in self.data:
             print(self.format_str.format(**row))
+
+
+class LiveTable(object):
+    """
+    Table of rows identified by a key, which are updated in place
+
+    On a terminal, only lines which changed since the previous update are
+    redrawn; otherwise, or once the table doesn't fit on the terminal, every
+    updated row is appended to the output. Finished rows are removed
+    keep_finished seconds after they finished, so the table stays small
+    however long it is displayed; start() removes them even when no other
+    rows are updated.
+    """
+
+    def __init__(self, header, col_list, keep_finished=60, stream=None, interactive=None,
+                 clock=time.time):
+        """
+        :param header: dict, column name -> column title
+        :param col_list: list of strs, columns to display
+        :param keep_finished: int, number of seconds to keep finished rows for
+        :param stream: file, where to print the table, sys.stdout by default
+        :param interactive: bool, redraw the table in place; by default, when stream is a TTY
+        :param clock: callable, returns current time in seconds
+        """
+        self.header = header
+        self.col_list = col_list
+        self.keep_finished = keep_finished
+        self.stream = stream or sys.stdout
+        if interactive is None:
+            interactive = getattr(self.stream, 'isatty', lambda: False)()
+        self.interactive = interactive
+        self.clock = clock
+
+        # key -> row, in order of appearance
+        self.rows = OrderedDict()
+        # key -> time the row finished
+        self.finished = {}
+        # columns never get narrower, so rows don't jump around as they come and go
+        self.col_widths = dict((col, 0) for col in col_list)
+        self.fit(header)
+        # lines currently displayed on the terminal
+        self._lines = []
+        self._header_printed = False
+        self._terminal_size = None
+        # updates may come from the thread expiring rows
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def terminal_height(self):
+        if self._terminal_size is None:
+            self._terminal_size = get_terminal_size()
+        return self._terminal_size[0]
+
+    @property
+    def terminal_width(self):
+        if self._terminal_size is None:
+            self._terminal_size = get_terminal_size()
+        return self._terminal_size[1]
+
+    def fit(self, row):
+        """
+        widen columns to fit values of the row
+
+        :param row: dict, column name -> value
+        :return: bool, whether any column got wider
+        """
+        widened = False
+        for col in self.col_list:
+            length = len(row.get(col) or '')
+            if length > self.col_widths[col]:
+                self.col_widths[col] = length
+                widened = True
+        return widened
+
+    def format_row(self, row):
+        """
+        :param row: dict, column name -> value
+        :return: str, row formatted with current column widths
+        """
+        return "|".join(" {0:{1}} ".format(row.get(col) or '', self.col_widths[col])
+                        for col in self.col_list)
+
+    def format_separator(self):
+        """
+        :return: str, line separating header from rows
+        """
+        return "+".join("-" * (self.col_widths[col] + 2) for col in self.col_list)
+
+    def update(self, key, row, finished=False):
+        """
+        add new row or replace existing one and display the change
+
+        :param key: str, identifier of the row
+        :param row: dict, column name -> value
+        :param finished: bool, the row won't change anymore and may be removed
+        :return: None
+        """
+        with self._lock:
+            now = self.clock()
+            self.rows[key] = row
+            if finished:
+                self.finished.setdefault(key, now)
+            else:
+                self.finished.pop(key, None)
+            self.fit(row)
+
+            if self.interactive:
+                self.expire(now)
+                if not self.fits_terminal():
+                    # the cursor can't move above the top of the terminal
+                    logger.debug("table doesn't fit on terminal, appending rows")
+                    self.interactive = False
+                    self._header_printed = bool(self._lines)
+            if self.interactive:
+                self.redraw()
+            else:
+                self.append(row)
+                self.expire(now)
+
+    def fits_terminal(self):
+        """
+        :return: bool, whether the whole table and the line below it, where
+                 the cursor stays, fit on the terminal
+        """
+        height = self.terminal_height
+        return height <= 0 or len(self.rows) + 2 < height
+
+    def tick(self):
+        """
+        remove expired rows, even when no rows are updated
+
+        :return: None
+        """
+        with self._lock:
+            if self.expire() and self.interactive:
+                self.redraw()
+
+    def start(self, interval=1):
+        """
+        remove expired rows every interval seconds in a background thread
+
+        :param interval: float, seconds between checks
+        :return: None
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._tick_periodically, args=(interval,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _tick_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            self.tick()
+
+    def close(self):
+        """
+        stop the thread started by start() and remove rows expired by now
+
+        :return: None
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.tick()
+
+    def expire(self, now=None):
+        """
+        remove rows which finished more than keep_finished seconds ago
+
+        :param now: float, current time in seconds
+        :return: list of strs, keys of removed rows
+        """
+        if now is None:
+            now = self.clock()
+        expired = [key for key, finished_at in self.finished.items()
+                   if now - finished_at >= self.keep_finished]
+        for key in expired:
+            del self.finished[key]
+            del self.rows[key]
+        return expired
+
+    def _fit_line(self, line, stream):
+        """
+        :param line: str, formatted line
+        :param stream: file, where the line is printed
+        :return: str, line cut to the terminal width when stream is a terminal,
+                 so wrapped values don't break the columns; piped output is kept
+        """
+        if self.terminal_width > 0 and getattr(stream, 'isatty', lambda: False)():
+            return line[:self.terminal_width]
+        return line
+
+    def append(self, row):
+        """
+        print the row below those printed before, without remembering it
+
+        :param row: dict, column name -> value
+        :return: None
+        """
+        if not self._header_printed:
+            print(self._fit_line(self.format_row(self.header), sys.stderr), file=sys.stderr)
+            print(self._fit_line(self.format_separator(), sys.stderr), file=sys.stderr)
+            self._header_printed = True
+        print(self._fit_line(self.format_row(row), self.stream), file=self.stream)
+        self.stream.flush()
+
+    def get_lines(self):
+        """
+        :return: list of strs, whole table as it should be displayed
+        """
+        lines = [self.format_row(self.header), self.format_separator()]
+        lines.extend(self.format_row(row) for row in self.rows.values())
+        lines = [line.rstrip() for line in lines]
+        if self.terminal_width > 0:
+            # wrapped lines would break cursor movement
+            lines = [line[:self.terminal_width] for line in lines]
+        return lines
+
+    def redraw(self):
+        """
+        rewrite lines which differ from those displayed, the cursor is
+        expected to stay just below the table between calls
+
+        :return: None
+        """
+        lines = self.get_lines()
+        old_lines = self._lines
+
+        start = 0
+        while start < min(len(lines), len(old_lines)) and lines[start] == old_lines[start]:
+            start += 1
+        if start == len(lines) == len(old_lines):
+            return
+
+        out = []
+        if start < len(old_lines):
+            out.append("{0}{1}A".format(CSI, len(old_lines) - start))
+        for index in range(start, len(lines)):
+            if index < len(old_lines) and lines[index] == old_lines[index]:
+                out.append("\n")
+            else:
+                out.append("\r{0}2K{1}\n".format(CSI, lines[index]))
+        if len(lines) < len(old_lines):
+            # erase rows which were removed
+            out.append("{0}J".format(CSI))
+
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self._lines = lines
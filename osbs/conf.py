@@ -11,7 +11,6 @@ import logging
 import os
 import os.path
 import warnings
-from pkg_resources import parse_version
 
 from six.moves import configparser
 from six.moves.urllib.parse import urljoin
@@ -19,7 +18,8 @@ from six.moves.urllib.parse import urljoin
 from osbs.constants import (DEFAULT_CONFIGURATION_FILE, DEFAULT_CONFIGURATION_SECTION,
                             GENERAL_CONFIGURATION_SECTION, DEFAULT_NAMESPACE,
                             DEFAULT_ARRANGEMENT_VERSION, REACTOR_CONFIG_ARRANGEMENT_VERSION,
-                            WORKER_MAX_RUNTIME, ORCHESTRATOR_MAX_RUNTIME)
+                            WORKER_MAX_RUNTIME, ORCHESTRATOR_MAX_RUNTIME,
+                            DEFAULT_LIST_PAGE_SIZE, DEFAULT_OAUTH_TOKEN_CACHE_DIR)
 from osbs.exceptions import OsbsValidationException
 from osbs import utils
 
@@ -123,7 +123,7 @@ class Configuration(object):
                                     GENERAL_CONFIGURATION_SECTION,
                                     "openshift_required_version")
         if verstring:
-            return parse_version(verstring)
+            return utils.parse_version(verstring)
 
         return None
 
@@ -208,6 +208,22 @@ class Configuration(object):
         return self._get_value("namespace", self.conf_section, "namespace",
                                default=DEFAULT_NAMESPACE)
 
+    def get_list_page_size(self):
+        """
+        Get number of items requested at once when listing resources
+
+        :return: int, 0 when lists are requested all at once
+        """
+        value = self._get_value("list_page_size", self.conf_section, "list_page_size",
+                                default=DEFAULT_LIST_PAGE_SIZE)
+        try:
+            page_size = int(value)
+        except ValueError:
+            page_size = -1
+        if page_size < 0:
+            raise OsbsValidationException("Invalid list_page_size: %s" % value)
+        return page_size
+
     def get_flatpak(self):
         return self._get_value("flatpak", self.conf_section, "flatpak",
                                is_bool_val=True)
@@ -242,6 +258,45 @@ class Configuration(object):
     def get_build_json_store(self):
         return self._get_value("build_json_dir", GENERAL_CONFIGURATION_SECTION, "build_json_dir")
 
+    def get_git_mirror_cache_dir(self):
+        return self._get_value("git_mirror_cache_dir", GENERAL_CONFIGURATION_SECTION,
+                               "git_mirror_cache_dir")
+
+    def get_git_mirror_cache_max_size(self):
+        """
+        Get disk budget of git mirror cache
+
+        :return: int, size in bytes, or None for unlimited cache
+        """
+        value = self._get_value("git_mirror_cache_max_size_mb", GENERAL_CONFIGURATION_SECTION,
+                                "git_mirror_cache_max_size_mb")
+        if value is None:
+            return None
+        try:
+            return int(value) * 1024 * 1024
+        except ValueError:
+            raise OsbsValidationException("Invalid git_mirror_cache_max_size_mb: %s" % value)
+
+    def get_repo_info_cache_dir(self):
+        return self._get_value("repo_info_cache_dir", GENERAL_CONFIGURATION_SECTION,
+                               "repo_info_cache_dir")
+
+    def get_plugins_configuration_cache_dir(self):
+        return self._get_value("plugins_configuration_cache_dir", GENERAL_CONFIGURATION_SECTION,
+                               "plugins_configuration_cache_dir")
+
+    def get_oauth_token_cache_dir(self):
+        """
+        Get directory where OAuth tokens are shared by osbs processes
+
+        :return: str, or None when tokens are not cached
+        """
+        value = self._get_value("oauth_token_cache_dir", GENERAL_CONFIGURATION_SECTION,
+                                "oauth_token_cache_dir", default=DEFAULT_OAUTH_TOKEN_CACHE_DIR)
+        if not value:
+            return None
+        return os.path.expanduser(value)
+
     def get_verify_ssl(self):
         return self._get_value("verify_ssl", self.conf_section, "verify_ssl",
                                default=True, is_bool_val=True)
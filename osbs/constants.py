@@ -15,6 +15,12 @@ PY3 = sys.version_info[0] >= 3
 BUILD_JSON_STORE = "/usr/share/osbs/"
 DEFAULT_GIT_REF = "master"
 DEFAULT_CONFIGURATION_FILE = "/etc/osbs.conf"
+# where `osbs daemon` listens for commands
+DEFAULT_DAEMON_SOCKET = "~/.osbs/daemon.sock"
+# where OAuth tokens are shared by osbs processes of the user
+DEFAULT_OAUTH_TOKEN_CACHE_DIR = "~/.osbs"
+# seconds before expiry when OAuth tokens are renewed, at most a tenth of their lifetime
+OAUTH_TOKEN_REFRESH_MARGIN = 300
 DEFAULT_CONFIGURATION_SECTION = "default"
 WORKER_OUTER_TEMPLATE = "worker.json"
 ORCHESTRATOR_OUTER_TEMPLATE = "orchestrator.json"
@@ -65,9 +71,25 @@ SECRETS_PATH = "/var/run/secrets/atomic-reactor"
 
 # Backup/restore
 BACKUP_RESOURCES = ('buildconfigs', 'imagestreams',)
+# compression codecs of backup archives, the first one is the default,
+# tarfile of Python 2 can't compress with xz
+BACKUP_COMPRESSIONS = ('bz2', 'gz', 'xz') if PY3 else ('bz2', 'gz')
+# resources are restored in this order, e.g. buildconfigs refer to imagestreams
+BACKUP_RESTORE_ORDER = ('imagestreams', 'buildconfigs',)
+# number of resources created concurrently when restoring
+RESTORE_WORKERS = 8
+# file in backup archives listing all backed up resources, also the ones which
+# are not in the archive because an earlier (base) backup contains them
+BACKUP_MANIFEST = 'manifest.json'
+BACKUP_MANIFEST_VERSION = 1
 
 CLI_LIST_BUILDS_DEFAULT_COLS = ["name", "status", "image"]
+# number of items requested at once when listing resources
+DEFAULT_LIST_PAGE_SIZE = 500
+
 CLI_WATCH_BUILDS_DEFAULT_COLS = ["changetype", "status", "created", "name"]
+# seconds for which `osbs watch-builds` displays finished builds
+CLI_WATCH_BUILDS_KEEP_FINISHED = 60
 
 # number of digits used for unique image tags
 RAND_DIGITS = 5
@@ -84,6 +106,14 @@ REPO_CONTENT_SETS_FILE = 'content_sets.yml'
 REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS = {'content_sets.yaml',
                                          'content-sets.yml',
                                          'content-sets.yaml'}
+REPO_DOCKERFILE = 'Dockerfile'
+
+# files from the repository which are read when inspecting it, any other
+# content of the repository doesn't have to be fetched
+REPO_INSPECTION_FILES = frozenset({REPO_DOCKERFILE, REPO_CONFIG_FILE, ADDITIONAL_TAGS_FILE,
+                                   REPO_CONTAINER_CONFIG, REPO_CONTENT_SETS_FILE} |
+                                  REPO_CONTAINER_CONFIG_POSSIBLE_TYPOS |
+                                  REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS)
 
 # number of retries for http requests
 HTTP_MAX_RETRIES = 8
@@ -95,7 +125,7 @@ HTTP_BACKOFF_FACTOR = 4
 HTTP_RETRIES_STATUS_FORCELIST = [408, 500, 502, 503, 504]
 
 # HTTP methods that we should retry on
-HTTP_RETRIES_METHODS_WHITELIST = ['GET', 'PUT', 'POST', 'DELETE']
+HTTP_RETRIES_METHODS_WHITELIST = ['GET', 'PUT', 'POST', 'PATCH', 'DELETE']
 
 # requests timeout in seconds
 HTTP_REQUEST_TIMEOUT = 600
@@ -106,6 +136,10 @@ OS_CONFLICT_MAX_RETRIES = 8
 # number of seconds to wait, before retrying on openshift conflict
 OS_CONFLICT_WAIT = 5
 
+# metadata of BuildConfigs maintained by openshift, ignored when comparing them
+BUILD_CONFIG_SERVER_METADATA = ['resourceVersion', 'generation', 'uid', 'creationTimestamp',
+                                'selfLink', 'managedFields']
+
 # number of retries on openshift not found
 OS_NOT_FOUND_MAX_RETRIES = 6
 
@@ -138,6 +172,9 @@ GIT_BACKOFF_FACTOR = 60
 # in the shallow depth of the original clone
 GIT_FETCH_RETRY = 9
 
+# first git version which supports partial clones (git clone --filter)
+GIT_PARTIAL_CLONE_VERSION = (2, 19)
+
 # completion deadlines in hours
 WORKER_MAX_RUNTIME = 3
 ORCHESTRATOR_MAX_RUNTIME = 4
@@ -13,6 +13,8 @@ import time
 import base64
 
 import logging
+import threading
+from multiprocessing.pool import ThreadPool
 from osbs.kerberos_ccache import kerberos_ccache_init
 from osbs.build.build_response import BuildResponse
 from osbs.constants import (DEFAULT_NAMESPACE, BUILD_FINISHED_STATES, BUILD_RUNNING_STATES,
@@ -25,6 +27,7 @@ from osbs.exceptions import (OsbsResponseException, OsbsException,
                              ImportImageFailed, ImportImageFailedServerError)
 from osbs.utils import (graceful_chain_get, retry_on_conflict, retry_on_exception,
                         retry_on_not_found, retry_on_gateway_timeout)
+from osbs.utils.token_cache import OAuthToken
 
 import requests
 from requests.utils import guess_json_utf
@@ -46,6 +49,9 @@ MAX_BAD_RESPONSES = WATCH_RETRY // 3
 WAIT_RETRY_HOURS = 12
 WAIT_RETRY = WAIT_RETRY_HOURS * 3600 // (WATCH_RETRY_SECS * WATCH_RETRY)
 
+# Max number of concurrent requests patching metadata of multiple objects
+METADATA_PATCH_WORKERS = 8
+
 OCP_BUILD_API_V1 = "build.openshift.io/v1"
 OCP_IMAGE_API_V1 = "image.openshift.io/v1"
 OCP_USER_API_V1 = "user.openshift.io/v1"
@@ -75,13 +81,16 @@ class Openshift(object):
                  verbose=False, username=None, password=None, use_kerberos=False,
                  kerberos_keytab=None, kerberos_principal=None, kerberos_ccache=None,
                  client_cert=None, client_key=None, verify_ssl=True, use_auth=None,
-                 token=None, namespace=DEFAULT_NAMESPACE):
+                 token=None, namespace=DEFAULT_NAMESPACE, list_page_size=None,
+                 token_cache=None):
         self.os_api_url = openshift_api_url
         self.k8s_api_url = k8s_api_url
         self._os_oauth_url = openshift_oauth_url
         self.namespace = namespace
         self.verbose = verbose
         self.verify_ssl = verify_ssl
+        # number of items requested at once by iter_pages(), falsy for all of them
+        self.list_page_size = list_page_size
         self._con = HttpSession(verbose=self.verbose)
         self.retries_enabled = True
 
@@ -95,6 +104,12 @@ class Openshift(object):
         self.kerberos_principal = kerberos_principal
         self.kerberos_ccache = kerberos_ccache
         self.token = token
+        # OAuthTokenCache shared with other processes, for tokens got from OAuth server
+        self.token_cache = token_cache
+        # OAuthToken, when self.token was got from OAuth server and can be renewed
+        self._oauth_token = None
+        # threads sharing the instance, e.g. in `osbs daemon`, renew the token once
+        self._token_lock = threading.Lock()
 
         self.ca = None
         auth_credentials_provided = bool(use_kerberos or
@@ -155,10 +170,12 @@ class Openshift(object):
     def _request_args(self, with_auth=True, **kwargs):
         headers = kwargs.pop("headers", {})
         if with_auth and self.use_auth:
-            if self.token is None:
-                self.get_oauth_token()
-            if self.token:
-                headers["Authorization"] = "Bearer %s" % self.token
+            # read once, other threads may renew it meanwhile
+            token = self.token
+            if token is None or self._token_needs_refresh(token):
+                token = self._renew_oauth_token()
+            if token:
+                headers["Authorization"] = "Bearer %s" % token
             else:
                 raise OsbsAuthException("Please check your credentials. "
                                         "Token was not retrieved successfully.")
@@ -180,29 +197,94 @@ class Openshift(object):
 
         return headers, kwargs
 
-    def _post(self, url, with_auth=True, **kwargs):
-        headers, kwargs = self._request_args(with_auth, **kwargs)
-        return self._con.post(
+    def _request(self, method, url, with_auth=True, **kwargs):
+        headers, request_kwargs = self._request_args(with_auth, **kwargs)
+        response = getattr(self._con, method)(
             url, headers=headers, verify_ssl=self.verify_ssl,
-            retries_enabled=self.retries_enabled, **kwargs)
+            retries_enabled=self.retries_enabled, **request_kwargs)
+
+        used_token = headers.get("Authorization", "")[len("Bearer "):]
+        if (with_auth and self.use_auth and self._token_is_renewable(used_token) and
+                response.status_code == http_client.UNAUTHORIZED):
+            # the token was revoked or expired earlier than expected
+            logger.info("OAuth token was rejected, requesting a new one")
+            if kwargs.get('stream'):
+                response.close()
+            self._renew_oauth_token(stale_token=used_token)
+            headers, request_kwargs = self._request_args(with_auth, **kwargs)
+            response = getattr(self._con, method)(
+                url, headers=headers, verify_ssl=self.verify_ssl,
+                retries_enabled=self.retries_enabled, **request_kwargs)
+        return response
+
+    def _post(self, url, with_auth=True, **kwargs):
+        return self._request("post", url, with_auth, **kwargs)
 
     def _get(self, url, with_auth=True, **kwargs):
-        headers, kwargs = self._request_args(with_auth, **kwargs)
-        return self._con.get(
-            url, headers=headers, verify_ssl=self.verify_ssl,
-            retries_enabled=self.retries_enabled, **kwargs)
+        return self._request("get", url, with_auth, **kwargs)
 
     def _put(self, url, with_auth=True, **kwargs):
-        headers, kwargs = self._request_args(with_auth, **kwargs)
-        return self._con.put(
-            url, headers=headers, verify_ssl=self.verify_ssl,
-            retries_enabled=self.retries_enabled, **kwargs)
+        return self._request("put", url, with_auth, **kwargs)
+
+    def _patch(self, url, with_auth=True, **kwargs):
+        return self._request("patch", url, with_auth, **kwargs)
 
     def _delete(self, url, with_auth=True, **kwargs):
-        headers, kwargs = self._request_args(with_auth, **kwargs)
-        return self._con.delete(
-            url, headers=headers, verify_ssl=self.verify_ssl,
-            retries_enabled=self.retries_enabled, **kwargs)
+        return self._request("delete", url, with_auth, **kwargs)
+
+    def _token_is_renewable(self, token):
+        # the token may have been replaced, e.g. by login()
+        oauth_token = self._oauth_token
+        return oauth_token is not None and oauth_token.token == token
+
+    def _token_needs_refresh(self, token):
+        oauth_token = self._oauth_token
+        return (oauth_token is not None and oauth_token.token == token and
+                oauth_token.needs_refresh())
+
+    def _token_cache_key(self):
+        # tokens are only valid for the server and user they were issued for
+        return json.dumps([self.os_oauth_url, self.username, self.use_kerberos,
+                           self.kerberos_principal])
+
+    def _fetch_oauth_token(self):
+        if not self.get_oauth_token():
+            return OAuthToken(None, None, None)
+        return self._oauth_token
+
+    def _renew_oauth_token(self, stale_token=None):
+        """
+        get OAuth token from the cache shared with other processes, or from
+        OAuth server when the cache holds no valid one
+
+        :param stale_token: str, token rejected by OpenShift
+        :return: str, new token, None when none was issued
+        """
+        with self._token_lock:
+            token = self.token
+            if (token is not None and token != stale_token and
+                    not self._token_needs_refresh(token)):
+                # renewed by another thread meanwhile
+                return token
+
+            if self.token_cache is None:
+                oauth_token = self._fetch_oauth_token()
+            else:
+                key = self._token_cache_key()
+                oauth_token = None
+                if stale_token is None:
+                    oauth_token = self.token_cache.get(key)
+                if oauth_token is None:
+                    oauth_token = self.token_cache.refresh(key, self._fetch_oauth_token,
+                                                           stale_token=stale_token)
+
+            if not oauth_token.token:
+                self._oauth_token = None
+                self.token = None
+                return None
+            self._oauth_token = oauth_token
+            self.token = oauth_token.token
+            return self.token
 
     def get_oauth_token(self):
         url = self.os_oauth_url + "?response_type=token&client_id=openshift-challenging-client"
@@ -238,8 +320,12 @@ class Openshift(object):
         parsed_url = urlparse(redir_url)
         fragment = parsed_url.fragment
         parsed_fragment = parse_qs(fragment)
-        self.token = parsed_fragment['access_token'][0]
-        return self.token
+        expires_in = parsed_fragment.get('expires_in')
+        oauth_token = OAuthToken.issue(parsed_fragment['access_token'][0],
+                                       int(expires_in[0]) if expires_in else None)
+        self._oauth_token = oauth_token
+        self.token = oauth_token.token
+        return oauth_token.token
 
     def get_user(self, username="~"):
         """
@@ -325,10 +411,11 @@ class Openshift(object):
         return self._put(url, data=json.dumps(br.json),
                          headers={"Content-Type": "application/json"})
 
-    def list_pods(self, label=None):
+    def list_pods(self, label=None, limit=None, continue_token=None):
         kwargs = {}
         if label is not None:
             kwargs['labelSelector'] = label
+        kwargs.update(self._page_query(limit, continue_token))
         url = self._build_k8s_url("pods/", **kwargs)
         return self._get(url)
 
@@ -341,19 +428,33 @@ class Openshift(object):
         build_config = response.json()
         return build_config
 
-    def get_all_build_configs_by_labels(self, label_selectors):
+    def list_build_configs(self, label_selectors=None, limit=None, continue_token=None):
         """
-        Returns all builds matching a given set of label selectors. It is up to the
-        calling function to filter the results.
+        List build configs matching a given set of label selectors
+
+        :param label_selectors: list of (str, str) tuples, label names and values
+        :param limit: int, maximum number of build configs returned
+        :param continue_token: str, token from previous response to get the next chunk
+        :return: HttpResponse
         """
-        labels = ['%s=%s' % (field, value) for field, value in label_selectors]
-        labels = ','.join(labels)
+        query = {}
+        if label_selectors:
+            labels = ['%s=%s' % (field, value) for field, value in label_selectors]
+            query['labelSelector'] = ','.join(labels)
+        query.update(self._page_query(limit, continue_token))
         url = self._build_url(
             OCP_BUILD_API_V1,
             "buildconfigs/",
-            labelSelector=labels
+            **query
         )
-        return self._get(url).json()['items']
+        return self._get(url)
+
+    def get_all_build_configs_by_labels(self, label_selectors):
+        """
+        Returns all builds matching a given set of label selectors. It is up to the
+        calling function to filter the results.
+        """
+        return list(self.iter_items(self.list_build_configs, label_selectors=label_selectors))
 
     def get_build_config_by_labels(self, label_selectors):
         """
@@ -418,6 +519,21 @@ class Openshift(object):
         check_response(response)
         return response
 
+    def patch_build_config(self, build_config_id, patch_json):
+        """
+        :param build_config_id: str, name of the BuildConfig
+        :param patch_json: str, JSON merge patch (RFC 7386) to apply
+        :return: HttpResponse, containing the updated BuildConfig
+        """
+        url = self._build_url(
+            OCP_BUILD_API_V1,
+            "buildconfigs/%s" % build_config_id
+        )
+        response = self._patch(url, data=patch_json,
+                               headers={"Content-Type": "application/merge-patch+json"})
+        check_response(response)
+        return response
+
     def instantiate_build_config(self, build_config_id):
         api_ver = OCP_BUILD_API_V1
         url = self._build_url(
@@ -557,13 +673,16 @@ class Openshift(object):
         return response.content
 
     def list_builds(self, build_config_id=None, koji_task_id=None,
-                    field_selector=None, labels=None):
+                    field_selector=None, labels=None, limit=None, continue_token=None):
         """
         List builds matching criteria
 
         :param build_config_id: str, only list builds created from BuildConfig
         :param koji_task_id: str, only list builds for Koji Task ID
         :param field_selector: str, field selector for query
+        :param labels: dict, only list builds with these labels
+        :param limit: int, maximum number of builds returned
+        :param continue_token: str, token from previous response to get the next chunk
         :return: HttpResponse
         """
         query = {}
@@ -586,6 +705,7 @@ class Openshift(object):
 
         if field_selector is not None:
             query['fieldSelector'] = field_selector
+        query.update(self._page_query(limit, continue_token))
         url = self._build_url(
             OCP_BUILD_API_V1,
             "builds/",
@@ -593,6 +713,55 @@ class Openshift(object):
         )
         return self._get(url)
 
+    @staticmethod
+    def _page_query(limit, continue_token):
+        query = {}
+        if limit:
+            query['limit'] = limit
+        if continue_token:
+            query['continue'] = continue_token
+        return query
+
+    def iter_pages(self, list_method, page_size=None, **kwargs):
+        """
+        Call list_method repeatedly to get a list in chunks, following continue
+        tokens returned by the server
+
+        :param list_method: callable, one of the list methods accepting
+                            limit and continue_token arguments
+        :param page_size: int, number of items requested at once,
+                          list_page_size by default; 0 gets all of them at once
+        :param kwargs: arguments for list_method
+        :return: generator of dicts, decoded list responses
+        """
+        if page_size is None:
+            page_size = self.list_page_size
+        if page_size:
+            kwargs['limit'] = page_size
+
+        while True:
+            response = list_method(**kwargs)
+            check_response(response)
+            page = response.json()
+            yield page
+
+            # graceful_chain_get() would copy the whole page
+            continue_token = (page.get('metadata') or {}).get('continue')
+            if not page_size or not continue_token:
+                break
+            logger.debug("requesting next %d items", page_size)
+            kwargs['continue_token'] = continue_token
+
+    def iter_items(self, list_method, page_size=None, **kwargs):
+        """
+        Like iter_pages, but yields the listed items one by one
+
+        :return: generator of dicts
+        """
+        for page in self.iter_pages(list_method, page_size=page_size, **kwargs):
+            for item in page.get('items') or []:
+                yield item
+
     def get_build(self, build_id):
         """
 
@@ -644,7 +813,8 @@ class Openshift(object):
 
         return response
 
-    def watch_resource(self, resource_type, resource_name=None, **request_args):
+    def watch_resource(self, resource_type, resource_name=None, reconnect=True,
+                       **request_args):
         """
         Generator function which yields tuples of (change_type, object)
         where:
@@ -656,6 +826,9 @@ class Openshift(object):
             GET (only when resource_name is provided)
 
         - object is the latest version of the object
+
+        When reconnect is False, the generator ends when the server closes
+        the stream, e.g. after timeoutSeconds, instead of watching again.
         """
         def log_and_sleep():
             logger.debug("connection closed, reconnecting in %ds", WATCH_RETRY_SECS)
@@ -728,6 +901,8 @@ class Openshift(object):
 
                 yield (j['type'].lower(), j['object'])
 
+            if not reconnect:
+                return
             log_and_sleep()
 
     def wait(self, build_id, states):
@@ -810,6 +985,10 @@ class Openshift(object):
         labels have to match RE: (([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])? and
         have at most 63 chars
 
+        Updates and replacements are sent as a single PATCH request without
+        reading the object first; other adjustments read the object and
+        replace it as a whole.
+
         :param collection: str, object collection e.g. 'builds'
         :param name: str, name of object
         :param things: str, 'labels' or 'annotations'
@@ -818,6 +997,12 @@ class Openshift(object):
                     self._replace_metadata_things
         :return:
         """
+        if how is self._update_metadata_things:
+            return self.patch_metadata_on_object(collection, name, {things: values})
+        if how is self._replace_metadata_things:
+            return self.patch_metadata_on_object(collection, name, {things: values},
+                                                 replace=True)
+
         api_ver = OCP_RESOURCE_API_VERSION_MAP[collection]
         url = self._build_url(api_ver, "%s/%s" % (collection, name))
         response = self._get(url)
@@ -828,6 +1013,72 @@ class Openshift(object):
         check_response(response)
         return response
 
+    def patch_metadata_on_object(self, collection, name, metadata, replace=False):
+        """
+        update or replace labels and annotations on object with a single request
+
+        :param collection: str, object collection e.g. 'builds'
+        :param name: str, name of object
+        :param metadata: dict, 'labels' and/or 'annotations' -> dict of values
+        :param replace: bool, replace the whole labels or annotations with values
+                        instead of updating them
+        :return: HttpResponse, containing the updated object
+        """
+        api_ver = OCP_RESOURCE_API_VERSION_MAP[collection]
+        url = self._build_url(api_ver, "%s/%s" % (collection, name))
+        if replace:
+            # JSON patch, merge patch can't remove keys it doesn't know about
+            patch = [{'op': 'add', 'path': '/metadata/' + things, 'value': values}
+                     for things, values in metadata.items()]
+            content_type = 'application/json-patch+json'
+        else:
+            patch = {'metadata': metadata}
+            content_type = 'application/merge-patch+json'
+        response = self._patch(url, data=json.dumps(patch),
+                               headers={"Content-Type": content_type})
+        check_response(response)
+        return response
+
+    def patch_metadata_on_objects(self, collection, metadata_by_name, replace=False,
+                                  max_workers=METADATA_PATCH_WORKERS):
+        """
+        update or replace labels and annotations on many objects concurrently,
+        see patch_metadata_on_object()
+
+        :param collection: str, object collection e.g. 'builds'
+        :param metadata_by_name: dict, name of object -> metadata to set
+        :param replace: bool, replace the whole labels or annotations
+        :param max_workers: int, max number of concurrent requests
+        :return: dict, name of object -> HttpResponse
+        :raises OsbsException: when some objects couldn't be patched, after
+                               all the others were
+        """
+        def patch(item):
+            name, metadata = item
+            try:
+                return name, self.patch_metadata_on_object(collection, name, metadata,
+                                                           replace=replace)
+            except OsbsException as exc:
+                return name, exc
+
+        results = {}
+        if metadata_by_name:
+            pool = ThreadPool(min(max_workers, len(metadata_by_name)))
+            try:
+                results = dict(pool.map(patch, metadata_by_name.items()))
+            finally:
+                pool.close()
+                pool.join()
+
+        failed = dict((name, result) for name, result in results.items()
+                      if isinstance(result, Exception))
+        if failed:
+            for name, exc in failed.items():
+                logger.error("failed to patch metadata of %s %s: %s", collection, name, exc)
+            raise OsbsException("Failed to patch metadata of {}: {}".format(
+                collection, ', '.join(sorted(failed))))
+        return results
+
     def update_labels_on_build(self, build_id, labels):
         return self.adjust_attributes_on_object('builds', build_id,
                                                 'labels', labels,
@@ -1048,9 +1299,22 @@ class Openshift(object):
             image['tag']
             for image in import_response.json().get('status', {}).get('images', [])]
 
-    def dump_resource(self, resource_type):
+    def dump_resource(self, resource_type, limit=None, continue_token=None,
+                      resource_version=None):
+        """
+        :param resource_type: str, one of BACKUP_RESOURCES
+        :param limit: int, maximum number of items to return
+        :param continue_token: str, continue token from the previous page
+        :param resource_version: str, list the resources exactly as they were
+                                 at this resourceVersion; ignored for further
+                                 pages, the continue token keeps the version
+        """
         api_ver = OCP_RESOURCE_API_VERSION_MAP[resource_type]
-        url = self._build_url(api_ver, "%s" % resource_type)
+        query = self._page_query(limit, continue_token)
+        if resource_version and not continue_token:
+            query['resourceVersion'] = resource_version
+            query['resourceVersionMatch'] = 'Exact'
+        url = self._build_url(api_ver, "%s" % resource_type, **query)
         response = self._get(url)
         check_response(response)
         return response
@@ -11,7 +11,6 @@ abstraction on top of http api calls
 
 from __future__ import print_function, absolute_import, unicode_literals
 
-from distutils.version import LooseVersion
 import sys
 import logging
 import json
@@ -22,6 +21,7 @@ from osbs.exceptions import OsbsException, OsbsNetworkException, OsbsResponseExc
 from osbs.constants import (
     HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_RETRIES_STATUS_FORCELIST,
     HTTP_RETRIES_METHODS_WHITELIST, HTTP_REQUEST_TIMEOUT)
+from osbs.utils import parse_version
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -54,6 +54,9 @@ class HttpSession(object):
     def put(self, url, **kwargs):
         return self.request(url, "put", **kwargs)
 
+    def patch(self, url, **kwargs):
+        return self.request(url, "patch", **kwargs)
+
     def delete(self, url, **kwargs):
         return self.request(url, "delete", **kwargs)
 
@@ -83,7 +86,12 @@ def make_retry(**kwargs):
     :param kwargs: kwargs acceptable by urllib3.util.Retry class
     :return: urllib3.util.Retry object
     """
-    if LooseVersion(urllib3_version) < LooseVersion('1.15'):
+    try:
+        old_urllib3 = parse_version(urllib3_version) < parse_version('1.15')
+    except ValueError:
+        logger.debug("unknown urllib3 version %r", urllib3_version)
+        old_urllib3 = False
+    if old_urllib3:
         # `raise_on_status` is not supported with older versions of urllib3 (RHEL7)
         kwargs.pop('raise_on_status', None)
 
@@ -137,12 +145,12 @@ class HttpStream(object):
         headers = headers or {}
         method = method.lower()
 
-        if method not in ['post', 'get', 'put', 'delete']:
+        if method not in ['post', 'get', 'put', 'patch', 'delete']:
             raise RuntimeError("Unsupported method '%s' for curl call!" % method)
 
         args = {}
 
-        if method in ['post', 'put']:
+        if method in ['post', 'put', 'patch']:
             headers['Expect'] = ''
 
         if not verify_ssl:
@@ -18,6 +18,7 @@ from osbs.constants import (REPO_CONFIG_FILE,
                             REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS)
 from osbs.utils.labels import Labels
 from osbs.utils.yaml import read_yaml_from_file_path
+from dockerfile_parse import DockerfileParser
 from six import StringIO
 from six.moves.configparser import ConfigParser
 from textwrap import dedent
@@ -107,6 +108,36 @@ class RepoInfo(object):
 
         return self._labels
 
+    def to_dict(self):
+        """
+        Serialize to JSON-compatible dict, see from_dict()
+
+        Only content of the Dockerfile is kept from dockerfile_parser, so it
+        has to be created with cache_content=True.
+        """
+        dockerfile = None
+        if self.dockerfile_parser is not None:
+            dockerfile = {
+                'path': getattr(self.dockerfile_parser, 'dockerfile_path', None),
+                'content': self.dockerfile_parser.cached_content or None,
+            }
+        return {
+            'dockerfile': dockerfile,
+            'configuration': self.configuration.to_dict(),
+            'additional_tags': self.additional_tags.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        dockerfile = data['dockerfile']
+        dockerfile_parser = None
+        if dockerfile is not None:
+            dockerfile_parser = DockerfileParser(dockerfile['path'], cache_content=True)
+            dockerfile_parser.cached_content = dockerfile['content'] or ''
+        return cls(dockerfile_parser,
+                   RepoConfiguration.from_dict(data['configuration']),
+                   AdditionalTagsConfig.from_dict(data['additional_tags']))
+
     @property
     def base_image(self):
         self._ensure_parsed()
@@ -153,6 +184,10 @@ class RepoConfiguration(object):
             possible_filename_typos=REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS
         )
 
+        self._parse_container()
+
+    def _parse_container(self):
+        """Set attributes derived from container.yaml content"""
         # container values may be set to None
         container_compose = self.container.get('compose') or {}
         modules = container_compose.get('modules') or []
@@ -175,6 +210,37 @@ class RepoConfiguration(object):
         self.flatpak_component = flatpak.get('component')
         self.flatpak_name = flatpak.get('name')
 
+    def to_dict(self):
+        """Serialize to JSON-compatible dict, see from_dict()"""
+        return {
+            'container': self.container,
+            'depth': self.depth,
+            'git_uri': self.git_uri,
+            'git_branch': self.git_branch,
+            'git_ref': self.git_ref,
+            'autorebuild_enabled': self.is_autorebuild_enabled(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create RepoConfiguration from the output of to_dict() without
+        reading any repository files
+        """
+        config = cls.__new__(cls)
+        config._config_parser = ConfigParser()
+        config._config_parser.readfp(StringIO(cls.DEFAULT_CONFIG))   # pylint: disable=W1505; py2
+        config._config_parser.set('autorebuild', 'enabled',
+                                  'true' if data['autorebuild_enabled'] else 'false')
+        config.container = data['container']
+        config.depth = data['depth']
+        config.git_uri = data['git_uri']
+        config.git_branch = data['git_branch']
+        config.git_ref = data['git_ref']
+        config.dir_path = ''
+        config._parse_container()
+        return config
+
     def is_autorebuild_enabled(self):
         return self._config_parser.getboolean('autorebuild', 'enabled')
 
@@ -328,6 +394,25 @@ class AdditionalTagsConfig(object):
     def tags(self):
         return list(self._tags)
 
+    def to_dict(self):
+        """Serialize to JSON-compatible dict, see from_dict()"""
+        return {
+            'tags': sorted(self._tags),
+            'from_container_yaml': self._from_container_yaml,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create AdditionalTagsConfig from the output of to_dict() without
+        reading the additional tags file
+        """
+        tags_config = cls.__new__(cls)
+        tags_config._tags = set(data['tags'])
+        tags_config._from_container_yaml = data['from_container_yaml']
+        tags_config._file_path = None
+        return tags_config
+
     @property
     def from_container_yaml(self):
         return self._from_container_yaml
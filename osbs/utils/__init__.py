@@ -6,9 +6,11 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 from __future__ import print_function, absolute_import, unicode_literals
-from functools import wraps
+from functools import total_ordering, wraps
 import contextlib
 import copy
+import heapq
+import json
 import logging
 import os
 import os.path
@@ -19,6 +21,7 @@ import subprocess
 import sys
 import tempfile
 import tarfile
+import threading
 import time
 import requests
 from collections import namedtuple
@@ -28,7 +31,10 @@ from hashlib import sha256
 from osbs.repo_utils import RepoConfiguration, RepoInfo, AdditionalTagsConfig
 from osbs.constants import (OS_CONFLICT_MAX_RETRIES, OS_CONFLICT_WAIT,
                             GIT_MAX_RETRIES, GIT_BACKOFF_FACTOR, GIT_FETCH_RETRY,
-                            OS_NOT_FOUND_MAX_RETRIES, OS_NOT_FOUND_MAX_WAIT)
+                            GIT_PARTIAL_CLONE_VERSION,
+                            OS_NOT_FOUND_MAX_RETRIES, OS_NOT_FOUND_MAX_WAIT,
+                            REPO_INSPECTION_FILES, BUILD_CONFIG_SERVER_METADATA,
+                            BACKUP_COMPRESSIONS, BACKUP_MANIFEST)
 
 # This was moved to a separate file - import here for external API compatibility
 from osbs.utils.labels import Labels  # noqa: F401
@@ -36,6 +42,12 @@ from osbs.utils.labels import Labels  # noqa: F401
 from six.moves import http_client
 from six.moves.urllib.parse import urlparse
 
+try:
+    from shutil import which
+except ImportError:
+    # Python 2
+    from distutils.spawn import find_executable as which
+
 try:
     # py3
     if not hasattr(datetime.now(), 'timestamp'):
@@ -83,35 +95,110 @@ class RegistryURI(object):
         return self.uri
 
 
+# compression codec -> command compressing stdin to stdout in multiple threads,
+# the output has to be a single stream, which tarfile can read back
+PARALLEL_COMPRESSORS = {
+    'gz': ['pigz', '-c'],
+    'bz2': ['lbzip2', '-c'],
+    'xz': ['xz', '-T0', '-c'],
+}
+
+
+def get_parallel_compressor(compression):
+    """
+    :param compression: str, compression codec, one of gz, bz2, xz
+    :return: list of strs, command compressing with multiple threads,
+             None when no such command is installed
+    """
+    command = PARALLEL_COMPRESSORS.get(compression)
+    if command is None or which(command[0]) is None:
+        return None
+    return command
+
+
 class TarWriter(object):
-    def __init__(self, outfile, directory=None):
-        mode = "w|bz2"
-        if hasattr(outfile, "write"):
-            self.tarfile = tarfile.open(fileobj=outfile, mode=mode)
-        else:
-            self.tarfile = tarfile.open(name=outfile, mode=mode)
+    def __init__(self, outfile, directory=None, compression='bz2', parallel=False):
+        """
+        :param outfile: str or file, path of the archive or file to write it to
+        :param directory: str, directory of files in the archive
+        :param compression: str, compression codec, one of BACKUP_COMPRESSIONS
+        :param parallel: bool, compress with an external multi-threaded
+                         compressor when it is installed
+        """
+        if compression not in BACKUP_COMPRESSIONS:
+            raise OsbsValidationException("unsupported compression %s, use one of: %s" %
+                                          (compression, ', '.join(BACKUP_COMPRESSIONS)))
+        self.compressor = None
+        self._own_outfile = None
+
+        command = get_parallel_compressor(compression) if parallel else None
+        if command:
+            if not hasattr(outfile, "write"):
+                outfile = self._own_outfile = open(outfile, 'wb')
+            try:
+                outfile.flush()
+                # the compressor writes directly to the file descriptor
+                self.compressor = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                                   stdout=outfile.fileno())
+            except (AttributeError, IOError, ValueError):
+                # there's no file descriptor to write to (io.UnsupportedOperation)
+                logger.debug("cannot compress with %s", command[0])
+            else:
+                logger.debug("compressing with %s", ' '.join(command))
+                self.tarfile = tarfile.open(fileobj=self.compressor.stdin, mode="w|")
+
+        if self.compressor is None:
+            mode = "w|" + compression
+            if hasattr(outfile, "write"):
+                self.tarfile = tarfile.open(fileobj=outfile, mode=mode)
+            else:
+                self.tarfile = tarfile.open(name=outfile, mode=mode)
         self.directory = directory or ""
 
     def __enter__(self):
         return self
 
     def __exit__(self, typ, val, tb):
-        self.tarfile.close()
+        self.close()
+
+    def close(self):
+        try:
+            self.tarfile.close()
+        finally:
+            if self.compressor is not None:
+                self.compressor.stdin.close()
+                self.compressor.wait()
+            if self._own_outfile is not None:
+                self._own_outfile.close()
+        if self.compressor is not None and self.compressor.returncode != 0:
+            raise OsbsException("compression failed with exit code %d" %
+                                self.compressor.returncode)
 
     def write_file(self, name, content):
         buf = BytesIO(content)
+        self.add_file(name, buf, len(content))
+
+    def add_file(self, name, fileobj, size):
+        """
+        copy size bytes from fileobj to the archive
+
+        :param name: str, name of the file in the archive directory
+        :param fileobj: file, opened for reading bytes
+        :param size: int, number of bytes to copy
+        """
         arcname = os.path.join(self.directory, name)
 
         ti = tarfile.TarInfo(arcname)
-        ti.size = len(content)
-        self.tarfile.addfile(ti, fileobj=buf)
+        ti.size = size
+        self.tarfile.addfile(ti, fileobj=fileobj)
 
 
 class TarReader(object):
     TarFile = namedtuple('TarFile', ['filename', 'fileobj'])
 
     def __init__(self, infile):
-        mode = "r|bz2"
+        # compression is detected, so any codec TarWriter supports can be read
+        mode = "r|*"
         if hasattr(infile, "read"):
             self.tarfile = tarfile.open(fileobj=infile, mode=mode)
         else:
@@ -135,6 +222,212 @@ class TarReader(object):
         self.tarfile.close()
 
 
+class Checkpoint(object):
+    """
+    Set of completed tasks identified by strings, which is persisted in a
+    file, one per line, so that an interrupted job can skip them when resumed
+    """
+
+    def __init__(self, path):
+        """
+        :param path: str, file to store the completed tasks in; it's created
+                     when it doesn't exist, otherwise loaded and appended to
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self._done.update(line.rstrip('\n') for line in f)
+            logger.info("%d tasks completed before, according to %s", len(self._done), path)
+        self._file = open(path, 'a')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, val, tb):
+        self.close()
+
+    def __contains__(self, task):
+        return task in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def add(self, task):
+        """
+        record the task as completed, it's safe to call from multiple threads
+
+        :param task: str, identifier of the task, without newlines
+        """
+        with self._lock:
+            self._file.write(task + '\n')
+            # an interrupted process must not lose completed tasks
+            self._file.flush()
+            self._done.add(task)
+
+    def close(self):
+        self._file.close()
+
+    def remove(self):
+        """
+        close and remove the file, once the job is complete
+        """
+        self.close()
+        os.remove(self.path)
+
+
+class _JSONStream(object):
+    """
+    Incremental reader of JSON values from a file
+    """
+
+    WHITESPACE = re.compile(r'\s*')
+    NUMBER_TAIL = re.compile(r'[-+.eE0-9]*')
+
+    def __init__(self, fileobj, chunk_size):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+
+    def read(self):
+        """
+        :return: bool, whether there was more data to read
+        """
+        chunk = self.fileobj.read(self.chunk_size)
+        if not chunk:
+            return False
+        # forget what was parsed already
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        :return: str, next character which is not whitespace, '' at the end
+        """
+        while True:
+            self.pos = self.WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read():
+                return ''
+
+    def expect(self, chars):
+        """
+        :param chars: str, characters allowed at this position
+        :return: str, the character found
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of %r at %r" % (chars, self.buf[self.pos:][:20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        :return: next JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # the value may be incomplete
+                if not self.read():
+                    raise
+                continue
+            # so may be a number, when its digits reach the end of the buffer
+            if (isinstance(value, (int, float)) and
+                    self.NUMBER_TAIL.match(self.buf, end).end() == len(self.buf) and
+                    self.read()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(fileobj, key='items', chunk_size=64 * 1024):
+    """
+    Iterate over the list stored under key of a JSON object, e.g. list of
+    resources from OpenShift, without loading the whole document to memory;
+    other values of the object are skipped
+
+    :param fileobj: file, opened for reading text
+    :param key: str, name of the list in the JSON object
+    :param chunk_size: int, number of characters read at once
+    :return: generator of decoded items
+    :raises ValueError: when the file doesn't contain a JSON object
+    """
+    stream = _JSONStream(fileobj, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            return
+
+
+def make_manifest_entry(resource_type, kind, resource):
+    """
+    Describe a backed up resource, so that later backups can skip it when it
+    doesn't change; see BACKUP_MANIFEST
+
+    :param resource_type: str, one of BACKUP_RESOURCES
+    :param kind: str, kind of the resource, used when it doesn't have one
+    :param resource: dict, the resource
+    :return: dict
+    """
+    metadata = resource.get('metadata') or {}
+    return {
+        'resource': resource_type,
+        'kind': resource.get('kind') or kind,
+        'name': metadata.get('name'),
+        'uid': metadata.get('uid'),
+        'resourceVersion': metadata.get('resourceVersion'),
+    }
+
+
+def get_manifest_version(entry):
+    """
+    :param entry: dict, resource or its manifest entry
+    :return: tuple, (uid, resourceVersion), which changes with every update
+    """
+    metadata = entry.get('metadata', entry) or {}
+    return metadata.get('uid'), metadata.get('resourceVersion')
+
+
+def read_backup_manifest(archive):
+    """
+    :param archive: str, path of a backup archive
+    :return: dict, its manifest
+    :raises OsbsException: when the archive doesn't have a manifest, it was
+                           created by an older version
+    """
+    for f in TarReader(archive):
+        if os.path.basename(f.filename) == BACKUP_MANIFEST:
+            manifest = json.loads(f.fileobj.read().decode('utf-8'))
+            f.fileobj.close()
+            return manifest
+        f.fileobj.close()
+    raise OsbsException("%s has no %s" % (archive, BACKUP_MANIFEST))
+
+
 def graceful_chain_get(d, *args):
     if not d:
         return None
@@ -161,6 +454,48 @@ def graceful_chain_del(d, *args):
         pass
 
 
+def external_sort(items, key, chunk_size=10000):
+    """
+    Sort items without holding all of them in memory
+
+    Items are sorted in chunks of chunk_size, which are written to temporary
+    files and merged lazily. Items and their keys have to be JSON serializable.
+    The sort is stable.
+
+    :param items: iterable of items to sort
+    :param key: callable, returns sort key of an item
+    :param chunk_size: int, maximum number of items held in memory while sorting
+    :return: generator of items in sorted order
+    """
+    def read_run(run):
+        for line in run:
+            yield tuple(json.loads(line))
+
+    runs = []
+    try:
+        chunk = []
+        # the index makes the sort stable and items are never compared
+        for index, item in enumerate(items):
+            chunk.append((key(item), index, item))
+            if len(chunk) >= chunk_size:
+                chunk.sort()
+                run = tempfile.TemporaryFile(mode='w+')
+                for entry in chunk:
+                    run.write(json.dumps(entry) + '\n')
+                run.seek(0)
+                runs.append(run)
+                chunk = []
+        chunk.sort()
+
+        if runs:
+            logger.debug("merging %d sorted runs", len(runs) + 1)
+        for _, _, item in heapq.merge(*([read_run(run) for run in runs] + [chunk])):
+            yield item
+    finally:
+        for run in runs:
+            run.close()
+
+
 def has_triggers(build_config):
     return graceful_chain_get(build_config, 'spec', 'triggers') is not None
 
@@ -197,9 +532,78 @@ def buildconfig_update(orig, new, remove_nonexistent_keys=False):
                 orig[k] = v
 
 
+def json_merge_patch(orig, new):
+    """Computes JSON merge patch (RFC 7386) which transforms `orig` into `new`.
+
+    Only keys with changed values are included, keys missing in `new` are
+    set to None (removed). Nested dicts are patched recursively, other
+    values, lists included, are replaced as a whole.
+
+    Note that merge patches can't express None values, keys set to None
+    in `new` are removed.
+
+    :param orig: dict, original object
+    :param new: dict, updated object
+    :return: dict, patch, empty when the objects are equal
+    """
+    patch = {}
+    for k in orig:
+        if k not in new:
+            patch[k] = None
+    for k, v in new.items():
+        if k not in orig:
+            patch[k] = v
+        elif isinstance(orig[k], dict) and isinstance(v, dict):
+            nested = json_merge_patch(orig[k], v)
+            if nested:
+                patch[k] = nested
+        elif orig[k] != v:
+            patch[k] = v
+    return patch
+
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        value = dict((k, _drop_empty(v)) for k, v in value.items())
+        return dict((k, v) for k, v in value.items() if v not in (None, {}, [], ''))
+    if isinstance(value, list):
+        return [_drop_empty(v) for v in value]
+    return value
+
+
+def normalize_triggers(triggers):
+    """Returns copy of BuildConfig triggers without lastTriggeredImageID,
+    which is set by OpenShift when an image change trigger fires.
+
+    :param triggers: list of dicts, BuildConfig triggers
+    :return: list of dicts
+    """
+    normalized = copy.deepcopy(triggers or [])
+    for trigger in normalized:
+        graceful_chain_del(trigger, 'imageChange', 'lastTriggeredImageID')
+    return _drop_empty(normalized)
+
+
+def normalize_build_config(build_config):
+    """Returns copy of BuildConfig suitable for comparison of what it configures.
+
+    Fields maintained by the server (status, resourceVersion and other
+    metadata of the object) are dropped, as well as empty values, which
+    the server may add as defaults.
+
+    :param build_config: dict, BuildConfig
+    :return: dict
+    """
+    normalized = copy.deepcopy(build_config)
+    normalized.pop('status', None)
+    for field in BUILD_CONFIG_SERVER_METADATA:
+        graceful_chain_del(normalized, 'metadata', field)
+    return _drop_empty(normalized)
+
+
 @contextlib.contextmanager
 def checkout_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RETRIES,
-                      branch=None, depth=None):
+                      branch=None, depth=None, sparse_paths=None, mirror_cache=None):
     """
     clone provided git repo to target_dir, optionally checkout provided commit
     yield the ClonedRepoData and delete the repo when finished
@@ -210,27 +614,46 @@ def checkout_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX
     :param retry_times: int, number of retries for git clone
     :param branch: str, optional branch of the commit, required if depth is provided
     :param depth: int, optional expected depth
+    :param sparse_paths: iterable of str, optional paths relative to the repo root,
+                         when provided only these paths are checked out, see clone_git_repo
+    :param mirror_cache: GitMirrorCache, optional cache to clone the repo from
     :return: str, int, commit ID of HEAD
     """
     tmpdir = tempfile.mkdtemp()
     target_dir = target_dir or os.path.join(tmpdir, "repo")
     try:
-        yield clone_git_repo(git_url, target_dir, commit, retry_times, branch, depth)
+        yield clone_git_repo(git_url, target_dir, commit, retry_times, branch, depth,
+                             sparse_paths=sparse_paths, mirror_cache=mirror_cache)
     finally:
         shutil.rmtree(tmpdir)
 
 
 def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RETRIES, branch=None,
-                   depth=None):
+                   depth=None, sparse_paths=None, mirror_cache=None):
     """
     clone provided git repo to target_dir, optionally checkout provided commit
 
+    When sparse_paths are provided, only the given paths are checked out. If
+    the local git supports partial clones, the clone is made without any file
+    contents (--filter=blob:none), so contents of other files are never
+    fetched; commits are fetched as usual (up to depth, if given), so commit ID
+    and commit depth are computed the same way as for full clones. Older git
+    versions and servers which don't support partial clones get all objects,
+    but only sparse_paths are checked out anyway.
+
+    When mirror_cache is provided, the local mirror of the repo is updated
+    first and the repo is cloned from it, objects are hardlinked from the mirror
+    when possible. The mirror holds full history, so depth is not needed then.
+
     :param git_url: str, git repo to clone
     :param target_dir: str, filesystem path where the repo should be cloned
     :param commit: str, commit to checkout, SHA-1 or ref
     :param retry_times: int, number of retries for git clone
     :param branch: str, optional branch of the commit, required if depth is provided
     :param depth: int, optional expected depth
+    :param sparse_paths: iterable of str, optional paths relative to the repo root
+                         which should be checked out
+    :param mirror_cache: GitMirrorCache, optional cache to clone the repo from
     :return: str, int, commit ID of HEAD
     """
     retry_delay = GIT_BACKOFF_FACTOR
@@ -243,27 +666,46 @@ def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RE
     cmd = ["git", "clone"]
     if branch:
         cmd += ["-b", branch, "--single-branch"]
-        if depth:
+        if depth and not mirror_cache:
             cmd += ["--depth", str(depth)]
     elif depth:
         logger.warning("branch not provided for %s, depth setting ignored", git_url)
         depth = None
+    if mirror_cache:
+        # local clones are never shallow
+        depth = None
 
-    cmd += [git_url, target_dir]
+    if sparse_paths:
+        # partial clones aren't supported for local clones
+        if not mirror_cache and git_supports_partial_clone():
+            cmd += ["--filter=blob:none"]
+        cmd += ["--no-checkout"]
 
-    logger.debug("cloning '%s'", cmd)
+    logger.debug("cloning '%s'", cmd + [git_url, target_dir])
     repo_commit = ''
     repo_depth = None
     for counter in range(retry_times + 1):
         try:
             # we are using check_output, even though we aren't using
             # the return value, but we will get 'output' in exception
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+            if mirror_cache:
+                with mirror_cache.mirror(git_url) as mirror_path:
+                    subprocess.check_output(cmd + [mirror_path, target_dir],
+                                            stderr=subprocess.STDOUT)
+                # further fetches go to the real repo
+                subprocess.check_call(["git", "remote", "set-url", "origin", git_url],
+                                      cwd=target_dir)
+            else:
+                subprocess.check_output(cmd + [git_url, target_dir], stderr=subprocess.STDOUT)
+            if sparse_paths:
+                setup_sparse_checkout(target_dir, sparse_paths)
             try:
                 repo_commit, repo_depth = reset_git_repo(target_dir, commit, depth)
             except OsbsCommitNotFound as exc:
                 raise OsbsCommitNotFound("Commit {} is not reachable in branch {}, reason: {}"
                                          .format(commit, branch, exc))
+            if sparse_paths:
+                checkout_sparse_symlink_targets(target_dir, sparse_paths)
             break
         except subprocess.CalledProcessError as exc:
             if counter != retry_times:
@@ -277,60 +719,187 @@ def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RE
     return ClonedRepoData(target_dir, repo_commit, repo_depth)
 
 
+_git_supports_partial_clone = None
+
+
+def git_supports_partial_clone():
+    """
+    :return: bool, whether the local git can make partial clones, older
+             versions reject the --filter option
+    """
+    global _git_supports_partial_clone  # pylint: disable=global-statement
+    if _git_supports_partial_clone is None:
+        try:
+            output = subprocess.check_output(["git", "--version"], universal_newlines=True)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            logger.debug("cannot get git version: %s", exc)
+            output = ''
+        match = re.search(r'(\d+)\.(\d+)', output)
+        version = tuple(int(part) for part in match.groups()) if match else (0, 0)
+        _git_supports_partial_clone = version >= GIT_PARTIAL_CLONE_VERSION
+        logger.debug("git %s partial clones", "supports" if _git_supports_partial_clone
+                     else "doesn't support")
+    return _git_supports_partial_clone
+
+
+def setup_sparse_checkout(target_dir, sparse_paths):
+    """
+    restrict the working tree of git clone in target_dir to given paths
+
+    This only configures the sparse checkout, the working tree is populated
+    by the following checkout or reset.
+
+    :param target_dir: str, filesystem path where the repo is cloned
+    :param sparse_paths: iterable of str, paths relative to the repo root
+    """
+    # core.sparseCheckout with an explicit pattern file is supported by every
+    # git version, unlike the 'git sparse-checkout' command
+    cmd = ["git", "config", "core.sparseCheckout", "true"]
+    subprocess.check_call(cmd, cwd=target_dir)
+
+    git_dir = subprocess.check_output(["git", "rev-parse", "--git-dir"], cwd=target_dir,
+                                      universal_newlines=True).strip()
+    info_dir = os.path.join(target_dir, git_dir, "info")
+    if not os.path.isdir(info_dir):
+        os.makedirs(info_dir)
+
+    # leading slash anchors the pattern to the repo root
+    patterns = sorted('/' + path.lstrip('/') for path in sparse_paths)
+    logger.debug("sparse checkout of %s", patterns)
+    with open(os.path.join(info_dir, "sparse-checkout"), "w") as f:
+        f.write('\n'.join(patterns) + '\n')
+
+
+def checkout_sparse_symlink_targets(target_dir, sparse_paths):
+    """
+    add targets of symlinks in sparse checkout of target_dir to the checkout
+
+    e.g. Dockerfile is commonly a symlink to a Dockerfile in a subdirectory,
+    whose content has to be checked out as well
+
+    :param target_dir: str, filesystem path where the repo is cloned
+    :param sparse_paths: iterable of str, paths which are checked out
+    """
+    repo_root = os.path.realpath(target_dir)
+    targets = set()
+    for path in sparse_paths:
+        full_path = os.path.join(target_dir, path)
+        if not os.path.islink(full_path):
+            continue
+        link_target = os.path.realpath(full_path)
+        if not link_target.startswith(repo_root + os.sep):
+            logger.debug("symlink %s points outside of the repo, ignoring", path)
+            continue
+        targets.add(os.path.relpath(link_target, repo_root))
+
+    targets -= set(sparse_paths)
+    if not targets:
+        return
+
+    logger.debug("checking out symlink targets %s", sorted(targets))
+    setup_sparse_checkout(target_dir, set(sparse_paths) | targets)
+    # re-apply sparse checkout patterns to the working tree
+    subprocess.check_call(["git", "read-tree", "-mu", "HEAD"], cwd=target_dir)
+
+
+def _rev_parse_commit(target_dir, git_reference):
+    """
+    :return: str, commit ID git_reference points to in clone in target_dir,
+             or None if the commit isn't available there
+    """
+    cmd = ['git', 'rev-parse', '--verify', '--quiet', '{}^{{commit}}'.format(git_reference)]
+    try:
+        return subprocess.check_output(cmd, cwd=target_dir, universal_newlines=True).strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def _fetch_commit(target_dir, commit_id):
+    """
+    fetch a single commit into shallow clone in target_dir
+
+    Servers speaking protocol v2, or configured with
+    uploadpack.allowReachableSHA1InWant, send any reachable commit
+    requested by its SHA-1, so it doesn't have to be searched for by
+    deepening the clone.
+
+    :return: bool, True if the commit was fetched
+    """
+    cmd = ['git', '-c', 'protocol.version=2', 'fetch', '--depth', '1', 'origin', commit_id]
+    logger.debug("fetching commit directly with '%s'", cmd)
+    try:
+        subprocess.check_output(cmd, cwd=target_dir, stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError as exc:
+        logger.debug("server refused to send commit %s: %s", commit_id, exc.output)
+        return False
+    return True
+
+
+def _deepen_until_found(target_dir, git_reference, retry_depth):
+    """
+    deepen shallow clone in target_dir until git_reference is available
+
+    :return: str, commit ID of git_reference, or None if not found
+    """
+    deepen = retry_depth
+    for _ in range(GIT_FETCH_RETRY - 1):
+        deepen *= 2
+        cmd = ["git", "fetch", "--depth", str(deepen)]
+        logger.debug("Couldn't find commit %s, increasing depth with '%s'", git_reference, cmd)
+        subprocess.check_call(cmd, cwd=target_dir)
+        commit_id = _rev_parse_commit(target_dir, git_reference)
+        if commit_id:
+            return commit_id
+    return None
+
+
 def reset_git_repo(target_dir, git_reference, retry_depth=None):
     """
     hard reset git clone in target_dir to given git_reference
 
+    In a shallow clone, commits outside of the fetched history are first
+    requested directly by their SHA-1 and only if the server refuses that,
+    the clone is deepened repeatedly until the commit is found.
+
+    Commit depth is counted only over commits between git_reference and the
+    tip of the cloned branch, not over the whole history.
+
     :param target_dir: str, filesystem path where the repo is cloned
     :param git_reference: str, any valid git reference
     :param retry_depth: int, if the repo was cloned with --shallow, this is the expected
                         depth of the commit
     :return: str and int, commit ID of HEAD and commit depth of git_reference
     """
-    deepen = retry_depth or 0
-    base_commit_depth = 0
-    for _ in range(GIT_FETCH_RETRY):
-        try:
-            if not deepen:
-                cmd = ['git', 'rev-list', '--count', git_reference]
-                base_commit_depth = int(subprocess.check_output(cmd, cwd=target_dir)) - 1
-            cmd = ["git", "reset", "--hard", git_reference]
-            logger.debug("Resetting current HEAD: '%s'", cmd)
-            subprocess.check_call(cmd, cwd=target_dir)
-            break
-        except subprocess.CalledProcessError:
-            if not deepen:
-                raise OsbsCommitNotFound('cannot find commit {} in repo {}'.format(
-                                         git_reference, target_dir))
-            deepen *= 2
-            cmd = ["git", "fetch", "--depth", str(deepen)]
-            subprocess.check_call(cmd, cwd=target_dir)
-            logger.debug("Couldn't find commit %s, increasing depth with '%s'", git_reference,
-                         cmd)
-    else:
+    commit_id = _rev_parse_commit(target_dir, git_reference)
+    if not commit_id and retry_depth:
+        if looks_like_git_hash(git_reference) and _fetch_commit(target_dir, git_reference):
+            commit_id = _rev_parse_commit(target_dir, git_reference)
+        if not commit_id:
+            commit_id = _deepen_until_found(target_dir, git_reference, retry_depth)
+    if not commit_id:
         raise OsbsCommitNotFound('cannot find commit {} in repo {}'.format(
-                                  git_reference, target_dir))
-
-    cmd = ["git", "rev-parse", "HEAD"]
-    logger.debug("getting SHA-1 of provided ref '%s'", git_reference)
-    commit_id = subprocess.check_output(cmd, cwd=target_dir, universal_newlines=True)
-    commit_id = commit_id.strip()
-    logger.info("commit ID = %s", commit_id)
+                                 git_reference, target_dir))
 
     final_commit_depth = None
-    if not deepen:
-        cmd = ['git', 'rev-list', '--count', 'HEAD']
-        final_commit_depth = int(subprocess.check_output(cmd, cwd=target_dir)) - base_commit_depth
+    if not retry_depth:
+        # HEAD is still the tip of the cloned branch
+        cmd = ['git', 'rev-list', '--count', '{}..HEAD'.format(commit_id)]
+        final_commit_depth = int(subprocess.check_output(cmd, cwd=target_dir)) + 1
+
+    cmd = ["git", "reset", "--hard", commit_id]
+    logger.debug("Resetting current HEAD: '%s'", cmd)
+    subprocess.check_call(cmd, cwd=target_dir)
+    logger.info("commit ID = %s", commit_id)
 
     return commit_id, final_commit_depth
 
 
 @contextlib.contextmanager
-def paused_builds(osbs, quota_name=None, ignore_quota_errors=False):
+def paused_builds(osbs, quota_name=None, ignore_quota_errors=False, timeout=None):
     try:
         logger.info("pausing builds")
         try:
-            osbs.pause_builds(quota_name=quota_name)
+            osbs.pause_builds(quota_name=quota_name, timeout=timeout)
         except OsbsResponseException as e:
             if ignore_quota_errors and (e.status_code == requests.codes.FORBIDDEN):
                 logger.warning("Ignoring resourcequota error")
@@ -352,9 +921,37 @@ def looks_like_git_hash(git_ref):
     return all(ch in string.hexdigits for ch in git_ref) and len(git_ref) == 40
 
 
-def get_repo_info(git_uri, git_ref, git_branch=None, depth=None):
-    with checkout_git_repo(git_uri, commit=git_ref, branch=git_branch,
-                           depth=depth) as code_dir_info:
+def get_repo_info(git_uri, git_ref, git_branch=None, depth=None, sparse=True,
+                  mirror_cache=None, repo_info_cache=None):
+    """
+    inspect git repo at given git_ref and return its RepoInfo
+
+    :param git_uri: str, git repo to inspect
+    :param git_ref: str, commit to inspect, SHA-1 or ref
+    :param git_branch: str, optional branch of the commit, required if depth is provided
+    :param depth: int, optional expected depth
+    :param sparse: bool, fetch and check out only files needed for inspection
+                   instead of full clone of the repo
+    :param mirror_cache: GitMirrorCache, optional cache to clone the repo from
+    :param repo_info_cache: RepoInfoCache, optional cache of inspected commits,
+                            when the commit git_ref points to is cached, the repo
+                            isn't cloned at all
+    :return: RepoInfo
+    """
+    cache_key = None
+    if repo_info_cache:
+        cache_key = repo_info_cache.resolve(git_uri, git_ref, git_branch=git_branch,
+                                            mirror_cache=mirror_cache)
+        if cache_key:
+            repo_info = repo_info_cache.get(cache_key, git_uri=git_uri, git_ref=git_ref,
+                                            git_branch=git_branch)
+            if repo_info:
+                return repo_info
+
+    sparse_paths = REPO_INSPECTION_FILES if sparse else None
+    with checkout_git_repo(git_uri, commit=git_ref, branch=git_branch, depth=depth,
+                           sparse_paths=sparse_paths,
+                           mirror_cache=mirror_cache) as code_dir_info:
         code_dir = code_dir_info.repo_path
         depth = code_dir_info.commit_depth
         dfp = DockerfileParser(os.path.join(code_dir), cache_content=True)
@@ -363,6 +960,10 @@ def get_repo_info(git_uri, git_ref, git_branch=None, depth=None):
         tags_config = AdditionalTagsConfig(dir_path=code_dir,
                                            tags=config.container.get('tags', set()))
     repo_info = RepoInfo(dfp, config, tags_config)
+
+    # git_ref may have moved since it was resolved
+    if cache_key and cache_key.commit_id == code_dir_info.commit_id:
+        repo_info_cache.put(cache_key, repo_info)
     return repo_info
 
 
@@ -508,6 +1109,125 @@ def get_instance_token_file_name(instance):
     return '{}/.osbs/{}.token'.format(os.path.expanduser('~'), instance)
 
 
+@total_ordering
+class Version(object):
+    """
+    Comparable version number, e.g. 3.11.0, 1.0rc1 or 1.26.5.post1
+
+    Lightweight replacement of pkg_resources.parse_version(), which takes a
+    long time to import. Pre-release, post-release, development and local
+    parts are ordered as in PEP 440; any other suffix, e.g. a distribution
+    release such as 3.11.0-0.el7, is kept and sorts after the plain release,
+    like LooseVersion did.
+    """
+
+    VERSION_RE = re.compile(r'^\s*v?(?P<release>\d+(?:\.\d+)*)(?P<suffix>.*?)\s*$')
+    SUFFIX_RE = re.compile(r'^(?:[-_.]?(?P<pre>a|alpha|b|beta|c|rc|pre|preview)'
+                           r'[-_.]?(?P<pre_number>\d*))?'
+                           r'(?:[-_.]?(?:post|rev|r)[-_.]?(?P<post_number>\d*))?'
+                           r'(?:[-_.]?dev[-_.]?(?P<dev_number>\d*))?'
+                           r'(?:\+(?P<local>[a-z0-9._-]+))?$',
+                           re.IGNORECASE)
+    PRE_NAMES = {'alpha': 'a', 'beta': 'b', 'c': 'rc', 'pre': 'rc', 'preview': 'rc'}
+
+    def __init__(self, version):
+        """
+        :param version: str, version to parse
+        :raises ValueError: when version doesn't start with a number
+        """
+        match = self.VERSION_RE.match(version)
+        if not match:
+            raise ValueError("Invalid version: %r" % version)
+
+        self.release = tuple(int(part) for part in match.group('release').split('.'))
+        self.base_version = '.'.join(str(part) for part in self.release)
+        self.pre = self.post = self.dev = self.local = None
+        # suffix which isn't a PEP 440 one
+        self.extra = ''
+
+        suffix = match.group('suffix')
+        suffix_match = self.SUFFIX_RE.match(suffix)
+        if suffix_match is None:
+            self.extra = suffix.lower()
+        else:
+            pre = suffix_match.group('pre')
+            if pre:
+                pre = pre.lower()
+                self.pre = (self.PRE_NAMES.get(pre, pre),
+                            int(suffix_match.group('pre_number') or 0))
+            if suffix_match.group('post_number') is not None:
+                self.post = int(suffix_match.group('post_number') or 0)
+            if suffix_match.group('dev_number') is not None:
+                self.dev = int(suffix_match.group('dev_number') or 0)
+            if suffix_match.group('local'):
+                self.local = suffix_match.group('local').lower()
+
+        release = list(self.release)
+        # 1.0 is the same as 1.0.0
+        while len(release) > 1 and release[-1] == 0:
+            release.pop()
+        if self.pre:
+            # pre-releases come before the release; 'a' < 'b' < 'rc'
+            pre_key = (0,) + self.pre
+        elif self.dev is not None and self.post is None:
+            # 1.0.dev0 comes even before 1.0a1
+            pre_key = (-1,)
+        else:
+            pre_key = (1,)
+        self._key = (tuple(release), pre_key,
+                     -1 if self.post is None else self.post,
+                     (1,) if self.dev is None else (0, self.dev),
+                     self._segments_key(re.split(r'[-_.]', self.local or '')),
+                     self._segments_key(re.findall(r'\d+|[a-z]+', self.extra)))
+
+    @staticmethod
+    def _segments_key(segments):
+        # numbers compare numerically and sort after strings, as in PEP 440
+        return tuple((1, int(segment)) if segment.isdigit() else (0, segment)
+                     for segment in segments if segment)
+
+    def __str__(self):
+        version = self.base_version
+        if self.pre:
+            version += '{}{}'.format(*self.pre)
+        if self.post is not None:
+            version += '.post{}'.format(self.post)
+        if self.dev is not None:
+            version += '.dev{}'.format(self.dev)
+        if self.local:
+            version += '+{}'.format(self.local)
+        return version + self.extra
+
+    def __repr__(self):
+        return '<Version({!r})>'.format(str(self))
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __lt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key < other._key
+
+
+def parse_version(version):
+    """
+    :param version: str, version to parse
+    :return: Version
+    :raises ValueError: when version doesn't start with a number
+    """
+    return Version(version)
+
+
 def sanitize_version(version):
     """
     Take parse_version() output and standardize output from older
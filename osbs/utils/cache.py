@@ -0,0 +1,90 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class EntryCache(object):
+    """
+    Base of caches which keep recently used entries in memory and all
+    entries optionally in cache_dir, which may be shared by multiple processes
+
+    Subclasses decide how entries are keyed, serialized and validated.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=64):
+        """
+        :param cache_dir: str, optional directory to store entries in
+        :param max_entries: int, number of entries kept in memory
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        # instances are shared by threads of `osbs daemon`
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _recall(self, key):
+        """
+        :param key: str
+        :return: entry kept in memory, None if there's none
+        """
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                # least recently used entries are first
+                self._memory[key] = entry
+            return entry
+
+    def _remember(self, key, entry):
+        """
+        keep entry in memory, forget least recently used ones over max_entries
+
+        :param key: str
+        :param entry: object, mustn't be modified afterwards
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+            self._memory[key] = entry
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key, content):
+        """
+        store entry in cache_dir, errors are only logged
+
+        :param key: str
+        :param content: str, serialized entry
+        :return: bool, True when the entry was stored
+        """
+        entry_path = self._entry_path(key)
+        tmp_path = None
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # write to a temporary file first, so other processes never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError):
+            logger.exception("failed to store cache entry %s", entry_path)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
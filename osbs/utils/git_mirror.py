@@ -0,0 +1,226 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import contextlib
+import fcntl
+import logging
+import os
+import re
+import shutil
+import subprocess
+from hashlib import sha256
+
+from six.moves.urllib.parse import urlsplit, urlunsplit
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_git_url(git_url):
+    """
+    normalize git URL, so that different spellings of the same repository
+    are cached in the same mirror
+
+    - scheme and host are lowercased and credentials are dropped
+    - trailing slashes and '.git' suffix are stripped
+    - local paths are made absolute
+
+    :param git_url: str, git repo URL or path
+    :return: str
+    """
+    url = git_url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-len('.git')].rstrip('/')
+
+    parts = urlsplit(url)
+    if parts.scheme and parts.netloc:
+        netloc = parts.netloc.rsplit('@', 1)[-1].lower()
+        return urlunsplit((parts.scheme.lower(), netloc, parts.path, parts.query, ''))
+    if parts.scheme == 'file':
+        return 'file://' + os.path.abspath(parts.path)
+    if ':' not in url:
+        # local path, scp-like URLs (host:path) are kept as they are
+        return os.path.abspath(url)
+    return url
+
+
+def strip_git_url_credentials(git_url):
+    """
+    :param git_url: str, git repo URL
+    :return: str, git_url without user name and password
+    """
+    parts = urlsplit(git_url)
+    if parts.scheme and '@' in parts.netloc:
+        netloc = parts.netloc.rsplit('@', 1)[-1]
+        return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+    return git_url
+
+
+class GitMirrorCache(object):
+    """
+    Cache of bare mirrors of git repositories
+
+    Every repository is mirrored once and later only incrementally fetched.
+    Clones are then made from the local mirror. Mirrors are protected by file
+    locks, so the cache can be shared by multiple processes, and the least
+    recently used mirrors are evicted when the cache grows over max_size.
+    Disk usage of every mirror is recorded after it is updated, so eviction
+    doesn't need to walk the whole cache.
+
+    Credentials in git URLs are only used for fetching, mirrors don't store
+    them in their configuration.
+    """
+
+    MIRROR_SUFFIX = '.git'
+    LOCK_SUFFIX = '.lock'
+    SIZE_SUFFIX = '.size'
+
+    def __init__(self, cache_dir, max_size=None):
+        """
+        :param cache_dir: str, directory holding the mirrors
+        :param max_size: int, optional disk budget of the cache in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def mirror_path(self, git_url):
+        """
+        :param git_url: str, git repo URL
+        :return: str, path of the bare mirror of git_url
+        """
+        key = normalize_git_url(git_url)
+        digest = sha256(key.encode('utf-8')).hexdigest()[:16]
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', os.path.basename(key)) or 'repo'
+        return os.path.join(self.cache_dir,
+                            '{}-{}{}'.format(name, digest, self.MIRROR_SUFFIX))
+
+    @contextlib.contextmanager
+    def mirror(self, git_url):
+        """
+        update mirror of git_url and yield its path
+
+        While in the context, the mirror is locked against updates and eviction
+        by other processes, so it can be safely cloned.
+
+        :param git_url: str, git repo URL
+        :raises subprocess.CalledProcessError: when the mirror cannot be updated
+        """
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        path = self.mirror_path(git_url)
+        with open(path + self.LOCK_SUFFIX, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                while True:
+                    self._update(git_url, path)
+                    if self.max_size:
+                        self._record_size(path)
+                    # other processes may clone the mirror as well now; the
+                    # lock isn't converted atomically, so another process may
+                    # have evicted the mirror meanwhile
+                    fcntl.flock(lock_file, fcntl.LOCK_SH)
+                    if os.path.isdir(path):
+                        break
+                    logger.debug("git mirror '%s' was evicted, creating it again", path)
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield path
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        self.evict()
+
+    def _update(self, git_url, path):
+        safe_url = strip_git_url_credentials(git_url)
+        if os.path.isdir(path):
+            logger.info("updating git mirror '%s' of '%s'", path, safe_url)
+            # URL may differ in credentials or spelling from the one mirrored
+            subprocess.check_call(['git', 'remote', 'set-url', 'origin', safe_url], cwd=path)
+            cmd = ['git', 'fetch', '--prune', git_url, '+refs/*:refs/*']
+            subprocess.check_output(cmd, cwd=path, stderr=subprocess.STDOUT)
+        else:
+            logger.info("creating git mirror '%s' of '%s'", path, safe_url)
+            tmp_path = path + '.tmp'
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path)
+            cmd = ['git', 'clone', '--mirror', git_url, tmp_path]
+            try:
+                subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            subprocess.check_call(['git', 'remote', 'set-url', 'origin', safe_url],
+                                  cwd=tmp_path)
+            os.rename(tmp_path, path)
+
+        # mtime of the mirror marks when it was used for the last time
+        os.utime(path, None)
+
+    @staticmethod
+    def _disk_usage(path):
+        size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    size += os.lstat(os.path.join(dirpath, filename)).st_size
+                except OSError:
+                    # removed meanwhile, e.g. by git gc
+                    continue
+        return size
+
+    def _record_size(self, path):
+        size = self._disk_usage(path)
+        tmp_path = path + self.SIZE_SUFFIX + '.tmp'
+        with open(tmp_path, 'w') as size_file:
+            size_file.write(str(size))
+        os.rename(tmp_path, path + self.SIZE_SUFFIX)
+        return size
+
+    def _recorded_size(self, path):
+        try:
+            with open(path + self.SIZE_SUFFIX) as size_file:
+                return int(size_file.read())
+        except (IOError, OSError, ValueError):
+            # mirrors created before sizes were recorded
+            return self._record_size(path)
+
+    def evict(self):
+        """
+        remove least recently used mirrors until the cache fits into max_size
+
+        Mirrors which are being used by other processes are skipped.
+        """
+        if not self.max_size or not os.path.isdir(self.cache_dir):
+            return
+
+        mirrors = []
+        for entry in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, entry)
+            if entry.endswith(self.MIRROR_SUFFIX) and os.path.isdir(path):
+                mirrors.append((os.stat(path).st_mtime, path, self._recorded_size(path)))
+
+        total = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total <= self.max_size:
+                break
+
+            with open(path + self.LOCK_SUFFIX, 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    logger.debug("git mirror '%s' is in use, not evicting", path)
+                    continue
+                try:
+                    logger.info("evicting git mirror '%s' (%d bytes)", path, size)
+                    shutil.rmtree(path)
+                    if os.path.exists(path + self.SIZE_SUFFIX):
+                        os.remove(path + self.SIZE_SUFFIX)
+                    total -= size
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,185 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import copy
+import json
+import logging
+import pkgutil
+import subprocess
+from collections import namedtuple
+from hashlib import sha256
+
+from osbs.repo_utils import RepoInfo
+from osbs.utils import looks_like_git_hash
+from osbs.utils.cache import EntryCache
+from osbs.utils.git_mirror import normalize_git_url
+
+
+logger = logging.getLogger(__name__)
+
+# bump when format of cached entries changes
+REPO_INFO_CACHE_FORMAT = 1
+
+RepoInfoKey = namedtuple('RepoInfoKey', ['git_uri', 'commit_id', 'branch_commit_id'])
+
+_container_schema_digest = None
+
+
+def container_schema_digest():
+    """
+    :return: str, digest of container.yaml schema, cached entries are only
+             valid for the schema they were validated with
+    """
+    global _container_schema_digest  # pylint: disable=global-statement
+    if _container_schema_digest is None:
+        schema = pkgutil.get_data('osbs', 'schemas/container.json')
+        _container_schema_digest = sha256(schema).hexdigest()
+    return _container_schema_digest
+
+
+def _resolve_remote_ref(refs, git_ref, git_branch=None):
+    """
+    resolve git_ref the same way it would be resolved in a fresh clone
+
+    :param refs: dict, ref name -> commit ID, as listed by git ls-remote
+    :return: str, commit ID, or None when git_ref cannot be resolved
+             from ref names, e.g. for abbreviated IDs or relative refs
+    """
+    if looks_like_git_hash(git_ref):
+        return git_ref.lower()
+    if git_ref == 'HEAD' and git_branch:
+        # HEAD of a single branch clone
+        git_ref = git_branch
+
+    candidates = [git_ref, 'refs/' + git_ref, 'refs/tags/' + git_ref, 'refs/heads/' + git_ref]
+    for candidate in candidates:
+        # peeled annotated tags are listed as <tag>^{}
+        commit_id = refs.get(candidate + '^{}') or refs.get(candidate)
+        if commit_id:
+            return commit_id
+    return None
+
+
+def ls_remote(git_uri):
+    """
+    :param git_uri: str, git repo
+    :return: dict, ref name -> commit ID of all refs in the repo
+    """
+    output = subprocess.check_output(['git', 'ls-remote', git_uri], universal_newlines=True)
+    refs = {}
+    for line in output.splitlines():
+        commit_id, _, ref = line.partition('\t')
+        refs[ref] = commit_id
+    return refs
+
+
+def _rev_parse(repo_path, git_ref):
+    cmd = ['git', 'rev-parse', '--verify', '--quiet', '{}^{{commit}}'.format(git_ref)]
+    try:
+        return subprocess.check_output(cmd, cwd=repo_path, universal_newlines=True).strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+class RepoInfoCache(EntryCache):
+    """
+    Cache of RepoInfo objects keyed by the commit they were inspected at
+
+    Entries are invalidated by changes of the container.yaml schema.
+    """
+
+    def resolve(self, git_uri, git_ref, git_branch=None, mirror_cache=None):
+        """
+        resolve git_ref (and tip of git_branch, which commit depth is relative to)
+        to commit IDs without cloning the repo
+
+        :param git_uri: str, git repo
+        :param git_ref: str, commit to inspect, SHA-1 or ref
+        :param git_branch: str, optional branch of the commit
+        :param mirror_cache: GitMirrorCache, optional, resolve refs in the mirror
+                             of the repo instead of listing remote refs
+        :return: RepoInfoKey, or None when git_ref cannot be resolved
+        """
+        git_ref = git_ref or 'master'
+        try:
+            if mirror_cache:
+                with mirror_cache.mirror(git_uri) as mirror_path:
+                    if git_ref == 'HEAD' and git_branch:
+                        git_ref = git_branch
+                    commit_id = _rev_parse(mirror_path, git_ref)
+                    branch_commit_id = git_branch and _rev_parse(mirror_path, git_branch)
+            else:
+                refs = ls_remote(git_uri)
+                commit_id = _resolve_remote_ref(refs, git_ref, git_branch)
+                branch_commit_id = git_branch and refs.get('refs/heads/' + git_branch)
+        except subprocess.CalledProcessError as exc:
+            logger.info("cannot resolve %s in %s: %s", git_ref, git_uri, exc)
+            return None
+
+        if not commit_id:
+            logger.debug("%s doesn't name a commit in %s, not using cache", git_ref, git_uri)
+            return None
+        return RepoInfoKey(normalize_git_url(git_uri), commit_id, branch_commit_id or None)
+
+    def _digest(self, key):
+        data = [REPO_INFO_CACHE_FORMAT, container_schema_digest()] + list(key)
+        return sha256(json.dumps(data).encode('utf-8')).hexdigest()
+
+    def get(self, key, git_uri=None, git_ref=None, git_branch=None):
+        """
+        :param key: RepoInfoKey
+        :param git_uri: str, optional git repo to set in returned RepoInfo,
+                        it may be spelled differently than the cached one
+        :param git_ref: str, optional ref to set in returned RepoInfo,
+                        different refs may point to the cached commit
+        :param git_branch: str, optional branch to set in returned RepoInfo
+        :return: new RepoInfo instance, or None if not cached
+        """
+        digest = self._digest(key)
+        data = self._recall(digest)
+        if data is None and self.cache_dir:
+            try:
+                with open(self._entry_path(digest)) as f:
+                    data = json.load(f)
+            except (IOError, OSError):
+                pass
+            except ValueError:
+                logger.warning("ignoring corrupted repo info cache entry %s", digest)
+            else:
+                self._remember(digest, data)
+
+        if data is None:
+            logger.debug("repo info for %s not cached", key)
+            return None
+
+        logger.info("using cached repo info for %s at %s", key.git_uri, key.commit_id)
+        # RepoInfo keeps parts of data, e.g. the container dict, which
+        # callers may modify
+        repo_info = RepoInfo.from_dict(copy.deepcopy(data))
+        repo_info.configuration.git_uri = git_uri or repo_info.configuration.git_uri
+        repo_info.configuration.git_ref = git_ref or repo_info.configuration.git_ref
+        repo_info.configuration.git_branch = git_branch or repo_info.configuration.git_branch
+        return repo_info
+
+    def put(self, key, repo_info):
+        """
+        :param key: RepoInfoKey
+        :param repo_info: RepoInfo, inspected at key.commit_id
+        """
+        data = repo_info.to_dict()
+        try:
+            serialized = json.dumps(data, sort_keys=True)
+        except (TypeError, ValueError) as exc:
+            logger.debug("repo info for %s cannot be cached: %s", key, exc)
+            return
+
+        digest = self._digest(key)
+        self._remember(digest, json.loads(serialized))
+        if self.cache_dir:
+            self._store(digest, serialized)
@@ -0,0 +1,146 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import fcntl
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+from osbs.constants import OAUTH_TOKEN_REFRESH_MARGIN
+
+
+logger = logging.getLogger(__name__)
+
+
+class OAuthToken(namedtuple('OAuthToken', ['token', 'expires', 'refresh_after'])):
+    """
+    OAuth token with the times (seconds since epoch) when it expires and
+    when it should be renewed; both are None when the lifetime is unknown
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def issue(cls, token, expires_in=None):
+        """
+        :param token: str, OAuth access token, just issued
+        :param expires_in: int, lifetime of the token in seconds
+        :return: OAuthToken
+        """
+        if expires_in is None:
+            return cls(token, None, None)
+        now = time.time()
+        margin = min(OAUTH_TOKEN_REFRESH_MARGIN, expires_in / 10.0)
+        return cls(token, now + expires_in, now + expires_in - margin)
+
+    def needs_refresh(self):
+        return self.refresh_after is not None and time.time() >= self.refresh_after
+
+
+class OAuthTokenCache(object):
+    """
+    OAuth token of one OSBS instance, shared by all processes of the user
+
+    The token is stored in a JSON file readable only by the user, together
+    with the key identifying the OAuth server and credentials it was issued
+    for. New tokens are requested under a file lock, so when the token
+    expires, only one of the processes using it gets a new one and the
+    others pick it up from the cache.
+    """
+
+    LOCK_SUFFIX = '.lock'
+
+    def __init__(self, path):
+        """
+        :param path: str, path of the file holding the token
+        """
+        self.path = path
+
+    def get(self, key):
+        """
+        :param key: str, identifies the OAuth server and credentials
+        :return: OAuthToken, or None when no token is cached for key or it
+                 should be renewed
+        """
+        try:
+            with open(self.path) as cache_file:
+                entry = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+
+        oauth_token = OAuthToken(entry.get('token'), entry.get('expires'),
+                                 entry.get('refresh_after'))
+        if not oauth_token.token or oauth_token.needs_refresh():
+            return None
+        return oauth_token
+
+    def refresh(self, key, fetch, stale_token=None):
+        """
+        get a new token, unless another process got one meanwhile
+
+        :param key: str, identifies the OAuth server and credentials
+        :param fetch: callable, requests a new OAuthToken from the server;
+                      its token is empty when none was issued
+        :param stale_token: str, token rejected by the server, it is
+                            removed from the cache and never returned
+        :return: OAuthToken
+        """
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, 0o700)
+            lock_file = open(self.path + self.LOCK_SUFFIX, 'a')
+        except (IOError, OSError) as ex:
+            # e.g. read-only home directory, tokens are just not shared then
+            logger.debug("cannot use OAuth token cache %s: %s", self.path, ex)
+            return fetch()
+
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cached = self.get(key)
+                if cached is not None:
+                    if cached.token != stale_token:
+                        logger.debug("using OAuth token renewed by another process")
+                        return cached
+                    self._remove()
+
+                oauth_token = fetch()
+                if oauth_token.token:
+                    self._write(key, oauth_token)
+                return oauth_token
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except (IOError, OSError) as ex:
+            logger.debug("cannot remove OAuth token from %s: %s", self.path, ex)
+
+    def _write(self, key, oauth_token):
+        entry = {
+            'key': key,
+            'token': oauth_token.token,
+            'expires': oauth_token.expires,
+            'refresh_after': oauth_token.refresh_after,
+        }
+        # readers never see a partially written token
+        tmp_path = self.path + '.tmp'
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump(entry, cache_file)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as ex:
+            logger.debug("cannot store OAuth token in %s: %s", self.path, ex)
@@ -9,18 +9,80 @@ of the BSD license. See the LICENSE file for details.
 
 from __future__ import absolute_import, unicode_literals
 
-from pkg_resources import resource_stream
 from osbs.exceptions import OsbsValidationException
 
-import codecs
+import copy
 import json
 import jsonschema
 import logging
+import pkgutil
+import six
 import yaml
+from collections import OrderedDict
+from hashlib import sha256
+from jsonschema.exceptions import best_match
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    from yaml import CSafeLoader as FastSafeLoader, CSafeDumper as FastSafeDumper
+except ImportError:
+    FastSafeLoader = yaml.SafeLoader
+    FastSafeDumper = yaml.SafeDumper
 
 
 logger = logging.getLogger(__name__)
 
+# number of validated YAML documents remembered by read_yaml()
+YAML_RESULTS_CACHE_SIZE = 256
+
+# (package, schema) -> SchemaValidator
+_validators = {}
+# (package, schema, digest of YAML content) -> (data, validation error message)
+_results = OrderedDict()
+
+
+def safe_load(stream):
+    """
+    yaml.safe_load() using libyaml when it is available
+
+    Invalid content is parsed again by the pure Python loader, so errors
+    are reported with the same messages regardless of libyaml.
+
+    :param stream: str or file, YAML content
+    :return: loaded data
+    """
+    if hasattr(stream, 'read'):
+        stream = stream.read()
+    try:
+        return yaml.load(stream, Loader=FastSafeLoader)
+    except yaml.YAMLError:
+        if FastSafeLoader is yaml.SafeLoader:
+            raise
+    return yaml.load(stream, Loader=yaml.SafeLoader)
+
+
+def safe_dump(data, stream=None, **kwargs):
+    """
+    yaml.safe_dump() using libyaml when it is available
+
+    libyaml output differs from the pure Python one for top level scalars
+    (no document end marker) and for non-BMP characters with allow_unicode,
+    these are always dumped by the pure Python emitter, so the output doesn't
+    depend on libyaml being installed.
+
+    :param data: data to serialize
+    :param stream: file, optional stream to write to
+    :return: str, YAML content when stream is not given
+    """
+    dumper = yaml.SafeDumper
+    if isinstance(data, (dict, list)) and not kwargs.get('allow_unicode'):
+        dumper = FastSafeDumper
+    return yaml.dump_all([data], stream, Dumper=dumper, **kwargs)
+
 
 def read_yaml_from_file_path(file_path, schema, package=None):
     """
@@ -39,11 +101,40 @@ def read_yaml(yaml_data, schema, package=None):
     :param schema: string, file path to the JSON schema
     :package: string, package name containing the schema
     """
-    data = yaml.safe_load(yaml_data)
     package = package or 'osbs'
-    schema = load_schema(package, schema)
-    validate_with_schema(data, schema)
-    return data
+    content = yaml_data.encode('utf-8') if isinstance(yaml_data, six.text_type) else yaml_data
+    key = (package, schema, sha256(content).hexdigest())
+
+    result = _results.pop(key, None)
+    if result is None:
+        data = safe_load(yaml_data)
+        validator = get_schema_validator(package, schema)
+        result = (data, validator.get_error_message(data))
+    else:
+        logger.debug("using cached validation result of %s", key)
+    _results[key] = result
+    while len(_results) > YAML_RESULTS_CACHE_SIZE:
+        _results.popitem(last=False)
+
+    data, error_message = result
+    if error_message:
+        raise OsbsValidationException(error_message)
+    # callers may modify the data, keep the cached copy intact
+    return copy.deepcopy(data)
+
+
+def get_schema_validator(package, schema):
+    """
+    :package: string, package name containing the schema
+    :param schema: string, file path to the JSON schema
+    :return: SchemaValidator, loaded and checked once per schema
+    """
+    key = (package, schema)
+    validator = _validators.get(key)
+    if validator is None:
+        validator = SchemaValidator(load_schema(package, schema))
+        _validators[key] = validator
+    return validator
 
 
 def load_schema(package, schema):
@@ -53,8 +144,10 @@ def load_schema(package, schema):
     """
     # Read schema from file
     try:
-        resource = resource_stream(package, schema)
-        schema = codecs.getreader('utf-8')(resource)
+        resource = pkgutil.get_data(package, schema)
+        if resource is None:
+            # the package cannot be found (Python 2) or has no resources
+            raise ImportError("cannot load resources of %s" % package)
     except ImportError:
         logger.error('Unable to find package %s', package)
         raise
@@ -64,7 +157,7 @@ def load_schema(package, schema):
 
     # Load schema into Dict
     try:
-        schema = json.load(schema)
+        schema = json.loads(resource.decode('utf-8'))
     except ValueError:
         logger.error('unable to decode JSON schema, cannot validate')
         raise
@@ -76,20 +169,74 @@ def validate_with_schema(data, schema):
     :param data: dict, data to be validated
     :param schema: dict, schema to validate with
     """
-    validator = jsonschema.Draft4Validator(schema=schema)
-    try:
-        jsonschema.Draft4Validator.check_schema(schema)
-        validator.validate(data)
-    except jsonschema.SchemaError:
-        logger.error('invalid schema, cannot validate')
-        raise
-    except jsonschema.ValidationError as exc:
+    SchemaValidator(schema).validate(data)
+
+
+class SchemaValidator(object):
+    """
+    JSON schema checked and compiled for repeated validation
+
+    When fastjsonschema is available, it is used to accept valid data
+    quickly; invalid data are always reported by jsonschema, so error
+    messages don't depend on the backend.
+    """
+
+    DRAFT4 = 'http://json-schema.org/draft-04/schema#'
+
+    def __init__(self, schema):
+        """
+        :param schema: dict, schema to validate with
+        """
+        try:
+            jsonschema.Draft4Validator.check_schema(schema)
+        except jsonschema.SchemaError:
+            logger.error('invalid schema, cannot validate')
+            raise
+        self.validator = jsonschema.Draft4Validator(schema=schema)
+        self.fast_validate = self._compile_fast(schema)
+
+    def _compile_fast(self, schema):
+        if fastjsonschema is None:
+            return None
+        # validate with the same draft as jsonschema does
+        schema = dict(schema)
+        schema['$schema'] = self.DRAFT4
+        try:
+            return fastjsonschema.compile(schema, use_default=False, use_formats=False)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("cannot compile schema with fastjsonschema: %s", exc)
+            return None
+
+    def get_error_message(self, data):
+        """
+        :param data: dict, data to be validated
+        :return: str, message describing why data are invalid, None for valid data
+        """
+        if self.fast_validate is not None:
+            try:
+                self.fast_validate(data)
+                return None
+            except fastjsonschema.JsonSchemaException:
+                pass
+
+        errors = list(self.validator.iter_errors(data))
+        if not errors:
+            return None
+
+        exc = best_match(errors)
         logger.debug("schema validation error: %s", exc)
-        exc_message = get_error_message(exc)
-        for error in validator.iter_errors(data):
-            error_message = get_error_message(error)
-            logger.debug("validation error: %s", error_message)
-        raise OsbsValidationException(exc_message)
+        for error in errors:
+            logger.debug("validation error: %s", get_error_message(error))
+        return get_error_message(exc)
+
+    def validate(self, data):
+        """
+        :param data: dict, data to be validated
+        :raises OsbsValidationException: when data are invalid
+        """
+        error_message = self.get_error_message(data)
+        if error_message:
+            raise OsbsValidationException(error_message)
 
 
 def get_error_message(error):
@@ -0,0 +1,96 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import json
+
+import pytest
+import yaml
+
+from osbs.build.batch_render import LocalReactorConfig, render_batch, render_user_params
+from osbs.constants import BUILD_TYPE_WORKER, SECRETS_PATH
+
+from tests.build_.test_build_requestv2 import (get_sample_user_params,
+                                               get_sample_source_params)
+
+
+REACTOR_CONFIG = {
+    'version': 1,
+    'source_registry': {'url': 'registry.example.com'},
+    'registries_organization': 'spam',
+    'required_secrets': ['kojisecret'],
+}
+
+
+def image_build_user_params_json(**update_args):
+    conf_args = {
+        'build_from': 'image:buildroot:latest',
+        'reactor_config_map': 'reactor-config-map',
+    }
+    update_args.setdefault('build_type', BUILD_TYPE_WORKER)
+    update_args.setdefault('platform', 'x86_64')
+    user_params = get_sample_user_params(conf_args=conf_args, update_args=update_args,
+                                         no_source=True)
+    return user_params.to_json()
+
+
+def test_render_user_params():
+    reactor_config = LocalReactorConfig(REACTOR_CONFIG)
+    user_params_json = image_build_user_params_json()
+    result = render_user_params(user_params_json, reactor_config)
+
+    build_json = result['build_json']
+    env = {var['name']: var for var in build_json['spec']['strategy']['customStrategy']['env']}
+    assert env['REACTOR_CONFIG']['valueFrom']['configMapKeyRef']['name'] == 'reactor-config-map'
+    user_params = json.loads(env['USER_PARAMS']['value'])
+    assert user_params['imagestream_name'].startswith('registry.example.com-spam-')
+    secrets = build_json['spec']['strategy']['customStrategy']['secrets']
+    assert secrets == [{'secretSource': {'name': 'kojisecret'},
+                        'mountPath': SECRETS_PATH + '/kojisecret'}]
+
+    plugins = result['plugins_configuration']
+    assert 'prebuild_plugins' in plugins
+
+    # data of reactor config are not shared between builds
+    assert reactor_config.reactor_config_data == REACTOR_CONFIG
+    assert render_user_params(user_params_json, reactor_config) == result
+
+
+def test_render_source_container_user_params():
+    user_params_json = get_sample_source_params().to_json()
+    result = render_user_params(user_params_json, LocalReactorConfig(REACTOR_CONFIG))
+    assert result['build_json']['metadata']['name'].startswith('sources-')
+    assert 'prebuild_plugins' in result['plugins_configuration']
+
+
+def test_local_reactor_config_from_file(tmpdir):
+    path = str(tmpdir.join('config.yaml'))
+    with open(path, 'w') as f:
+        yaml.safe_dump(REACTOR_CONFIG, f)
+    reactor_config = LocalReactorConfig.from_file(path)
+    assert reactor_config.get_config_map('any').get_data_by_key('config.yaml') == REACTOR_CONFIG
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_render_batch(processes):
+    records = [
+        image_build_user_params_json(platform='x86_64'),
+        '',
+        'not JSON',
+        image_build_user_params_json(platform='ppc64le'),
+        json.dumps({'user': 'john-foo'}),
+    ]
+    results = list(render_batch(records, LocalReactorConfig(REACTOR_CONFIG),
+                                processes=processes))
+
+    assert [result['index'] for result in results] == [0, 2, 3, 4]
+    assert 'error' not in results[0]
+    assert results[0]['build_json']['spec']['output']['to']['name'].endswith('x86_64')
+    assert 'Expecting value' in results[1]['error']
+    assert results[2]['build_json']['spec']['output']['to']['name'].endswith('ppc64le')
+    assert 'Missing required params' in results[3]['error']
@@ -0,0 +1,78 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import json
+
+from flexmock import flexmock
+import yaml
+
+from osbs.build import config_map_response
+from osbs.build.config_map_response import ConfigMapResponse
+
+
+def make_config_map():
+    return ConfigMapResponse({
+        'metadata': {'name': 'reactor-config-map'},
+        'data': {
+            'config.yaml': yaml.safe_dump({'version': 1, 'clusters': {}}),
+            'prod.yaml': yaml.safe_dump({'version': 1, 'clusters': {'x86_64': []}}),
+            'special.json': json.dumps({'quark': 'charm'}),
+            'empty.yaml': '',
+        },
+    })
+
+
+class TestConfigMapResponse(object):
+
+    def test_decode_on_access(self):
+        config_map = make_config_map()
+        (flexmock(config_map_response)
+            .should_call('safe_load')
+            .once())
+
+        assert 'prod.yaml' in config_map.data
+        assert 'missing.yaml' not in config_map.data
+        assert sorted(config_map.data) == ['config.yaml', 'empty.yaml', 'prod.yaml',
+                                           'special.json']
+
+        assert config_map.get_data_by_key('config.yaml') == {'version': 1, 'clusters': {}}
+        assert config_map.get_data_by_key('config.yaml') == {'version': 1, 'clusters': {}}
+
+    def test_copies(self):
+        config_map = make_config_map()
+        data = config_map.get_data_by_key('config.yaml')
+        data['clusters']['x86_64'] = []
+
+        assert config_map.get_data_by_key('config.yaml') == {'version': 1, 'clusters': {}}
+        assert config_map.get_data()['config.yaml'] == {'version': 1, 'clusters': {}}
+
+    def test_get_data(self):
+        config_map = make_config_map()
+        assert config_map.get_data() == {
+            'config.yaml': {'version': 1, 'clusters': {}},
+            'prod.yaml': {'version': 1, 'clusters': {'x86_64': []}},
+            'special.json': {'quark': 'charm'},
+            'empty.yaml': None,
+        }
+        assert config_map.get_data_by_key('empty.yaml') == {}
+        assert config_map.get_data_by_key('missing.yaml') == {}
+
+    def test_raw_data(self):
+        config_map = make_config_map()
+        flexmock(config_map_response).should_receive('safe_load').never()
+        flexmock(json).should_receive('loads').never()
+
+        assert config_map.get_raw_data_by_key('special.json') == '{"quark": "charm"}'
+        assert config_map.get_raw_data_by_key('missing.json') is None
+
+    def test_no_data(self):
+        config_map = ConfigMapResponse({'metadata': {'name': 'empty'}})
+        assert config_map.get_data() == {}
+        assert config_map.get_data_by_key('config.yaml') == {}
+        assert config_map.get_raw_data_by_key('config.yaml') is None
@@ -0,0 +1,85 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import os
+
+from flexmock import flexmock
+
+from osbs.build import plugins_cache
+from osbs.build.plugins_cache import PluginsConfigurationCache, file_digest
+
+
+def mock_user_params(serialized='{"user": "spam"}'):
+    return flexmock(to_json=lambda: serialized)
+
+
+class TestPluginsConfigurationCache(object):
+
+    def test_key(self, tmpdir):
+        template = tmpdir.join('inner.json')
+        template.write('{"prebuild_plugins": []}')
+        paths = [str(template)]
+
+        key = PluginsConfigurationCache.make_key(mock_user_params(), paths)
+        assert key == PluginsConfigurationCache.make_key(mock_user_params(), paths)
+        assert key != PluginsConfigurationCache.make_key(mock_user_params('{}'), paths)
+        assert key != PluginsConfigurationCache.make_key(mock_user_params(), [])
+
+        template.write('{"prebuild_plugins": [{"name": "spam"}]}')
+        assert key != PluginsConfigurationCache.make_key(mock_user_params(), paths)
+
+    def test_file_digest(self, tmpdir):
+        path = str(tmpdir.join('inner.json'))
+        assert file_digest(path) is None
+
+        with open(path, 'w') as f:
+            f.write('spam')
+        digest = file_digest(path)
+        assert digest
+
+        # digests of unchanged files are computed only once
+        flexmock(plugins_cache).should_receive('sha256').never()
+        assert file_digest(path) == digest
+
+    def test_memory(self):
+        cache = PluginsConfigurationCache(max_entries=2)
+        assert cache.get('a') is None
+
+        cache.put('a', 'rendered a')
+        cache.put('b', 'rendered b')
+        assert cache.get('a') == 'rendered a'
+        cache.put('c', 'rendered c')
+
+        # 'b' is the least recently used one
+        assert cache.get('b') is None
+        assert cache.get('a') == 'rendered a'
+        assert cache.get('c') == 'rendered c'
+
+    def test_disk(self, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        cache = PluginsConfigurationCache(cache_dir)
+        cache.put('a', 'rendered a')
+        assert os.listdir(cache_dir) == ['a.json']
+
+        # shared with other instances
+        assert PluginsConfigurationCache(cache_dir).get('a') == 'rendered a'
+        assert PluginsConfigurationCache(cache_dir).get('b') is None
+
+    def test_disk_eviction(self, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        cache = PluginsConfigurationCache(cache_dir, max_disk_entries=2)
+        for mtime, key in enumerate(['a', 'b']):
+            cache.put(key, 'rendered ' + key)
+            os.utime(os.path.join(cache_dir, key + '.json'), (mtime, mtime))
+
+        # using an entry makes it the most recent one
+        assert PluginsConfigurationCache(cache_dir).get('a') == 'rendered a'
+        cache.put('c', 'rendered c')
+
+        assert sorted(os.listdir(cache_dir)) == ['a.json', 'c.json']
@@ -16,6 +16,7 @@ from osbs.build.user_params import (
 )
 from osbs.build.plugins_configuration import (
     PluginsConfiguration,
+    PluginsTemplate,
     SourceContainerPluginsConfiguration,
 )
 from osbs.constants import (BUILD_TYPE_WORKER, BUILD_TYPE_ORCHESTRATOR,
@@ -130,6 +131,63 @@ def plugin_value_get(plugins, plugin_type, plugin_name, *args):
     return result
 
 
+class TestPluginsTemplate(object):
+
+    def get_plugins_template(self, tmpdir, template):
+        with open(str(tmpdir.join('inner.json')), 'w') as f:
+            json.dump(template, f)
+        return PluginsTemplate(str(tmpdir), 'inner.json')
+
+    def test_modify_plugins(self, tmpdir):
+        template = {
+            'prebuild_plugins': [
+                {'name': 'spam', 'args': {'x': 1}},
+                {'name': 'eggs'},
+                {'name': 'spam', 'args': {'x': 2}},
+                {'name': 'bacon'},
+            ],
+            'exit_plugins': [],
+        }
+        pt = self.get_plugins_template(tmpdir, template)
+
+        assert pt.get_plugin_conf('prebuild_plugins', 'spam') == {'name': 'spam', 'args': {'x': 1}}
+        pt.remove_plugin('prebuild_plugins', 'spam')
+        pt.remove_plugin('prebuild_plugins', 'missing')
+        assert pt.get_plugin_conf('prebuild_plugins', 'spam') == {'name': 'spam', 'args': {'x': 2}}
+        pt.add_plugin('prebuild_plugins', 'eggs', {'y': 1})
+        pt.add_plugin('prebuild_plugins', 'ham', {'z': 1})
+        pt.set_plugin_arg('prebuild_plugins', 'bacon', 'w', 1)
+        pt.add_plugin('exit_plugins', 'spam', {})
+        pt.remove_plugin('exit_plugins', 'spam')
+
+        expected = {
+            'prebuild_plugins': [
+                {'name': 'eggs', 'args': {'y': 1}},
+                {'name': 'spam', 'args': {'x': 2}},
+                {'name': 'bacon', 'args': {'w': 1}},
+                {'name': 'ham', 'args': {'z': 1}},
+            ],
+            'exit_plugins': [],
+        }
+        assert pt.template == expected
+        assert pt.to_json() == json.dumps(expected)
+
+        pt.remove_plugin('prebuild_plugins', 'spam')
+        assert not pt.has_plugin_conf('prebuild_plugins', 'spam')
+        with pytest.raises(IndexError):
+            pt.get_plugin_conf('prebuild_plugins', 'spam')
+
+    def test_missing_phase(self, tmpdir):
+        pt = self.get_plugins_template(tmpdir, {'prebuild_plugins': []})
+        assert not pt.has_plugin_conf('exit_plugins', 'spam')
+        with pytest.raises(KeyError):
+            pt.get_plugin_conf('exit_plugins', 'spam')
+        with pytest.raises(KeyError):
+            pt.add_plugin('exit_plugins', 'spam', {})
+        with pytest.raises(KeyError):
+            pt.remove_plugin('exit_plugins', 'spam')
+
+
 class TestPluginsConfiguration(object):
     def mock_repo_info(self, additional_tags=None):
         (flexmock(utils)
@@ -14,6 +14,7 @@ import datetime
 import random
 import sys
 import json
+import logging
 
 from osbs.build.user_params import (
     BuildIDParam,
@@ -95,6 +96,19 @@ class TestBuildUserParams(object):
         with pytest.raises(OsbsValidationException):
             spec.validate()
 
+    def test_validate_logs_params_once(self, caplog):
+        spec = BuildUserParams.make_params(**self.get_minimal_kwargs())
+        spec.build_type = BUILD_TYPE_WORKER
+        caplog.clear()
+        with caplog.at_level(logging.DEBUG, logger='osbs'):
+            spec.koji_task_id = 42
+            spec.validate()
+
+        params_records = [r for r in caplog.records if r.getMessage().startswith('params of')]
+        assert len(params_records) == 1
+        assert '"koji_task_id": 42' in params_records[0].getMessage()
+        assert not any('koji_task_id = 42' in r.getMessage() for r in caplog.records)
+
     def test_v2_spec_name2(self):
         git_args = {'git_branch': TEST_GIT_BRANCH}
         kwargs = self.get_minimal_kwargs(git_args=git_args)
@@ -375,6 +389,23 @@ class TestBuildUserParams(object):
         }
         spec.from_json(json.dumps(expected_json))
 
+    def test_to_json_cached(self):
+        params = BuildUserParams.make_params(**self.get_minimal_kwargs())
+        user_params_json = params.to_json()
+        flexmock(json).should_receive('dumps').never()
+        assert params.to_json() is user_params_json
+
+    def test_to_json_invalidated(self):
+        params = BuildUserParams.make_params(**self.get_minimal_kwargs())
+        compact_json = params.to_json(compact=True)
+        user_params_json = params.to_json()
+        assert json.loads(compact_json) == json.loads(user_params_json)
+        assert ' ' not in compact_json
+
+        params.release = '42'
+        assert json.loads(params.to_json())['release'] == '42'
+        assert json.loads(params.to_json(compact=True))['release'] == '42'
+
     def test_make_params_keeps_defaults(self):
         kwargs = self.get_minimal_kwargs()
         params = BuildUserParams.make_params(**kwargs)
@@ -478,5 +509,6 @@ class TestSourceContainerUserParams(object):
 ])
 def test_load_user_params_from_json(user_params, expected):
     user_params_json = json.dumps(user_params)
+    flexmock(json).should_call('loads').once()
     user_params_obj = load_user_params_from_json(user_params_json)
     assert isinstance(user_params_obj, expected)
@@ -173,6 +173,41 @@ class TestBuildParamsBase(object):
                                     params=[bpw, req_bpx, bpy],
                                     required_params=[req_bpx])
 
+    def test_json_params(self):
+        """
+        Metaclass injects json_params property, params excluded from JSON are left out
+        """
+        bpx = BuildParam("x")
+        bpy = BuildParam("y", include_in_json=False)
+        bpz = BuildParam("z")
+
+        class Parent(BuildParamsBase):
+            x = bpx
+            y = bpy
+
+        class Child(Parent):
+            z = bpz
+
+        assert Parent.json_params == [bpx]
+        assert Child.json_params == [bpx, bpz]
+
+    def test_param_tables_are_copies(self):
+        """
+        Modifying returned params does not affect the class
+        """
+        bpx = BuildParam("x", required=True)
+
+        class BuildParams(BuildParamsBase):
+            x = bpx
+
+        BuildParams.params_dict.clear()
+        BuildParams.params.pop()
+        BuildParams.required_params.pop()
+        self.check_basic_properties(BuildParams,
+                                    params_dict={"x": bpx},
+                                    params=[bpx],
+                                    required_params=[bpx])
+
     def test_build_param_access(self):
         """
         Test basic setting and getting of BuildParam values
@@ -188,6 +223,17 @@ class TestBuildParamsBase(object):
         setattr(bps, "x", 2)
         self.check_x_value(bps, 2)
 
+    def test_derived_cache(self):
+        """
+        Derived data are dropped when any param is set
+        """
+        bps = self.BuildParams(x=1)
+        bps._derived_cache()['spam'] = 'eggs'
+        assert bps._derived_cache() == {'spam': 'eggs'}
+
+        bps.x = 2
+        assert bps._derived_cache() == {}
+
     def test_init(self):
         """
         __init__ should set build params from kwargs
@@ -0,0 +1,187 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import print_function, absolute_import, unicode_literals
+
+import argparse
+import logging
+import os
+import socket
+import stat
+import sys
+import threading
+from io import StringIO
+
+from flexmock import flexmock
+import pytest
+
+from osbs import set_logging
+from osbs.cli import daemon as osbs_daemon
+from osbs.cli.daemon import OsbsDaemon, forward
+from osbs.cli.main import can_forward, forward_command
+
+
+def cmd_hello(args, osbs):
+    print('hello {} from {}'.format(args.name, osbs['instance']))
+    sys.stderr.write('done\n')
+    return 3
+
+
+def cmd_fail(args, osbs):
+    raise ValueError('no luck')
+
+
+class FakeOsbs(object):
+    def __init__(self):
+        self.created = []
+
+    def make(self, args, cached=None):
+        if cached is None:
+            self.created.append(args.instance)
+            return {'instance': args.instance}
+        return dict(cached)
+
+
+@pytest.fixture
+def daemon(tmpdir):
+    osbs = FakeOsbs()
+    server = OsbsDaemon(str(tmpdir.join('osbs', 'daemon.sock')),
+                        {'hello': cmd_hello, 'fail': cmd_fail},
+                        ['instance'], osbs.make, lambda args, osbs: args.func(args, osbs))
+    server.fake_osbs = osbs
+    osbs_logger = logging.getLogger('osbs')
+    handlers, level = osbs_logger.handlers, osbs_logger.level
+    # log messages go to clients, like in `osbs daemon`
+    set_logging(level=logging.INFO)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+        osbs_logger.handlers, osbs_logger.level = handlers, level
+
+
+def run(daemon, command, **arguments):
+    # pytest replaces them for every phase of a test, after the daemon did
+    sys.stdout, sys.stderr = daemon.stdout, daemon.stderr
+    stdout = StringIO()
+    stderr = StringIO()
+    exit_code = forward(daemon.socket_path, command, arguments, stdout=stdout, stderr=stderr)
+    return exit_code, stdout.getvalue(), stderr.getvalue()
+
+
+def test_forward(daemon):
+    exit_code, stdout, stderr = run(daemon, 'hello', instance='default', name='A')
+    assert exit_code == 3
+    assert stdout == 'hello A from default\n'
+    assert 'connecting to OpenShift for default' in stderr
+    assert stderr.endswith('done\n')
+    # only the user may connect
+    assert stat.S_IMODE(os.stat(daemon.socket_path).st_mode) == 0o600
+
+
+def test_forward_reuses_osbs(daemon):
+    assert run(daemon, 'hello', instance='default', name='A')[0] == 3
+    assert run(daemon, 'hello', instance='default', name='B')[0] == 3
+    assert run(daemon, 'hello', instance='other', name='C')[1] == 'hello C from other\n'
+    assert daemon.fake_osbs.created == ['default', 'other']
+
+
+def test_forward_reloads_config(daemon, tmpdir):
+    config = tmpdir.join('osbs.conf')
+    config.write('')
+    arguments = {'instance': 'default', 'name': 'A', 'config': str(config)}
+    assert run(daemon, 'hello', **arguments)[0] == 3
+    assert run(daemon, 'hello', **arguments)[0] == 3
+    os.utime(str(config), (0, 0))
+    assert run(daemon, 'hello', **arguments)[0] == 3
+    assert daemon.fake_osbs.created == ['default', 'default']
+    # the outdated instance is dropped
+    assert len(daemon._instances) == 1
+
+
+def test_forward_failure(daemon):
+    exit_code, stdout, stderr = run(daemon, 'fail', instance='default')
+    assert exit_code == -1
+    assert stdout == ''
+    assert 'ValueError: no luck' in stderr
+
+
+def test_forward_unsupported(daemon):
+    assert run(daemon, 'backup-builder', instance='default') == (None, '', '')
+
+
+def test_forward_concurrently(daemon):
+    results = []
+
+    def hello(name):
+        exit_code, stdout, stderr = run(daemon, 'hello', instance='default', name=name)
+        results.append((exit_code, stdout, stderr.endswith('done\n')))
+
+    threads = [threading.Thread(target=hello, args=(str(index),)) for index in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # every client gets its own output
+    assert sorted(results) == [(3, 'hello {} from default\n'.format(index), True)
+                               for index in range(10)]
+
+
+def test_not_running(tmpdir):
+    assert forward(str(tmpdir.join('daemon.sock')), 'hello', {}) is None
+
+
+def test_stale_socket(tmpdir):
+    socket_path = str(tmpdir.join('daemon.sock'))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.close()
+    assert forward(socket_path, 'hello', {}) is None
+
+    server = OsbsDaemon(socket_path, {}, [], None, None)
+    try:
+        with pytest.raises(RuntimeError):
+            OsbsDaemon(socket_path, {}, [], None, None)
+    finally:
+        server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.mark.parametrize(('command', 'isatty', 'no_daemon', 'capture_dir', 'expected'), [
+    ('get-build', False, False, None, True),
+    ('get-build', True, False, None, False),
+    ('get-build', False, True, None, False),
+    ('get-build', False, False, '/tmp/capture', False),
+    ('backup-builder', False, False, None, False),
+])
+def test_can_forward(command, isatty, no_daemon, capture_dir, expected):
+    flexmock(sys.stdout).should_receive('isatty').and_return(isatty)
+    args = argparse.Namespace(command=command, no_daemon=no_daemon, capture_dir=capture_dir)
+    assert can_forward(args) == expected
+
+
+def test_forward_command(tmpdir):
+    args = argparse.Namespace(command='get-build', func=cmd_hello, config='osbs.conf',
+                              instance='default', client_cert=None,
+                              daemon_socket=str(tmpdir.join('daemon.sock')))
+    (flexmock(osbs_daemon)
+        .should_receive('forward')
+        .with_args(args.daemon_socket, 'get-build', {
+            'command': 'get-build',
+            'config': os.path.abspath('osbs.conf'),
+            'instance': 'default',
+            'client_cert': None,
+            'daemon_socket': args.daemon_socket,
+        })
+        .and_return(0)
+        .once())
+    assert forward_command(args) == 0
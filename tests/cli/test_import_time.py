@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import print_function, absolute_import, unicode_literals
+
+import os
+import subprocess
+import sys
+import warnings
+
+import pytest
+
+
+# microseconds `osbs --help` is expected to spend importing modules, without `import site`,
+# the API and its dependencies used to take about 300 ms
+IMPORT_TIME_BUDGET = 100000
+
+# modules which take long to import and are not needed to parse arguments
+HEAVY_MODULES = [
+    'osbs.api',
+    'osbs.core',
+    'osbs.utils',
+    'dateutil',
+    'dockerfile_parse',
+    'jsonschema',
+    'pkg_resources',
+    'requests',
+    'requests_kerberos',
+    'yaml',
+]
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HELP_SCRIPT = """
+import sys
+try:
+    from osbs.cli.main import cli
+    cli()
+finally:
+    sys.stderr.write('MODULES ' + ' '.join(sorted(sys.modules)) + '\\n')
+"""
+
+
+def run_help(*options):
+    cmd = [sys.executable] + list(options) + ['-c', HELP_SCRIPT, '--help']
+    proc = subprocess.Popen(cmd, cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0, stderr
+    assert 'OpenShift Build Service client' in stdout
+    return stderr.splitlines()
+
+
+def test_help_imports_no_heavy_modules():
+    modules = set()
+    for line in run_help():
+        if line.startswith('MODULES '):
+            modules = set(line.split()[1:])
+    assert 'osbs.cli.main' in modules
+
+    imported = [module for module in HEAVY_MODULES if module in modules]
+    assert imported == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime requires Python 3.7')
+def test_help_import_time():
+    total = 0
+    after_site = False
+    for line in run_help('-X', 'importtime'):
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            # header
+            continue
+        # count only top level imports, nested ones are included in them
+        if name.startswith('  '):
+            continue
+        name = name.strip()
+        if name == 'site':
+            after_site = True
+        elif after_site:
+            total += int(cumulative)
+
+    assert total > 0
+    # timing depends on the machine, only report exceeding the budget
+    if total >= IMPORT_TIME_BUDGET:
+        warnings.warn("`osbs --help` spent %d us importing modules, budget is %d us" %
+                      (total, IMPORT_TIME_BUDGET))
@@ -8,9 +8,12 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import print_function, absolute_import, unicode_literals
 
 import osbs.cli.render
-from osbs.cli.render import TablePrinter, get_terminal_size
+from osbs.cli.render import LiveTable, TablePrinter, get_terminal_size
 
 from flexmock import flexmock
+import pytest
+import six
+import time
 
 
 LONGEST_VAL1 = "l" * 10
@@ -70,3 +73,184 @@ def test_print_table_with_mocked_terminal(capsys):
 
     assert err == expected_header
     assert out == expected_data
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+LIVE_HEADER = {"name": "NAME", "status": "STATUS"}
+
+
+def make_live_table(interactive, terminal_size=(25, 80), **kwargs):
+    flexmock(osbs.cli.render).should_receive('get_terminal_size').and_return(terminal_size)
+    stream = six.StringIO()
+    clock = FakeClock()
+    table = LiveTable(LIVE_HEADER, ["name", "status"], stream=stream,
+                      interactive=interactive, clock=clock, **kwargs)
+    return table, stream, clock
+
+
+def test_live_table_updates_rows_in_place():
+    table, stream, _ = make_live_table(True)
+    table.update("b1", {"name": "b1", "status": "New"})
+    table.update("b2", {"name": "b2", "status": "New"})
+    table.update("b1", {"name": "b1", "status": "Running"})
+
+    assert list(table.rows) == ["b1", "b2"]
+    assert table.get_lines() == [
+        " NAME | STATUS",
+        "------+---------",
+        " b1   | Running",
+        " b2   | New",
+    ]
+
+
+def test_live_table_redraws_changed_lines():
+    table, stream, _ = make_live_table(True)
+    table.update("build-1", {"name": "build-1", "status": "New"})
+    stream.truncate(0)
+    stream.seek(0)
+
+    table.update("build-2", {"name": "build-2", "status": "New"})
+    # new row is appended without touching the rest
+    assert stream.getvalue() == "\r\x1b[2K build-2 | New\n"
+    stream.truncate(0)
+    stream.seek(0)
+
+    table.update("build-1", {"name": "build-1", "status": "Failed"})
+    assert stream.getvalue() == "\x1b[2A\r\x1b[2K build-1 | Failed\n\n"
+    stream.truncate(0)
+    stream.seek(0)
+
+    # nothing changed, nothing is written
+    table.update("build-1", {"name": "build-1", "status": "Failed"})
+    assert stream.getvalue() == ""
+
+
+def test_live_table_widens_columns():
+    table, stream, _ = make_live_table(True)
+    table.update("b1", {"name": "b1", "status": "New"})
+    assert table.col_widths == {"name": 4, "status": 6}
+
+    table.update("b2", {"name": "much-longer-name", "status": "New"})
+    assert table.col_widths == {"name": 16, "status": 6}
+    assert table.get_lines()[2] == " b1               | New"
+
+    # columns don't shrink when the longest row is removed
+    table.update("b2", {"name": "much-longer-name", "status": "Complete"}, finished=True)
+    table.keep_finished = 0
+    table.expire()
+    assert table.col_widths == {"name": 16, "status": 8}
+
+
+def test_live_table_drops_finished_rows():
+    table, stream, clock = make_live_table(True, keep_finished=30)
+    table.update("b1", {"name": "b1", "status": "Complete"}, finished=True)
+    table.update("b2", {"name": "b2", "status": "Running"})
+    assert list(table.rows) == ["b1", "b2"]
+
+    clock.now += 29
+    table.update("b2", {"name": "b2", "status": "Running"})
+    assert list(table.rows) == ["b1", "b2"]
+
+    stream.truncate(0)
+    stream.seek(0)
+    clock.now += 1
+    table.update("b3", {"name": "b3", "status": "New"})
+    assert list(table.rows) == ["b2", "b3"]
+    assert table.finished == {}
+    assert stream.getvalue() == "\x1b[2A\r\x1b[2K b2   | Running\n\r\x1b[2K b3   | New\n"
+
+    clock.now += 1
+    table.update("b2", {"name": "b2", "status": "Failed"}, finished=True)
+    clock.now += 30
+    stream.truncate(0)
+    stream.seek(0)
+    assert table.expire() == ["b2"]
+    table.redraw()
+    assert stream.getvalue() == "\x1b[2A\r\x1b[2K b3   | New\n\x1b[J"
+
+
+def test_live_table_truncates_to_terminal():
+    table, _, _ = make_live_table(True)
+    table.update("b1", {"name": "b" * 100, "status": "New"})
+    assert all(len(line) <= 80 for line in table.get_lines())
+
+
+@pytest.mark.parametrize("isatty", [True, False])
+def test_live_table_not_interactive_truncates(isatty):
+    table, stream, _ = make_live_table(False, terminal_size=(25, 20))
+    stream.isatty = lambda: isatty
+    table.update("b1", {"name": "b" * 30, "status": "New"})
+    expected = " " + "b" * 30 + " | New    "
+    # lines wrapped on terminals would break the columns, piped output is complete
+    assert stream.getvalue() == (expected[:20] if isatty else expected) + "\n"
+
+
+def test_live_table_taller_than_terminal(capsys):
+    table, stream, _ = make_live_table(True, terminal_size=(4, 80))
+    table.update("b1", {"name": "b1", "status": "New"})
+    assert table.interactive
+    stream.truncate(0)
+    stream.seek(0)
+
+    # header, separator, 2 rows and the cursor line don't fit on 4 lines
+    table.update("b2", {"name": "b2", "status": "New"})
+    assert not table.interactive
+    table.update("b1", {"name": "b1", "status": "Running"})
+    assert stream.getvalue() == (" b2   | New    \n"
+                                 " b1   | Running \n")
+    # header is displayed already
+    assert capsys.readouterr().err == ""
+
+
+def test_live_table_tick():
+    table, stream, clock = make_live_table(True, keep_finished=30)
+    table.update("b1", {"name": "b1", "status": "Complete"}, finished=True)
+    table.update("b2", {"name": "b2", "status": "Running"})
+    stream.truncate(0)
+    stream.seek(0)
+
+    clock.now += 29
+    table.tick()
+    assert stream.getvalue() == ""
+
+    clock.now += 1
+    table.tick()
+    assert list(table.rows) == ["b2"]
+    assert stream.getvalue() == "\x1b[2A\r\x1b[2K b2   | Running\n\x1b[J"
+
+
+def test_live_table_start_close():
+    table, _, clock = make_live_table(True, keep_finished=30)
+    table.update("b1", {"name": "b1", "status": "Complete"}, finished=True)
+    table.start(interval=0.01)
+    clock.now += 30
+    for _ in range(500):
+        if not table.rows:
+            break
+        time.sleep(0.01)
+    assert list(table.rows) == []
+
+    table.update("b2", {"name": "b2", "status": "Complete"}, finished=True)
+    clock.now += 30
+    table.close()
+    assert list(table.rows) == []
+
+
+def test_live_table_not_interactive(capsys):
+    table, stream, clock = make_live_table(False, keep_finished=0)
+    table.update("b1", {"name": "b1", "status": "New"})
+    table.update("b1", {"name": "b1", "status": "Complete"}, finished=True)
+    table.update("b2", {"name": "b2", "status": "New"})
+
+    assert stream.getvalue() == (" b1   | New    \n"
+                                 " b1   | Complete \n"
+                                 " b2   | New      \n")
+    assert capsys.readouterr().err == " NAME | STATUS \n------+--------\n"
+    assert list(table.rows) == ["b2"]
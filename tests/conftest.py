@@ -152,6 +152,9 @@ class Connection(object):
                  },
                  "put": {
                      "file": "build_test-build-123.json",
+                 },
+                 "patch": {
+                     "file": "build_test-build-123.json",
                  }
             },
 
@@ -498,6 +501,9 @@ class Connection(object):
     def put(self, url, *args, **kwargs):
         return self.request(url, "put", *args, **kwargs)
 
+    def patch(self, url, *args, **kwargs):
+        return self.request(url, "patch", *args, **kwargs)
+
     def delete(self, url, *args, **kwargs):
         return self.request(url, "delete", *args, **kwargs)
 
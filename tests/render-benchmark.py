@@ -0,0 +1,91 @@
+#!/usr/bin/python
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+Measure how long it takes to create, load and serialize user params
+and to render plugins configuration from templates in inputs/
+
+    python tests/render-benchmark.py --number 2000
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from osbs.build.plugins_configuration import PluginsConfiguration  # noqa: E402
+from osbs.build.user_params import BuildUserParams  # noqa: E402
+from osbs.conf import Configuration  # noqa: E402
+from osbs.constants import BUILD_TYPE_ORCHESTRATOR, BUILD_TYPE_WORKER  # noqa: E402
+from osbs.repo_utils import RepoInfo, RepoConfiguration  # noqa: E402
+
+
+class DockerfileParser(object):  # pylint: disable=too-few-public-methods
+    labels = {'com.redhat.component': 'spam', 'name': 'spam/eggs'}
+    baseimage = 'fedora:latest'
+
+
+INPUTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inputs')
+BUILD_CONF = Configuration(conf_file=None, build_from='image:buildroot:latest',
+                           reactor_config_map='reactor-config-map')
+REPO_INFO = RepoInfo(dockerfile_parser=DockerfileParser(),
+                     configuration=RepoConfiguration(git_uri='https://git.example.com/spam',
+                                                     git_ref='master', git_branch='master'))
+
+
+def make_params(build_type=BUILD_TYPE_ORCHESTRATOR):
+    kwargs = {'platform': 'x86_64'} if build_type == BUILD_TYPE_WORKER else {}
+    return BuildUserParams.make_params(
+        base_image='fedora:latest',
+        build_conf=BUILD_CONF,
+        build_json_dir=INPUTS_PATH,
+        build_type=build_type,
+        koji_target='spam-candidate',
+        name_label='spam/eggs',
+        platforms=['x86_64', 'ppc64le'],
+        repo_info=REPO_INFO,
+        user='john-foo',
+        **kwargs
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-3])
+    parser.add_argument('--number', type=int, default=1000,
+                        help='number of executions of each statement')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of repetitions, best one is reported')
+    args = parser.parse_args()
+
+    user_params = make_params()
+    user_params_json = user_params.to_json()
+    statements = [
+        ('make_params', make_params),
+        ('from_json', lambda: BuildUserParams.from_json(user_params_json)),
+        ('to_json', user_params.to_json),
+    ]
+
+    def set_and_serialize():
+        user_params.release = None
+        return user_params.to_json()
+
+    statements.append(('set+to_json', set_and_serialize))
+
+    for build_type in (BUILD_TYPE_ORCHESTRATOR, BUILD_TYPE_WORKER):
+        params = make_params(build_type)
+        statements.append(('render ' + build_type,
+                           lambda params=params: PluginsConfiguration(params).render()))
+    for name, statement in statements:
+        best = min(timeit.repeat(statement, number=args.number, repeat=args.repeat))
+        print('{:20} {:8.1f} us per loop'.format(name, best / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,12 +13,12 @@ from types import GeneratorType
 from flexmock import flexmock, MethodCallError
 from textwrap import dedent
 import json
-from pkg_resources import parse_version
 import os
 import pytest
 import six
 import stat
 import copy
+from io import BytesIO
 import getpass
 import sys
 import time
@@ -30,6 +30,7 @@ from osbs.conf import Configuration
 from osbs.build.user_params import BuildUserParams
 from osbs.build.build_requestv2 import BuildRequestV2
 from osbs.build.build_response import BuildResponse
+from osbs.build.plugins_configuration import PluginsConfiguration
 from osbs.build.pod_response import PodResponse
 from osbs.build.config_map_response import ConfigMapResponse
 from osbs.exceptions import (OsbsValidationException, OsbsException, OsbsResponseException,
@@ -45,8 +46,9 @@ from osbs.constants import (DEFAULT_OUTER_TEMPLATE, WORKER_OUTER_TEMPLATE,
                             ORCHESTRATOR_CUSTOMIZE_CONF,
                             BUILD_TYPE_WORKER, BUILD_TYPE_ORCHESTRATOR,
                             OS_CONFLICT_MAX_RETRIES,
-                            REPO_CONTAINER_CONFIG)
+                            REPO_CONTAINER_CONFIG, DEFAULT_LIST_PAGE_SIZE)
 from osbs import utils
+from osbs.utils.git_mirror import GitMirrorCache
 from osbs.utils.labels import Labels
 from osbs.repo_utils import RepoInfo, RepoConfiguration, ModuleSpec
 
@@ -250,6 +252,41 @@ class TestOSBS(object):
         response = osbs.create_build(**kwargs)
         assert isinstance(response, BuildResponse)
 
+    # osbs is a fixture here
+    def test_create_build_with_git_mirror_cache(self, osbs, tmpdir):  # noqa
+        flexmock(osbs.os_conf, get_git_mirror_cache_dir=lambda: str(tmpdir),
+                 get_git_mirror_cache_max_size=lambda: 1024)
+
+        (flexmock(utils)
+            .should_receive('get_repo_info')
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       mirror_cache=GitMirrorCache)
+            .and_return(self.mock_repo_info())
+            .once())
+
+        response = osbs.create_build(target=TEST_TARGET, **REQUIRED_BUILD_ARGS)
+        assert isinstance(response, BuildResponse)
+
+        mirror_cache = osbs._get_git_mirror_cache()
+        assert mirror_cache.cache_dir == str(tmpdir)
+        assert mirror_cache.max_size == 1024
+
+    # osbs is a fixture here
+    def test_render_plugins_configuration_cached(self, osbs, tmpdir):  # noqa
+        flexmock(osbs.os_conf, get_plugins_configuration_cache_dir=lambda: str(tmpdir))
+        user_params = BuildUserParams.make_params(
+            build_json_dir=INPUTS_PATH, build_conf=osbs.os_conf, base_image='fedora:latest',
+            git_uri=TEST_GIT_URI, git_ref=TEST_GIT_REF, git_branch=TEST_GIT_BRANCH,
+            name_label='fedora/resultingimage', user=TEST_USER, component=TEST_COMPONENT,
+            build_type=BUILD_TYPE_ORCHESTRATOR, platforms=['x86_64'])
+
+        (flexmock(PluginsConfiguration)
+            .should_call('render')
+            .once())
+        rendered = osbs.render_plugins_configuration(user_params.to_json())
+        assert osbs.render_plugins_configuration(user_params.to_json()) == rendered
+        assert len(os.listdir(str(tmpdir))) == 1
+
     # osbs is a fixture here
     def test_create_build_invalid_yaml(self, osbs, tmpdir, monkeypatch):  # noqa
         """Test that errors caused by invalid yaml have a useful error message"""
@@ -357,7 +394,9 @@ class TestOSBS(object):
             build_config['metadata']['labels']['koji-task-id'] = 123
 
         def inspect_build_request(name, br):
-            assert 'koji-task-id' not in json.loads(br)['metadata']['labels']
+            patch = json.loads(br)
+            # removed by the patch, or not there at all
+            assert utils.graceful_chain_get(patch, 'metadata', 'labels', 'koji-task-id') is None
 
             class Response(object):
                 def __init__(self, br):
@@ -399,7 +438,7 @@ class TestOSBS(object):
             .and_return())
 
         (flexmock(osbs_obj.os)
-            .should_receive('update_build_config')
+            .should_receive('patch_build_config')
             .replace_with(inspect_build_request))
 
         (flexmock(osbs_obj.os)
@@ -952,7 +991,7 @@ class TestOSBS(object):
             .and_return(self.mock_repo_info()))
         (flexmock(BuildRequestV2)
             .should_receive('set_openshift_required_version')
-            .with_args(parse_version('1.0.6'))
+            .with_args(utils.parse_version('1.0.6'))
             .once())
         osbs106.create_build(target=TEST_TARGET,
                              **REQUIRED_BUILD_ARGS)
@@ -1051,6 +1090,13 @@ class TestOSBS(object):
         response = osbs.set_annotations_on_build(TEST_BUILD, annotations)
         assert isinstance(response, HttpResponse)
 
+    # osbs is a fixture here
+    @pytest.mark.parametrize('replace', [False, True])  # noqa
+    def test_update_metadata_on_builds_api(self, osbs, replace):
+        metadata = {'labels': {'label1': 'value1'}, 'annotations': {'ann1': 'value1'}}
+        responses = osbs.update_metadata_on_builds({TEST_BUILD: metadata}, replace=replace)
+        assert isinstance(responses[TEST_BUILD], HttpResponse)
+
     # osbs is a fixture here
     @pytest.mark.parametrize('token', [None, 'token'])  # noqa
     def test_get_token_api(self, osbs, token):
@@ -1212,6 +1258,79 @@ class TestOSBS(object):
     def test_pause_builds(self, osbs):  # noqa
         osbs.pause_builds()
 
+    @staticmethod
+    def mock_build_event(name, phase, resource_version):
+        return {'metadata': {'name': name, 'resourceVersion': resource_version},
+                'status': {'phase': phase}}
+
+    # osbs is a fixture here
+    def test_pause_builds_single_watch(self, osbs):  # noqa
+        flexmock(osbs.os).should_receive('create_resource_quota').once()
+        (flexmock(osbs)
+            .should_receive('_list_running_builds')
+            .and_return(({'a', 'b', 'c'}, '10'))
+            .and_return(({'c', 'd'}, '20'))
+            .times(2))
+        (flexmock(osbs.os)
+            .should_receive('watch_resource')
+            .with_args('builds', reconnect=False, resourceVersion='10')
+            .and_return([
+                ('modified', self.mock_build_event('a', 'Running', '11')),
+                ('modified', self.mock_build_event('x', 'Complete', '12')),
+                ('modified', self.mock_build_event('a', 'Complete', '13')),
+                ('deleted', self.mock_build_event('b', 'Running', '14')),
+            ])
+            .once())
+        # the server closed the watch, it continues where it ended
+        (flexmock(osbs.os)
+            .should_receive('watch_resource')
+            .with_args('builds', reconnect=False, resourceVersion='14')
+            .and_return([('error', {'kind': 'Status', 'code': 410, 'message': 'too old'})])
+            .once())
+        # builds which started since the first list are not waited for
+        (flexmock(osbs.os)
+            .should_receive('watch_resource')
+            .with_args('builds', reconnect=False, resourceVersion='20')
+            .and_return([
+                ('modified', self.mock_build_event('c', 'Failed', '21')),
+                ('modified', self.mock_build_event('d', 'Complete', '22')),
+            ])
+            .once())
+
+        osbs.pause_builds()
+
+    # osbs is a fixture here
+    def test_pause_builds_timeout(self, osbs):  # noqa
+        flexmock(osbs.os).should_receive('create_resource_quota').once()
+        (flexmock(osbs)
+            .should_receive('_list_running_builds')
+            .and_return(({'a', 'b'}, '10')))
+        now = [1000]
+        flexmock(_osbs_api.time).should_receive('time').replace_with(lambda: now[0])
+
+        def watch_resource(resource_type, reconnect, resourceVersion, timeoutSeconds):
+            assert timeoutSeconds == 61
+            yield 'modified', self.mock_build_event('a', 'Complete', '11')
+            now[0] += 60
+
+        flexmock(osbs.os).should_receive('watch_resource').replace_with(watch_resource)
+
+        with pytest.raises(OsbsException) as exc:
+            osbs.pause_builds(timeout=60)
+        assert '1 builds still running after 60s: b' in str(exc.value)
+
+    # osbs is a fixture here
+    def test_list_running_builds(self, osbs):  # noqa
+        (flexmock(osbs.os)
+            .should_receive('list_builds')
+            .with_args(field_selector='status=Running')
+            .and_return(flexmock(status_code=200, json=lambda: {
+                'metadata': {'resourceVersion': '10'},
+                'items': [self.mock_build_event('a', 'Running', '9'),
+                          self.mock_build_event('b', 'Complete', '8')],
+            })))
+        assert osbs._list_running_builds() == ({'a'}, '10')
+
     # osbs is a fixture here
     def test_resume_builds(self, osbs):  # noqa
         osbs.resume_builds()
@@ -1220,6 +1339,157 @@ class TestOSBS(object):
     def test_backup(self, osbs):  # noqa
         osbs.dump_resource("builds")
 
+    # osbs is a fixture here
+    def test_dump_resource_in_pages(self, osbs):  # noqa
+        pages = [
+            {'kind': 'BuildConfigList',
+             'metadata': {'continue': 'token-1', 'remainingItemCount': 1},
+             'items': [{'metadata': {'name': 'bc-1'}}]},
+            {'kind': 'BuildConfigList', 'metadata': {},
+             'items': [{'metadata': {'name': 'bc-2'}}]},
+        ]
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .with_args(resource_type='buildconfigs', limit=1, resource_version=None)
+            .and_return(flexmock(status_code=200, json=lambda: pages[0]))
+            .once())
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .with_args(resource_type='buildconfigs', limit=1, resource_version=None,
+                       continue_token='token-1')
+            .and_return(flexmock(status_code=200, json=lambda: pages[1]))
+            .once())
+
+        assert osbs.dump_resource('buildconfigs', page_size=1) == {
+            'kind': 'BuildConfigList',
+            'metadata': {},
+            'items': [{'metadata': {'name': 'bc-1'}}, {'metadata': {'name': 'bc-2'}}],
+        }
+
+    # osbs is a fixture here
+    @pytest.mark.parametrize(('pages', 'expected'), [
+        ([{'kind': 'BuildConfigList', 'apiVersion': 'v1',
+           'metadata': {'continue': 'token-1'},
+           'items': [{'metadata': {'name': 'bc-1'}}, {'metadata': {'name': 'bc-\u0161'}}]},
+          {'kind': 'BuildConfigList', 'apiVersion': 'v1', 'metadata': {},
+           'items': [{'metadata': {'name': 'bc-3'}}]}],
+         {'kind': 'BuildConfigList', 'apiVersion': 'v1', 'metadata': {},
+          'items': [{'metadata': {'name': 'bc-1'}}, {'metadata': {'name': 'bc-\u0161'}},
+                    {'metadata': {'name': 'bc-3'}}]}),
+        ([{'kind': 'BuildConfigList', 'metadata': {}, 'items': []}],
+         {'kind': 'BuildConfigList', 'metadata': {}, 'items': []}),
+        ([{'items': None}],
+         {'items': []}),
+    ])
+    def test_dump_resource_to_file(self, osbs, pages, expected):  # noqa
+        osbs.os.list_page_size = 2
+        responses = iter(pages)
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .replace_with(lambda **kwargs: flexmock(status_code=200,
+                                                    json=lambda: next(responses))))
+
+        fileobj = BytesIO()
+        assert osbs.dump_resource_to_file('buildconfigs', fileobj) == len(expected['items'])
+        # the same ASCII JSON as backups always had
+        assert json.loads(fileobj.getvalue().decode('ascii')) == expected
+
+    # osbs is a fixture here
+    def test_dump_resource_to_file_since(self, osbs):  # noqa
+        items = [{'metadata': {'name': name, 'uid': 'uid-' + name, 'resourceVersion': version}}
+                 for name, version in (('a', '1'), ('b', '2'))]
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .and_return(flexmock(status_code=200, json=lambda: {'kind': 'BuildConfigList',
+                                                                'items': items})))
+
+        fileobj = BytesIO()
+        manifest = []
+        assert osbs.dump_resource_to_file('buildconfigs', fileobj, manifest=manifest,
+                                          since={('uid-a', '1'), ('uid-b', '1')}) == 1
+        assert json.loads(fileobj.getvalue().decode('ascii'))['items'] == items[1:]
+        assert manifest == [
+            {'resource': 'buildconfigs', 'kind': 'BuildConfig', 'name': name,
+             'uid': 'uid-' + name, 'resourceVersion': version}
+            for name, version in (('a', '1'), ('b', '2'))
+        ]
+
+    # osbs is a fixture here
+    def test_dump_resource_snapshot(self, osbs):  # noqa
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .with_args('buildconfigs', limit=1)
+            .and_return(flexmock(json=lambda: {'metadata': {'resourceVersion': '42'},
+                                               'items': [{}]}))
+            .once())
+        resource_version = osbs.get_snapshot_resource_version()
+        assert resource_version == '42'
+
+        (flexmock(osbs.os)
+            .should_receive('dump_resource')
+            .with_args(resource_type='imagestreams', resource_version='42')
+            .and_return(flexmock(status_code=200, json=lambda: {
+                'metadata': {'resourceVersion': '42'}, 'items': [{'metadata': {'name': 'is'}}],
+            }))
+            .once())
+        assert osbs.dump_resource('imagestreams', resource_version='42') == {
+            'metadata': {'resourceVersion': '42'}, 'items': [{'metadata': {'name': 'is'}}],
+        }
+
+    # osbs is a fixture here
+    @pytest.mark.parametrize(('response', 'message'), [
+        (flexmock(status_code=200, json=lambda: {'metadata': {'resourceVersion': '43'}}),
+         "listed at resourceVersion 43 instead of 42"),
+        (flexmock(status_code=410, content=b'too old resource version'),
+         "resourceVersion 42 of the snapshot is too old"),
+    ])
+    def test_dump_resource_snapshot_error(self, osbs, response, message):  # noqa
+        flexmock(osbs.os).should_receive('dump_resource').and_return(response)
+        with pytest.raises(OsbsException) as exc:
+            osbs.dump_resource_to_file('imagestreams', BytesIO(), resource_version='42')
+        assert message in str(exc.value)
+
+    # osbs is a fixture here
+    def test_iter_builds(self, osbs):  # noqa
+        (flexmock(osbs.os)
+            .should_receive('list_builds')
+            .with_args(field_selector=None, koji_task_id=None, labels=None, limit=1)
+            .and_return(flexmock(status_code=200, json=lambda: {
+                'metadata': {'continue': 'token-1'},
+                'items': [{'metadata': {'name': 'build-1'}}],
+            }))
+            .once())
+        (flexmock(osbs.os)
+            .should_receive('list_builds')
+            .with_args(field_selector=None, koji_task_id=None, labels=None, limit=1,
+                       continue_token='token-1')
+            .and_return(flexmock(status_code=200, json=lambda: {
+                'metadata': {},
+                'items': [{'metadata': {'name': 'build-2'}}],
+            }))
+            .once())
+
+        builds = osbs.iter_builds(page_size=1)
+        assert next(builds).get_build_name() == 'build-1'
+        assert [build.get_build_name() for build in builds] == ['build-2']
+
+    # osbs is a fixture here
+    def test_iter_builds_error(self, osbs):  # noqa
+        (flexmock(osbs.os)
+            .should_receive('list_builds')
+            .and_return(flexmock(status_code=200, json=lambda: {
+                'metadata': {'continue': 'token-1'},
+                'items': [{'metadata': {'name': 'build-1'}}],
+            }))
+            .and_raise(IOError('connection lost')))
+
+        builds = osbs.iter_builds(page_size=1)
+        assert next(builds).get_build_name() == 'build-1'
+        # errors while iterating are wrapped as well
+        with pytest.raises(OsbsException) as exc_info:
+            next(builds)
+        assert 'connection lost' in str(exc_info.value)
+
     # osbs is a fixture here
     def test_restore(self, osbs):  # noqa
         build = {
@@ -1243,6 +1513,54 @@ class TestOSBS(object):
         }
         osbs.restore_resource("builds", {"items": [build], "kind": "BuildList", "apiVersion": "v1"})
 
+    # osbs is a fixture here
+    def test_restore_concurrently(self, osbs, tmpdir):  # noqa
+        names = ['bc-{}'.format(index) for index in range(20)]
+        checkpoint = utils.Checkpoint(str(tmpdir.join('checkpoint')))
+        checkpoint.add('buildconfigs/bc-0')
+        checkpoint.add('imagestreams/bc-1')
+
+        posted = []
+        in_flight = []
+
+        def restore_resource(resource_type, resource):
+            assert 'resourceVersion' not in resource['metadata']
+            in_flight.append(resource)
+            assert len(in_flight) <= 3
+            time.sleep(0.001)
+            in_flight.remove(resource)
+            posted.append(resource['metadata']['name'])
+
+        flexmock(osbs.os).should_receive('restore_resource').replace_with(restore_resource)
+
+        resources = ({'metadata': {'name': name, 'resourceVersion': '1'}} for name in names)
+        assert osbs.restore_resource('buildconfigs', resources, checkpoint=checkpoint,
+                                     max_workers=3) == 0
+        assert sorted(posted) == sorted(names[1:])
+        assert all('buildconfigs/' + name in checkpoint for name in names)
+
+    @pytest.mark.parametrize('continue_on_error', [True, False])  # noqa
+    def test_restore_failure(self, osbs, tmpdir, continue_on_error):
+        checkpoint = utils.Checkpoint(str(tmpdir.join('checkpoint')))
+
+        def restore_resource(resource_type, resource):
+            if resource['metadata']['name'] == 'bad':
+                raise OsbsResponseException('conflict', 409)
+
+        flexmock(osbs.os).should_receive('restore_resource').replace_with(restore_resource)
+
+        resources = {'items': [{'metadata': {'name': name}} for name in ('good', 'bad')]}
+        if continue_on_error:
+            assert osbs.restore_resource('buildconfigs', resources, checkpoint=checkpoint,
+                                         continue_on_error=True) == 1
+        else:
+            with pytest.raises(OsbsResponseException):
+                osbs.restore_resource('buildconfigs', resources, checkpoint=checkpoint,
+                                      max_workers=1)
+        # restored resources are recorded even when the restore fails
+        assert 'buildconfigs/good' in checkpoint
+        assert 'buildconfigs/bad' not in checkpoint
+
     @pytest.mark.parametrize(('build_from', 'is_image', 'valid'), (
         ('image:registry.example.com/buildroot:2.0', True, 'registry.example.com/buildroot:2.0'),
         ('imagestream:buildroot-stream:v1.0', False, 'buildroot-stream:v1.0'),
@@ -1543,11 +1861,13 @@ class TestOSBS(object):
 
         existing_build_json = copy.deepcopy(build_json)
         existing_build_json['metadata']['name'] = 'existing-build'
+        existing_build_json['spec']['triggers'] = []
 
         build_request = flexmock(
             render=lambda: build_json,
             has_ist_trigger=lambda: False,
-            scratch=False)
+            scratch=False,
+            skip_build=False)
 
         (flexmock(osbs_obj)
             .should_receive('_get_existing_build_config')
@@ -1561,8 +1881,19 @@ class TestOSBS(object):
                 flexmock(status='Running', get_build_name=lambda: 'build-1'),
             ]))
 
-        with pytest.raises(OsbsException):
-            osbs_obj._create_build_config_and_build(build_request)
+        # nothing changed in the build config
+        (flexmock(osbs_obj.os)
+            .should_receive('patch_build_config')
+            .never())
+
+        (flexmock(osbs_obj.os)
+            .should_receive('start_build')
+            .with_args('existing-build')
+            .once()
+            .and_return(flexmock(json=lambda: {'spam': 'maps'})))
+
+        build_response = osbs_obj._create_build_config_and_build(build_request)
+        assert build_response.json == {'spam': 'maps'}
 
     def test_create_build_config_update(self):
         config = Configuration(conf_name=None)
@@ -1583,6 +1914,7 @@ class TestOSBS(object):
         existing_build_json = copy.deepcopy(build_json)
         existing_build_json['metadata']['name'] = 'existing-build'
         existing_build_json['metadata']['labels']['new-label'] = 'new-value'
+        existing_build_json['spec']['nodeSelector'] = {'arch': 'x86_64'}
 
         build_request = flexmock(
             render=lambda: build_json,
@@ -1601,8 +1933,8 @@ class TestOSBS(object):
             .and_return([]))
 
         (flexmock(osbs_obj.os)
-            .should_receive('update_build_config')
-            .with_args('existing-build', json.dumps(existing_build_json))
+            .should_receive('patch_build_config')
+            .with_args('existing-build', json.dumps({'spec': {'nodeSelector': None}}))
             .once())
 
         (flexmock(osbs_obj.os)
@@ -1614,6 +1946,139 @@ class TestOSBS(object):
         build_response = osbs_obj._create_build_config_and_build(build_request)
         assert build_response.json == {'spam': 'maps'}
 
+    # an autorebuild resubmission always strips and restores the triggers,
+    # also when the parent image didn't change
+    @pytest.mark.parametrize('image_id', ['old', 'new'])
+    def test_create_build_config_update_ist_triggers(self, image_id):
+        config = Configuration(conf_name=None)
+        osbs_obj = OSBS(config, config)
+
+        trigger = {'type': 'ImageChange', 'imageChange': {'from': {'name': 'fedora:30'}}}
+        build_json = {
+            'apiVersion': "build.openshift.io/v1",
+            'metadata': {'name': 'build', 'labels': {'git-repo-name': 'reponame'}},
+            'spec': {'triggers': [copy.deepcopy(trigger)]},
+        }
+        existing_bc = copy.deepcopy(build_json)
+        existing_bc['spec']['triggers'][0]['imageChange']['lastTriggeredImageID'] = 'old'
+        existing_bc['metadata']['labels']['is_autorebuild'] = 'true'
+
+        build_request = flexmock(
+            render=lambda: build_json,
+            scratch=False,
+            skip_build=True,
+            triggered_after_koji_task=None)
+
+        (flexmock(osbs_obj)
+            .should_receive('_get_image_stream_info_for_build_request')
+            .and_return(({'metadata': {'name': 'fedora'}}, '30', 'registry/fedora', False)))
+        (flexmock(osbs_obj)
+            .should_receive('_get_existing_build_config')
+            .replace_with(lambda build_json: copy.deepcopy(existing_bc)))
+        (flexmock(osbs_obj)
+            .should_receive('_get_running_builds_for_build_config')
+            .and_return([]))
+        (flexmock(osbs_obj)
+            .should_receive('get_image_stream_tag_with_retry')
+            .and_return(flexmock(json=lambda: {'image': {'dockerImageReference': image_id}})))
+
+        calls = []
+
+        def patch_build_config(name, patch):
+            patch = json.loads(patch)
+            calls.append(patch)
+            existing_bc['spec'].update(patch.get('spec', {}))
+
+        (flexmock(osbs_obj.os)
+            .should_receive('patch_build_config')
+            .replace_with(patch_build_config))
+        (flexmock(osbs_obj)
+            .should_receive('ensure_image_stream_tag')
+            .replace_with(lambda *args, **kwargs: calls.append('ensure_image_stream_tag')))
+
+        osbs_obj._create_build_config_and_build(build_request)
+
+        # the trigger must not fire when the parent image is imported
+        new_trigger = copy.deepcopy(trigger)
+        new_trigger['imageChange']['lastTriggeredImageID'] = image_id
+        assert calls == [
+            {'spec': {'triggers': []}},
+            'ensure_image_stream_tag',
+            {'spec': {'triggers': [new_trigger]}},
+        ]
+
+    @pytest.mark.parametrize(('triggers', 'patch'), [
+        # same triggers are kept, they are in place already
+        ([{'type': 'ImageChange', 'imageChange': {'from': {'name': 'fedora:30'}}}], None),
+        # new ones are removed until ImageStreamTag is configured
+        ([{'type': 'ImageChange', 'imageChange': {'from': {'name': 'fedora:31'}}}],
+         {'spec': {'triggers': []}}),
+    ])
+    def test_update_build_config_when_exist_triggers(self, triggers, patch):
+        config = Configuration(conf_name=None)
+        osbs_obj = OSBS(config, config)
+
+        build_json = {
+            'metadata': {'name': 'build', 'labels': {'git-repo-name': 'reponame'}},
+            'spec': {'strategy': {'customStrategy': {'env': []}}},
+        }
+        existing_bc = copy.deepcopy(build_json)
+        existing_bc['metadata']['resourceVersion'] = '42'
+        existing_bc['spec']['triggers'] = [{
+            'type': 'ImageChange',
+            'imageChange': {'from': {'name': 'fedora:30'}, 'lastTriggeredImageID': 'sha'}
+        }]
+        existing_bc['status'] = {'lastVersion': 1}
+
+        (flexmock(osbs_obj)
+            .should_receive('_get_existing_build_config')
+            .and_return(existing_bc))
+        (flexmock(osbs_obj)
+            .should_receive('_get_running_builds_for_build_config')
+            .and_return([]))
+        if patch:
+            (flexmock(osbs_obj.os)
+                .should_receive('patch_build_config')
+                .with_args('build', json.dumps(patch))
+                .once())
+        else:
+            (flexmock(osbs_obj.os)
+                .should_receive('patch_build_config')
+                .never())
+
+        osbs_obj._update_build_config_when_exist(build_json, triggers)
+
+    @pytest.mark.parametrize(('last_triggered', 'is_autorebuild', 'changed'), [
+        ('sha', 'true', False),
+        ('sha', 'false', True),
+        (None, 'true', True),
+    ])
+    def test_update_build_config_with_triggers_unchanged(self, last_triggered, is_autorebuild,
+                                                         changed):
+        config = Configuration(conf_name=None)
+        osbs_obj = OSBS(config, config)
+
+        existing_bc = {
+            'metadata': {'name': 'build', 'labels': {'is_autorebuild': is_autorebuild},
+                         'resourceVersion': '42'},
+            'spec': {'triggers': [{
+                'type': 'ImageChange',
+                'imageChange': {'from': {'name': 'fedora:30'}, 'lastTriggeredImageID': 'sha'}
+            }]},
+        }
+        triggers = [{'type': 'ImageChange', 'imageChange': {'from': {'name': 'fedora:30'}}}]
+        if last_triggered:
+            triggers[0]['imageChange']['lastTriggeredImageID'] = last_triggered
+
+        (flexmock(osbs_obj)
+            .should_receive('_get_existing_build_config')
+            .and_return(existing_bc))
+        (flexmock(osbs_obj.os)
+            .should_receive('patch_build_config')
+            .times(1 if changed else 0))
+
+        osbs_obj._update_build_config_with_triggers({}, triggers, is_autorebuild=True)
+
     def test_create_build_config_create(self):
         config = Configuration(conf_name=None)
         osbs_obj = OSBS(config, config)
@@ -1847,16 +2312,16 @@ class TestOSBS(object):
                 .should_receive('get_image_stream_tag_with_retry')
                 .never())
 
-        update_build_config_times = 0
+        patch_build_config_times = 0
 
         if existing_bc:
             (flexmock(osbs_obj.os)
                 .should_receive('list_builds')
-                .with_args(build_config_id='build')
+                .with_args(build_config_id='build', limit=DEFAULT_LIST_PAGE_SIZE)
                 .times(0 if triggers_bj is True and (wrong_registry or existing_is is None) else 1)
-                .and_return(flexmock(json=lambda: {'items': []})))
+                .and_return(flexmock(status_code=200, json=lambda: {'items': []})))
             if not (triggers_bj is True and (wrong_registry or existing_is is None)):
-                update_build_config_times += 1
+                patch_build_config_times += 1
 
         else:
             def mock_create_build_config(encoded_build_json):
@@ -1868,12 +2333,12 @@ class TestOSBS(object):
                 .times(0 if (triggers_bj and (wrong_registry or existing_is is None)) else 1))
 
         if triggers_bj and not wrong_registry and existing_is is not None:
-            update_build_config_times += 1
+            patch_build_config_times += 1
 
         (flexmock(osbs_obj.os)
-            .should_receive('update_build_config')
+            .should_receive('patch_build_config')
             .with_args('build', str)
-            .times(update_build_config_times))
+            .times(patch_build_config_times))
 
         if triggers_bj:
             (flexmock(osbs_obj.os)
@@ -2084,7 +2549,7 @@ class TestOSBS(object):
             .never())
 
         (flexmock(osbs_obj.os)
-            .should_receive('update_build_config')
+            .should_receive('patch_build_config')
             .never())
 
         if check_running:
@@ -2148,7 +2613,7 @@ class TestOSBS(object):
             .never())
 
         (flexmock(osbs_obj.os)
-            .should_receive('update_build_config')
+            .should_receive('patch_build_config')
             .never())
 
         build_response = osbs_obj.create_build(**kwargs)
@@ -2778,7 +3243,7 @@ class TestOSBS(object):
 
         (flexmock(yaml)
             .should_call('load')
-            .times(6))  # 2*2 in get_data, 2 in get_data_by_key
+            .times(4))  # 2 in get_data of every response, get_data_by_key reuses them
 
         assert config_map.get_data() == data
         config_map = osbs.get_config_map(conf_name)
@@ -2852,7 +3317,9 @@ class TestOSBS(object):
                 },
             },
             'spec': {
-                'triggers': [{'imageChange': {'from': {'name': 'fedora23-python:old_trigger'}}}]
+                'triggers': [{'imageChange': {'from': {'name': 'fedora23-python:old_trigger'}}}],
+                # removed when updating the build config
+                'nodeSelector': {'arch': 'x86_64'},
             },
             'status': {'lastVersion': 'lastVersion'},
         }
@@ -2890,19 +3357,18 @@ class TestOSBS(object):
             if triggers:
                 get_existing_count += OS_CONFLICT_MAX_RETRIES + 1
 
-        get_existing = (flexmock(osbs_obj)
-                        .should_receive('_get_existing_build_config')
-                        .times(get_existing_count))
-
         if existing_bc:
-            for _ in range(OS_CONFLICT_MAX_RETRIES + 2):
-                get_existing = get_existing.and_return(build_config_json)
+            existing = [build_config_json] * (OS_CONFLICT_MAX_RETRIES + 2)
         else:
-            get_existing = get_existing.and_return(None)
-
+            existing = [None]
             if triggers:
-                for _ in range(OS_CONFLICT_MAX_RETRIES + 1):
-                    get_existing = get_existing.and_return(build_config_json)
+                existing += [build_config_json] * (OS_CONFLICT_MAX_RETRIES + 1)
+
+        (flexmock(osbs_obj)
+            .should_receive('_get_existing_build_config')
+            # every response is a new object, as when fetched from the server
+            .replace_with(lambda build_json: copy.deepcopy(existing.pop(0)))
+            .times(get_existing_count))
 
         def mock_get_image_stream(*args, **kwargs):
             raise OsbsResponseException('missing ImageStream',
@@ -2922,8 +3388,8 @@ class TestOSBS(object):
         if existing_bc:
             (flexmock(osbs_obj.os)
                 .should_receive('list_builds')
-                .with_args(build_config_id='build')
-                .and_return(flexmock(json=lambda: {'items': []})))
+                .with_args(build_config_id='build', limit=DEFAULT_LIST_PAGE_SIZE)
+                .and_return(flexmock(status_code=200, json=lambda: {'items': []})))
         else:
             def mock_create_build_config(encoded_build_json):
                 assert json.loads(encoded_build_json) == build_json
@@ -2943,7 +3409,7 @@ class TestOSBS(object):
 
         if existing_bc or triggers:
             (flexmock(osbs_obj.os)
-                .should_receive('update_build_config')
+                .should_receive('patch_build_config')
                 .with_args('build', str)
                 .replace_with(mock_update_build_config)
                 .times(OS_CONFLICT_MAX_RETRIES + 1))
@@ -3004,7 +3470,9 @@ class TestOSBS(object):
                 },
             },
             'spec': {
-                'triggers': [{'imageChange': {'from': {'name': 'fedora23-python:old_trigger'}}}]
+                'triggers': [{'imageChange': {'from': {'name': 'fedora23-python:old_trigger'}}}],
+                # removed when updating the build config
+                'nodeSelector': {'arch': 'x86_64'},
             },
             'status': {'lastVersion': 'lastVersion'},
         }
@@ -3037,7 +3505,7 @@ class TestOSBS(object):
         (flexmock(osbs_obj)
             .should_receive('_get_existing_build_config')
             .times(get_existing_count)
-            .and_return(build_config_json))
+            .replace_with(lambda build_json: copy.deepcopy(build_config_json)))
 
         def mock_get_image_stream(*args, **kwargs):
             raise OsbsResponseException('missing ImageStream',
@@ -3056,15 +3524,15 @@ class TestOSBS(object):
 
         (flexmock(osbs_obj.os)
             .should_receive('list_builds')
-            .with_args(build_config_id='build')
-            .and_return(flexmock(json=lambda: {'items': []})))
+            .with_args(build_config_id='build', limit=DEFAULT_LIST_PAGE_SIZE)
+            .and_return(flexmock(status_code=200, json=lambda: {'items': []})))
 
         (flexmock(time)
             .should_receive('sleep')
             .and_return(None))
 
         update_config = (flexmock(osbs_obj.os)
-                         .should_receive('update_build_config')
+                         .should_receive('patch_build_config')
                          .with_args('build', str)
                          .times(len(update_response) * 2))
 
@@ -7,12 +7,26 @@ of the BSD license. See the LICENSE file for details.
 """
 from __future__ import absolute_import
 
+import argparse
+import json
+import os
 import pytest
 import sys
 
+import yaml
+from flexmock import flexmock
 from textwrap import dedent
 from osbs.cli.main import (str_on_2_unicode_on_3, make_worker_builds_str,
-                           make_digests_str)
+                           make_digests_str, cmd_render_batch, cmd_watch_builds,
+                           cmd_list_builds, cmd_backup, cmd_restore)
+from osbs.build.build_response import BuildResponse
+from osbs.conf import Configuration
+from osbs.constants import BACKUP_RESOURCES, BACKUP_MANIFEST
+from osbs.exceptions import OsbsException
+from osbs.utils import TarReader, TarWriter, make_manifest_entry, get_manifest_version
+
+from tests.build_.test_batch_render import REACTOR_CONFIG, image_build_user_params_json
+from tests.constants import INPUTS_PATH
 
 
 class TestStrOn2UnicodeOn3(object):
@@ -115,3 +129,306 @@ class TestGetBuild(object):
     ))
     def test_make_digests_str(self, digests, expected_str):
         assert make_digests_str(digests) == expected_str
+
+
+class TestRenderBatch(object):
+
+    @pytest.mark.parametrize(('records', 'expected_retval'), [
+        (2, 0),
+        (1, -1),
+    ])
+    def test_cmd_render_batch(self, tmpdir, records, expected_retval):
+        reactor_config = str(tmpdir.join('config.yaml'))
+        with open(reactor_config, 'w') as f:
+            yaml.safe_dump(REACTOR_CONFIG, f)
+
+        lines = [image_build_user_params_json() for _ in range(records)]
+        if expected_retval:
+            lines.append('{}')
+        infile = str(tmpdir.join('input.jsonl'))
+        with open(infile, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        outfile = str(tmpdir.join('output.jsonl'))
+        args = argparse.Namespace(reactor_config=reactor_config, INPUT=infile,
+                                  output_file=outfile, processes=1)
+        osbs = flexmock(os_conf=Configuration(conf_file=None, build_json_dir=INPUTS_PATH))
+        assert cmd_render_batch(args, osbs) == expected_retval
+
+        with open(outfile) as f:
+            results = [json.loads(line) for line in f]
+        assert len(results) == len(lines)
+        assert all('build_json' in result for result in results[:records])
+
+
+class TestWatchBuilds(object):
+
+    def test_cmd_watch_builds(self, capsys):
+        def build(name, phase):
+            return {'metadata': {'name': name}, 'status': {'phase': phase}}
+
+        events = [
+            ('added', build('spam-1', 'New')),
+            ('added', build('eggs-1', 'New')),
+            ('modified', build('spam-1', 'Running')),
+            ('deleted', build('spam-1', 'Complete')),
+            ('modified', build('eggs-1', 'Running')),
+        ]
+        osbs = flexmock()
+        osbs.should_receive('watch_builds').and_return(iter(events))
+
+        args = argparse.Namespace(output='text', columns='name,status', keep_finished=0)
+        cmd_watch_builds(args, osbs)
+
+        out, err = capsys.readouterr()
+        assert err.splitlines()[0].split() == ['NAME', '|', 'STATUS']
+        # not a terminal, every change is appended
+        assert [line.split() for line in out.splitlines()] == [
+            ['spam-1', '|', 'New'],
+            ['eggs-1', '|', 'New'],
+            ['spam-1', '|', 'Running'],
+            ['spam-1', '|', 'Complete'],
+            ['eggs-1', '|', 'Running'],
+        ]
+
+
+class TestListBuilds(object):
+
+    @staticmethod
+    def make_builds():
+        return [BuildResponse({
+            'metadata': {'name': name, 'creationTimestamp': created, 'labels': {}},
+            'status': {'phase': 'Complete'},
+        }) for name, created in [('build-b', '2020-01-02T00:00:00Z'),
+                                 ('build-a', '2020-01-01T00:00:00Z'),
+                                 ('build-c', '2020-01-03T00:00:00Z')]]
+
+    @pytest.mark.parametrize('count', [0, 1, 3])
+    def test_json_output(self, capsys, count):
+        builds = self.make_builds()[:count]
+        osbs = flexmock()
+        osbs.should_receive('iter_builds').and_return(iter(builds))
+        args = argparse.Namespace(running=False, from_json=None, output='json')
+
+        cmd_list_builds(args, osbs)
+
+        out, _ = capsys.readouterr()
+        assert out == json.dumps([build.json for build in builds], indent=2) + '\n'
+
+    @pytest.mark.parametrize(('no_sort', 'expected_names'), [
+        (False, ['build-a', 'build-b', 'build-c']),
+        (True, ['build-b', 'build-a', 'build-c']),
+    ])
+    def test_text_output(self, capsys, no_sort, expected_names):
+        osbs = flexmock()
+        osbs.should_receive('iter_builds').and_return(iter(self.make_builds()))
+        args = argparse.Namespace(running=False, from_json=None, output='text',
+                                  columns='name,status', FILTER=None, no_sort=no_sort)
+
+        cmd_list_builds(args, osbs)
+
+        out, err = capsys.readouterr()
+        assert err.splitlines()[0].split() == ['BUILD', 'ID', '|', 'STATUS']
+        assert [line.split() for line in out.splitlines()] == [
+            [name, '|', 'complete'] for name in expected_names
+        ]
+
+
+def make_resources(*names_and_versions):
+    return [{'metadata': {'name': name, 'uid': 'uid-' + name, 'resourceVersion': version}}
+            for name, version in names_and_versions]
+
+
+class TestBackup(object):
+
+    @staticmethod
+    def mock_osbs(fail=(), resource_version=None, state=None):
+        """
+        :param state: dict, resource type -> list of resources on the server
+        """
+        if state is None:
+            state = dict((resource_type, make_resources(('a', '1')))
+                         for resource_type in BACKUP_RESOURCES)
+        osbs = flexmock()
+        osbs.should_receive('pause_builds').times(0 if resource_version else 1)
+        osbs.should_receive('resume_builds').times(0 if resource_version else 1)
+        (osbs.should_receive('get_snapshot_resource_version')
+            .and_return(resource_version)
+            .times(1 if resource_version else 0))
+
+        def dump_resource_to_file(resource_type, fileobj, manifest, since, **kwargs):
+            assert kwargs == {'resource_version': resource_version}
+            if resource_type in fail:
+                raise OsbsException('cannot dump ' + resource_type)
+            items = []
+            for item in state[resource_type]:
+                manifest.append(make_manifest_entry(resource_type, 'Kind', item))
+                if not since or get_manifest_version(item) not in since:
+                    items.append(item)
+            fileobj.write(json.dumps({'items': items}).encode('ascii'))
+            return len(items)
+
+        osbs.should_receive('dump_resource_to_file').replace_with(dump_resource_to_file)
+        return osbs
+
+    @staticmethod
+    def read_backup(filename):
+        return dict((os.path.basename(f.filename), json.loads(f.fileobj.read().decode('ascii')))
+                    for f in TarReader(filename))
+
+    @pytest.mark.parametrize('compression', ['bz2', 'gz', 'xz'])
+    @pytest.mark.parametrize('resource_version', [None, '42'])
+    def test_cmd_backup(self, tmpdir, compression, resource_version):
+        filename = str(tmpdir.join('backup.tar.' + compression))
+        args = argparse.Namespace(instance='default', filename=filename,
+                                  compression=compression, ignore_quota_errors=False,
+                                  pause_timeout=None,
+                                  continue_on_error=False, snapshot=bool(resource_version),
+                                  base=None)
+        cmd_backup(args, self.mock_osbs(resource_version=resource_version))
+
+        contents = self.read_backup(filename)
+        manifest = contents.pop(BACKUP_MANIFEST)
+        assert contents == {
+            resource_type + '.json': {'items': make_resources(('a', '1'))}
+            for resource_type in BACKUP_RESOURCES
+        }
+        assert manifest['base'] is None
+        assert manifest['resourceVersion'] == resource_version
+        assert manifest['resources'] == [
+            {'resource': resource_type, 'kind': 'Kind', 'name': 'a', 'uid': 'uid-a',
+             'resourceVersion': '1'}
+            for resource_type in BACKUP_RESOURCES
+        ]
+        assert manifest['deleted'] == []
+
+    @pytest.mark.parametrize('continue_on_error', [True, False])
+    def test_cmd_backup_error(self, tmpdir, continue_on_error):
+        filename = str(tmpdir.join('backup.tar.bz2'))
+        args = argparse.Namespace(instance='default', filename=filename, compression='bz2',
+                                  ignore_quota_errors=False, snapshot=False, base=None,
+                                  pause_timeout=None,
+                                  continue_on_error=continue_on_error)
+        osbs = self.mock_osbs(fail=BACKUP_RESOURCES[:1])
+
+        if not continue_on_error:
+            with pytest.raises(OsbsException):
+                cmd_backup(args, osbs)
+            return
+
+        cmd_backup(args, osbs)
+        assert [os.path.basename(f.filename) for f in TarReader(filename)] == [
+            resource_type + '.json' for resource_type in BACKUP_RESOURCES[1:]
+        ] + [BACKUP_MANIFEST]
+
+    def test_cmd_backup_incremental(self, tmpdir):
+        base = str(tmpdir.join('base.tar.bz2'))
+        args = argparse.Namespace(instance='default', filename=base, compression='bz2',
+                                  ignore_quota_errors=False, snapshot=False, base=None,
+                                  pause_timeout=None,
+                                  continue_on_error=False)
+        cmd_backup(args, self.mock_osbs(state={
+            'buildconfigs': make_resources(('a', '1'), ('b', '2')),
+            'imagestreams': make_resources(('c', '3'), ('d', '4')),
+        }))
+
+        increment = str(tmpdir.join('increment.tar.bz2'))
+        args.filename = increment
+        args.base = base
+        cmd_backup(args, self.mock_osbs(state={
+            'buildconfigs': make_resources(('a', '1'), ('b', '5'), ('e', '6')),
+            'imagestreams': make_resources(('d', '4')),
+        }))
+
+        contents = self.read_backup(increment)
+        manifest = contents.pop(BACKUP_MANIFEST)
+        # only new and changed resources
+        assert contents == {
+            'buildconfigs.json': {'items': make_resources(('b', '5'), ('e', '6'))},
+            'imagestreams.json': {'items': []},
+        }
+        assert manifest['base'] == self.read_backup(base)[BACKUP_MANIFEST]['name']
+        assert [(entry['name'], entry['resourceVersion'])
+                for entry in manifest['resources']] == [('a', '1'), ('b', '5'), ('e', '6'),
+                                                        ('d', '4')]
+        assert [(entry['resource'], entry['name'])
+                for entry in manifest['deleted']] == [('imagestreams', 'c')]
+
+
+class TestRestore(object):
+
+    @staticmethod
+    def make_backup(filename, resource_types):
+        with TarWriter(filename, 'osbs-backup') as t:
+            for resource_type in resource_types:
+                items = [{'metadata': {'name': '{}-{}'.format(resource_type, index)}}
+                         for index in range(3)]
+                t.write_file(resource_type + '.json',
+                             json.dumps({'kind': 'List', 'items': items}).encode('ascii'))
+
+    @staticmethod
+    def mock_osbs(restored, failed=0):
+        osbs = flexmock()
+        osbs.should_receive('pause_builds').once()
+        osbs.should_receive('resume_builds').once()
+
+        def restore_resource(resource_type, resources, continue_on_error, checkpoint,
+                             max_workers):
+            assert max_workers == 2
+            for resource in resources:
+                restored.append((resource_type, resource['metadata']['name']))
+                if checkpoint is not None:
+                    checkpoint.add(resource_type + '/' + resource['metadata']['name'])
+            return failed
+
+        osbs.should_receive('restore_resource').replace_with(restore_resource)
+        return osbs
+
+    @pytest.mark.parametrize('failed', [0, 1])
+    def test_cmd_restore(self, tmpdir, failed):
+        filename = str(tmpdir.join('backup.tar.bz2'))
+        checkpoint = str(tmpdir.join('checkpoint'))
+        # imagestreams are archived after buildconfigs
+        self.make_backup(filename, ['buildconfigs', 'imagestreams', 'builds'])
+        args = argparse.Namespace(BACKUP_ARCHIVE=[filename], ignore_quota_errors=False,
+                                  pause_timeout=None,
+                                  continue_on_error=True, checkpoint=checkpoint, workers=2)
+        restored = []
+        cmd_restore(args, self.mock_osbs(restored, failed=failed))
+
+        # but restored first, unknown resources are skipped
+        assert restored == [(resource_type, '{}-{}'.format(resource_type, index))
+                            for resource_type in ('imagestreams', 'buildconfigs')
+                            for index in range(3)]
+        # the checkpoint is kept only when something failed
+        assert os.path.exists(checkpoint) == bool(failed)
+
+    def test_cmd_restore_incremental(self, tmpdir):
+        states = [
+            {'buildconfigs': make_resources(('a', '1'), ('b', '2')),
+             'imagestreams': make_resources(('c', '3'), ('d', '4'))},
+            {'buildconfigs': make_resources(('a', '1'), ('b', '5'), ('e', '6')),
+             'imagestreams': make_resources(('d', '4'))},
+            {'buildconfigs': make_resources(('b', '5'), ('e', '7')),
+             'imagestreams': make_resources(('d', '4'), ('f', '8'))},
+        ]
+        archives = []
+        for index, state in enumerate(states):
+            archives.append(str(tmpdir.join('backup-{}.tar.bz2'.format(index))))
+            args = argparse.Namespace(instance='default', filename=archives[-1],
+                                      compression='bz2', ignore_quota_errors=False,
+                                      pause_timeout=None,
+                                      snapshot=False, continue_on_error=False,
+                                      base=archives[-2] if index else None)
+            cmd_backup(args, TestBackup.mock_osbs(state=state))
+
+        args = argparse.Namespace(BACKUP_ARCHIVE=archives, ignore_quota_errors=False,
+                                  pause_timeout=None,
+                                  continue_on_error=False, checkpoint=None, workers=2)
+        restored = []
+        cmd_restore(args, self.mock_osbs(restored))
+
+        # the last state, imagestreams first; a newer version of 'e' replaces the
+        # earlier one, deleted 'a' and 'c' are not restored
+        assert restored == [('imagestreams', 'd'), ('imagestreams', 'f'),
+                            ('buildconfigs', 'b'), ('buildconfigs', 'e')]
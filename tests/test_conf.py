@@ -11,11 +11,12 @@ from __future__ import absolute_import
 from contextlib import contextmanager
 from flexmock import flexmock
 import argparse
+import os
 from copy import deepcopy
 from osbs.conf import Configuration
 from osbs import utils
 from osbs.exceptions import OsbsValidationException
-from osbs.constants import DEFAULT_ARRANGEMENT_VERSION
+from osbs.constants import DEFAULT_ARRANGEMENT_VERSION, DEFAULT_LIST_PAGE_SIZE
 import pytest
 from tempfile import NamedTemporaryFile
 import logging
@@ -259,6 +260,48 @@ class TestConfiguration(object):
         else:
             assert conf.get_arrangement_version() == expected
 
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({'general': {}}, None),
+        ({'general': {'git_mirror_cache_max_size_mb': '2'}}, 2 * 1024 * 1024),
+    ])
+    def test_git_mirror_cache_max_size(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file)
+            assert conf.get_git_mirror_cache_max_size() == expected
+
+    def test_git_mirror_cache_max_size_invalid(self):
+        with self.config_file({'general': {'git_mirror_cache_max_size_mb': '1G'}}) as config_file:
+            conf = Configuration(conf_file=config_file)
+            with pytest.raises(OsbsValidationException):
+                conf.get_git_mirror_cache_max_size()
+
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({'general': {}}, os.path.expanduser('~/.osbs')),
+        ({'general': {'oauth_token_cache_dir': '/var/cache/osbs'}}, '/var/cache/osbs'),
+        ({'general': {'oauth_token_cache_dir': ''}}, None),
+    ])
+    def test_oauth_token_cache_dir(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file)
+            assert conf.get_oauth_token_cache_dir() == expected
+
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({'default': {}}, DEFAULT_LIST_PAGE_SIZE),
+        ({'default': {'list_page_size': '100'}}, 100),
+        ({'default': {'list_page_size': '0'}}, 0),
+    ])
+    def test_list_page_size(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file)
+            assert conf.get_list_page_size() == expected
+
+    @pytest.mark.parametrize('value', ['-1', 'all'])
+    def test_list_page_size_invalid(self, value):
+        with self.config_file({'default': {'list_page_size': value}}) as config_file:
+            conf = Configuration(conf_file=config_file)
+            with pytest.raises(OsbsValidationException):
+                conf.get_list_page_size()
+
     @pytest.mark.parametrize(('platform', 'config', 'kwargs', 'expected'), [
         ('',
          {},
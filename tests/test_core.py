@@ -17,6 +17,7 @@ import json
 import logging
 import inspect
 import os
+from multiprocessing.pool import ThreadPool
 
 from osbs.http import HttpResponse
 from osbs.constants import (BUILD_FINISHED_STATES, BUILD_CANCELLED_STATE,
@@ -26,6 +27,7 @@ from osbs.exceptions import (OsbsResponseException, OsbsException,
                              OsbsNetworkException, OsbsWatchBuildNotFound,
                              ImportImageFailed)
 from osbs.core import check_response, Openshift
+from osbs.utils.token_cache import OAuthTokenCache
 
 from tests.constants import (TEST_BUILD, TEST_CANCELLED_BUILD, TEST_LABEL,
                              TEST_LABEL_VALUE, TEST_IMAGESTREAM, TEST_IMAGESTREAM_NO_TAGS,
@@ -169,6 +171,78 @@ class TestOpenshift(object):
         assert list_builds is not None
         assert bool(list_builds.json())  # is there at least something
 
+    @pytest.mark.parametrize(('page_size', 'expected_urls'), [
+        (None, ['builds/?labelSelector=buildconfig%3Dspam']),
+        (2, ['builds/?labelSelector=buildconfig%3Dspam&limit=2',
+             'builds/?labelSelector=buildconfig%3Dspam&limit=2&continue=token-1',
+             'builds/?labelSelector=buildconfig%3Dspam&limit=2&continue=token-2']),
+    ])
+    def test_iter_items(self, openshift, page_size, expected_urls):  # noqa
+        openshift.list_page_size = page_size
+        pages = iter([
+            {'metadata': {'continue': 'token-1'}, 'items': [{'n': 1}, {'n': 2}]},
+            {'metadata': {'continue': 'token-2'}, 'items': [{'n': 3}, {'n': 4}]},
+            {'metadata': {}, 'items': [{'n': 5}]},
+        ])
+        urls = []
+
+        def mock_get(url):
+            urls.append(url)
+            page = next(pages)
+            return flexmock(status_code=http_client.OK, json=lambda: page)
+
+        flexmock(openshift).should_receive('_get').replace_with(mock_get)
+
+        items = openshift.iter_items(openshift.list_builds, build_config_id='spam')
+        assert urls == []  # nothing is requested until needed
+        assert next(items) == {'n': 1}
+        assert len(urls) == 1
+
+        if page_size:
+            assert list(items) == [{'n': 2}, {'n': 3}, {'n': 4}, {'n': 5}]
+        else:
+            # without limit, the whole list is in the first response
+            assert list(items) == [{'n': 2}]
+        assert [url.split('namespaces/default/')[-1] for url in urls] == expected_urls
+
+    def test_iter_pages_error(self, openshift):  # noqa
+        openshift.list_page_size = 1
+        responses = iter([
+            flexmock(status_code=http_client.OK,
+                     json=lambda: {'metadata': {'continue': 'expired'}, 'items': [{}]}),
+            flexmock(status_code=http_client.GONE, content=b'continue token expired'),
+        ])
+        flexmock(openshift).should_receive('_get').replace_with(lambda url: next(responses))
+
+        pages = openshift.iter_pages(openshift.list_pods)
+        next(pages)
+        with pytest.raises(OsbsResponseException) as exc:
+            next(pages)
+        assert exc.value.status_code == http_client.GONE
+
+    def test_dump_resource_snapshot(self, openshift):  # noqa
+        openshift.list_page_size = 1
+        pages = iter([
+            {'metadata': {'continue': 'token-1', 'resourceVersion': '42'}, 'items': [{}]},
+            {'metadata': {'resourceVersion': '42'}, 'items': [{}]},
+        ])
+        urls = []
+
+        def mock_get(url):
+            urls.append(url)
+            page = next(pages)
+            return flexmock(status_code=http_client.OK, json=lambda: page)
+
+        flexmock(openshift).should_receive('_get').replace_with(mock_get)
+
+        list(openshift.iter_pages(openshift.dump_resource, resource_type='buildconfigs',
+                                  resource_version='42'))
+        # the continue token keeps the version, the server rejects both
+        assert [url.split('namespaces/default/')[-1] for url in urls] == [
+            'buildconfigs?limit=1&resourceVersion=42&resourceVersionMatch=Exact',
+            'buildconfigs?limit=1&continue=token-1',
+        ]
+
     def test_list_pods(self, openshift):  # noqa
         response = openshift.list_pods(label="openshift.io/build.name=%s" %
                                        TEST_BUILD)
@@ -300,6 +374,30 @@ class TestOpenshift(object):
         response = openshift.get_build_config(build_config_name)
         assert response['spam'] == 'maps'
 
+    def test_patch_build_config(self, openshift):  # noqa
+        patch = '{"spec": {"nodeSelector": null}}'
+        build_config_name = 'some-build-config-name'
+        expected_url = openshift._build_url(
+            "build.openshift.io/v1",
+            "buildconfigs/%s" % build_config_name
+        )
+        (flexmock(openshift)
+            .should_receive("_patch")
+            .with_args(expected_url, data=patch,
+                       headers={"Content-Type": "application/merge-patch+json"})
+            .once()
+            .and_return(make_json_response({"spam": "maps"})))
+        response = openshift.patch_build_config(build_config_name, patch)
+        assert response.json()['spam'] == 'maps'
+
+    def test_patch_build_config_conflict(self, openshift):  # noqa
+        (flexmock(openshift)
+            .should_receive("_patch")
+            .and_return(HttpResponse(409, {}, b'')))
+        with pytest.raises(OsbsResponseException) as exc_info:
+            openshift.patch_build_config('some-build-config-name', '{}')
+        assert exc_info.value.status_code == 409
+
     def test_get_missing_build_config(self, openshift):  # noqa
         build_config_name = 'some-build-config-name'
         expected_url = openshift._build_url(
@@ -473,19 +571,24 @@ class TestOpenshift(object):
         except AttributeError:
             return  # not every combination is implemented
 
-        get_expectation = (flexmock(openshift)
-                           .should_receive('_get')
-                           .times(len(status_codes)))
-        put_expectation = (flexmock(openshift)
-                           .should_receive('_put')
-                           .times(len(status_codes)))
+        if update_or_set == 'update':
+            patch = {'metadata': {attr_type: {'key': 'value'}}}
+        else:
+            patch = [{'op': 'add', 'path': '/metadata/' + attr_type, 'value': {'key': 'value'}}]
+
+        # metadata are patched without reading the object
+        (flexmock(openshift)
+            .should_receive('_get')
+            .never())
+        patch_expectation = (flexmock(openshift)
+                             .should_receive('_patch')
+                             .with_args(str, data=json.dumps(patch), headers=dict)
+                             .times(len(status_codes)))
         for status_code in status_codes:
-            get_response = make_json_response({"metadata": {}})
-            put_response = HttpResponse(status_code,
-                                        headers={},
-                                        content=b'')
-            get_expectation = get_expectation.and_return(get_response)
-            put_expectation = put_expectation.and_return(put_response)
+            patch_response = HttpResponse(status_code,
+                                          headers={},
+                                          content=b'')
+            patch_expectation = patch_expectation.and_return(patch_response)
 
         (flexmock(time)
             .should_receive('sleep')
@@ -498,6 +601,65 @@ class TestOpenshift(object):
         else:
             fn(*args)
 
+    def test_adjust_attributes_custom(self, openshift):  # noqa
+        def remove_things(metadata, things, values):
+            for key in values:
+                metadata[things].pop(key, None)
+
+        (flexmock(openshift)
+            .should_receive('_get')
+            .once()
+            .and_return(make_json_response({'metadata': {'labels': {'a': '1', 'b': '2'}}})))
+        (flexmock(openshift)
+            .should_receive('_put')
+            .with_args(str, data=json.dumps({'metadata': {'labels': {'b': '2'}}}),
+                       use_json=True)
+            .once()
+            .and_return(HttpResponse(http_client.OK, headers={}, content=b'')))
+
+        openshift.adjust_attributes_on_object('builds', 'any-object-id', 'labels', {'a': None},
+                                              remove_things)
+
+    @pytest.mark.parametrize('replace', [False, True])  # noqa
+    def test_patch_metadata_on_objects(self, openshift, replace):
+        metadata_by_name = {
+            'build-{}'.format(index): {'labels': {'index': str(index)},
+                                       'annotations': {'spam': 'eggs'}}
+            for index in range(20)
+        }
+
+        def mock_patch_metadata(collection, name, metadata, replace):
+            assert collection == 'builds'
+            assert metadata == metadata_by_name[name]
+            return name
+
+        (flexmock(openshift)
+            .should_receive('patch_metadata_on_object')
+            .replace_with(mock_patch_metadata)
+            .times(len(metadata_by_name)))
+
+        results = openshift.patch_metadata_on_objects('builds', metadata_by_name,
+                                                      replace=replace, max_workers=4)
+        assert results == {name: name for name in metadata_by_name}
+
+    def test_patch_metadata_on_objects_failure(self, openshift):  # noqa
+        def mock_patch(url, data, headers):
+            if 'build-1' in url:
+                return HttpResponse(http_client.NOT_FOUND, headers={}, content=b'')
+            return HttpResponse(http_client.OK, headers={}, content=b'{}')
+
+        (flexmock(openshift)
+            .should_receive('_patch')
+            .replace_with(mock_patch)
+            .times(3))
+
+        metadata = {'labels': {'spam': 'eggs'}}
+        with pytest.raises(OsbsException) as exc_info:
+            openshift.patch_metadata_on_objects('builds', {'build-0': metadata,
+                                                           'build-1': metadata,
+                                                           'build-2': metadata})
+        assert 'builds: build-1' in str(exc_info.value)
+
     def test_put_image_stream_tag(self, openshift):  # noqa
         tag_name = 'spam'
         tag_id = 'maps:' + tag_name
@@ -859,3 +1021,120 @@ class TestOpenshift(object):
         else:
             assert openshift.import_image_tags(imagestream_name, stream_import,
                                                tags, source_repo, insecure) is expect_import
+
+
+class OAuthServer(object):
+    """
+    Connection issuing token-1, token-2, ... and accepting only the last one
+    """
+
+    def __init__(self):
+        self.issued = []
+        self.accept = True
+
+    def get(self, url, headers=None, **kwargs):
+        if '/oauth/authorize' in url:
+            self.issued.append('token-%d' % (len(self.issued) + 1))
+            location = ('https://oauth/token/display#access_token=%s&expires_in=86400'
+                        '&token_type=bearer' % self.issued[-1])
+            return HttpResponse(http_client.FOUND, {'location': location}, b'')
+
+        if self.accept and headers.get('Authorization') == 'Bearer %s' % self.issued[-1]:
+            return make_json_response({'metadata': {'name': 'user'}})
+        return HttpResponse(http_client.UNAUTHORIZED, {}, b'{}')
+
+
+class TestOAuthToken(object):
+
+    def make_openshift(self, server, tmpdir=None, **kwargs):
+        kwargs.setdefault('username', 'user')
+        kwargs.setdefault('password', 'password')
+        if tmpdir is not None:
+            kwargs['token_cache'] = OAuthTokenCache(str(tmpdir.join('default.oauth.json')))
+        openshift = Openshift(APIS_PREFIX, '/oauth/authorize', use_auth=True, **kwargs)
+        openshift._con = server
+        return openshift
+
+    def test_shared_by_processes(self, tmpdir):
+        server = OAuthServer()
+        self.make_openshift(server, tmpdir).get_user()
+        self.make_openshift(server, tmpdir).get_user()
+        assert server.issued == ['token-1']
+
+        # tokens of other users are not shared
+        self.make_openshift(server, tmpdir, username='other').get_user()
+        assert server.issued == ['token-1', 'token-2']
+
+    def test_refresh_before_expiry(self, tmpdir):
+        server = OAuthServer()
+        openshift = self.make_openshift(server, tmpdir)
+        openshift.get_user()
+
+        now = time.time()
+        flexmock(time).should_receive('time').and_return(now + 86400 - 60)
+        openshift.get_user()
+        self.make_openshift(server, tmpdir).get_user()
+        assert server.issued == ['token-1', 'token-2']
+
+    @pytest.mark.parametrize('cached', [True, False])
+    def test_renew_rejected(self, tmpdir, cached):
+        server = OAuthServer()
+        openshift = self.make_openshift(server, tmpdir if cached else None)
+        other_openshift = self.make_openshift(server, tmpdir if cached else None)
+        openshift.get_user()
+        other_openshift.get_user()
+
+        # token-1 is revoked
+        server.issued.append('revoked')
+        openshift.get_user()
+        other_openshift.get_user()
+        if cached:
+            assert server.issued == ['token-1', 'revoked', 'token-3']
+        else:
+            assert server.issued == ['token-1', 'token-2', 'revoked', 'token-4', 'token-5']
+
+    def test_renew_rejected_by_threads(self):
+        server = OAuthServer()
+        openshift = self.make_openshift(server)
+        openshift.get_user()
+
+        # token-1 is revoked, all threads get rejected, one renews it
+        server.issued.append('revoked')
+        pool = ThreadPool(8)
+        try:
+            users = pool.map(lambda _: openshift.get_user().json(), range(8))
+        finally:
+            pool.close()
+        assert users == [{'metadata': {'name': 'user'}}] * 8
+        assert server.issued == ['token-1', 'revoked', 'token-3']
+
+        # rejection of the replaced token is not renewed again
+        assert openshift._renew_oauth_token(stale_token='token-1') == 'token-3'
+        assert server.issued == ['token-1', 'revoked', 'token-3']
+
+    def test_unwritable_cache(self, tmpdir):
+        server = OAuthServer()
+        tmpdir.join('home').write('')
+        openshift = self.make_openshift(server)
+        openshift.token_cache = OAuthTokenCache(str(tmpdir.join('home', 'default.oauth.json')))
+        openshift.get_user()
+        assert server.issued == ['token-1']
+
+    def test_renew_once(self, tmpdir):
+        server = OAuthServer()
+        server.accept = False
+        with pytest.raises(OsbsResponseException) as exc_info:
+            self.make_openshift(server, tmpdir).get_user()
+        assert exc_info.value.status_code == http_client.UNAUTHORIZED
+        assert server.issued == ['token-1', 'token-2']
+
+    def test_configured_token_not_renewed(self, tmpdir):
+        server = OAuthServer()
+        server.issued.append('configured')
+        openshift = self.make_openshift(server, tmpdir, token='configured')
+        openshift.get_user()
+
+        server.accept = False
+        with pytest.raises(OsbsResponseException):
+            openshift.get_user()
+        assert server.issued == ['configured']
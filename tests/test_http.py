@@ -7,7 +7,6 @@ of the BSD license. See the LICENSE file for details.
 """
 from __future__ import absolute_import
 
-from distutils.version import LooseVersion
 import logging
 
 from flexmock import flexmock
@@ -16,9 +15,11 @@ import requests
 
 from urllib3 import __version__ as urllib3_version
 from urllib3.util import Retry
-from osbs.http import HttpSession, HttpStream, http_client, HttpResponse
+import osbs.http
+from osbs.http import HttpSession, HttpStream, http_client, HttpResponse, make_retry
 from osbs.exceptions import OsbsNetworkException, OsbsException, OsbsResponseException
 from osbs.constants import HTTP_RETRIES_STATUS_FORCELIST, HTTP_REQUEST_TIMEOUT
+from osbs.utils import parse_version
 
 logger = logging.getLogger(__file__)
 
@@ -31,7 +32,7 @@ def s():
 @pytest.fixture(scope='module')
 def error_response_logged():
     """Error response logging works only with urllib3>1.15"""
-    return LooseVersion(urllib3_version) < LooseVersion('1.15')
+    return parse_version(urllib3_version) < parse_version('1.15')
 
 
 def has_connection():
@@ -303,3 +304,18 @@ class TestHttpResponse(object):
         with pytest.raises(OsbsResponseException) as exc_info:
             response.json()
         assert 'HtttpResponse has corrupt json' in exc_info.value.message
+
+
+@pytest.mark.parametrize(('version', 'raise_on_status'), [
+    ('1.14', False),
+    ('1.26.5', True),
+    ('1.26.5.post1', True),
+    ('1.26.18+local', True),
+    ('2.0.0.dev0', True),
+    ('1.24.2-0.el8', True),
+    ('unknown', True),
+])
+def test_make_retry(monkeypatch, version, raise_on_status):
+    monkeypatch.setattr(osbs.http, 'urllib3_version', version)
+    monkeypatch.setattr(osbs.http, 'Retry', lambda **kwargs: kwargs)
+    assert ('raise_on_status' in make_retry(total=3, raise_on_status=False)) is raise_on_status
@@ -15,8 +15,10 @@ from osbs.constants import (REPO_CONFIG_FILE,
                             REPO_CONTAINER_CONFIG,)
 from osbs.utils.labels import Labels
 from osbs.repo_utils import RepoInfo, RepoConfiguration, AdditionalTagsConfig, ModuleSpec
+from dockerfile_parse import DockerfileParser
 from textwrap import dedent
 
+import json
 import os
 import pytest
 import yaml
@@ -139,6 +141,43 @@ class TestRepoInfo(object):
 
         assert repo_info.base_image == base_image
 
+    @pytest.mark.parametrize('dockerfile', (None, 'FROM fedora\nLABEL name=spam\n'))
+    def test_serialization(self, tmpdir, dockerfile):
+        tmpdir.join(REPO_CONTAINER_CONFIG).write(dedent("""\
+            compose:
+                modules:
+                - n:s:v
+            tags: [eggs]
+            """))
+        tmpdir.join(REPO_CONFIG_FILE).write('[autorebuild]\nenabled=true\n')
+        if dockerfile:
+            tmpdir.join('Dockerfile').write(dockerfile)
+
+        config = RepoConfiguration(str(tmpdir), git_uri='uri', git_ref='ref',
+                                   git_branch='branch', depth=3)
+        tags_config = AdditionalTagsConfig(tags=config.container['tags'])
+        repo_info = RepoInfo(DockerfileParser(str(tmpdir), cache_content=True), config,
+                             tags_config)
+        data = json.loads(json.dumps(repo_info.to_dict()))
+        tmpdir.remove()
+
+        copy = RepoInfo.from_dict(data)
+        assert copy.configuration.container == config.container
+        assert copy.configuration.container_module_specs == config.container_module_specs
+        assert copy.configuration.is_autorebuild_enabled()
+        assert copy.configuration.depth == 3
+        assert copy.git_uri == 'uri'
+        assert copy.git_ref == 'ref'
+        assert copy.git_branch == 'branch'
+        assert copy.additional_tags.tags == ['eggs']
+        assert copy.additional_tags.from_container_yaml
+        if dockerfile:
+            assert copy.labels.get_name_and_value(Labels.LABEL_TYPE_NAME) == ('name', 'spam')
+            assert copy.base_image == 'fedora'
+        else:
+            with pytest.raises(RuntimeError):
+                copy.base_image  # pylint: disable=pointless-statement
+
 
 class TestRepoConfiguration(object):
 
@@ -0,0 +1,42 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import os
+
+from osbs.utils.cache import EntryCache
+
+
+def test_memory_entries_bounded():
+    cache = EntryCache(max_entries=2)
+    cache._remember('a', 1)
+    cache._remember('b', 2)
+    # recently used entries are kept
+    assert cache._recall('a') == 1
+    cache._remember('c', 3)
+    assert cache._recall('b') is None
+    assert cache._recall('a') == 1
+    assert cache._recall('c') == 3
+
+
+def test_store(tmpdir):
+    cache_dir = tmpdir.join('cache')
+    cache = EntryCache(str(cache_dir))
+    assert cache._store('a', '{}')
+    assert cache._store('a', '[]')
+    assert os.listdir(str(cache_dir)) == ['a.json']
+    assert cache_dir.join('a.json').read() == '[]'
+
+
+def test_store_failure(tmpdir):
+    cache_dir = tmpdir.join('cache')
+    cache_dir.join('a.json').ensure(dir=True)
+    cache = EntryCache(str(cache_dir))
+    assert not cache._store('a', '{}')
+    # no temporary files are left behind
+    assert os.listdir(str(cache_dir)) == ['a.json']
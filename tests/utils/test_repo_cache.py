@@ -0,0 +1,146 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import os
+import subprocess
+
+from flexmock import flexmock
+import pytest
+
+from osbs import utils
+from osbs.constants import REPO_CONTAINER_CONFIG
+from osbs.utils import get_repo_info
+from osbs.utils import repo_cache
+from osbs.utils.git_mirror import GitMirrorCache
+from osbs.utils.repo_cache import RepoInfoCache, RepoInfoKey, ls_remote
+
+
+def git(repo, *args):
+    cmd = ['git', '-c', 'user.name=Gerald Host', '-c', 'user.email=ghost@example.com']
+    return subprocess.check_output(cmd + list(args), cwd=repo,
+                                   universal_newlines=True).strip()
+
+
+@pytest.fixture
+def repo(tmpdir):
+    path = str(tmpdir.join('repo'))
+    subprocess.check_call(['git', 'init', '-q', path])
+    git(path, 'symbolic-ref', 'HEAD', 'refs/heads/master')
+    with open(os.path.join(path, 'Dockerfile'), 'w') as f:
+        f.write('FROM fedora\n')
+    with open(os.path.join(path, REPO_CONTAINER_CONFIG), 'w') as f:
+        f.write('tags: [spam]\n')
+    git(path, 'add', '.')
+    git(path, 'commit', '-q', '-m', 'first')
+    git(path, 'tag', '-a', '-m', 'annotated', 'v1')
+    git(path, 'commit', '-q', '--allow-empty', '-m', 'second')
+    git(path, 'checkout', '-q', '-b', 'feature')
+    git(path, 'commit', '-q', '--allow-empty', '-m', 'third')
+    git(path, 'checkout', '-q', 'master')
+    return path
+
+
+@pytest.mark.parametrize('use_mirror', [False, True])
+@pytest.mark.parametrize(('git_ref', 'git_branch', 'expected_ref', 'expected_branch'), [
+    ('master', None, 'master', None),
+    ('HEAD', 'feature', 'feature', 'feature'),
+    ('v1', 'master', 'v1^{commit}', 'master'),
+    ('refs/heads/feature', None, 'feature', None),
+])
+def test_resolve(tmpdir, repo, use_mirror, git_ref, git_branch, expected_ref,
+                 expected_branch):
+    mirror_cache = GitMirrorCache(str(tmpdir.join('mirrors'))) if use_mirror else None
+    key = RepoInfoCache().resolve(repo, git_ref, git_branch=git_branch,
+                                  mirror_cache=mirror_cache)
+    assert key.commit_id == git(repo, 'rev-parse', expected_ref)
+    if expected_branch:
+        assert key.branch_commit_id == git(repo, 'rev-parse', expected_branch)
+    else:
+        assert key.branch_commit_id is None
+
+
+def test_resolve_commit_id(repo):
+    commit_id = git(repo, 'rev-parse', 'master~1')
+    flexmock(repo_cache).should_receive('ls_remote').and_return({})
+    key = RepoInfoCache().resolve(repo, commit_id)
+    assert key.commit_id == commit_id
+
+
+def test_resolve_unknown(repo):
+    assert RepoInfoCache().resolve(repo, 'master~1') is None
+    assert RepoInfoCache().resolve(repo + 'missing', 'master') is None
+
+
+def test_ls_remote(repo):
+    refs = ls_remote(repo)
+    assert refs['refs/heads/master'] == git(repo, 'rev-parse', 'master')
+    assert refs['refs/tags/v1^{}'] == git(repo, 'rev-parse', 'v1^{commit}')
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_get_repo_info_cached(tmpdir, repo, on_disk):
+    cache_dir = str(tmpdir.join('cache')) if on_disk else None
+    cache = RepoInfoCache(cache_dir)
+    repo_info = get_repo_info(repo, 'master', git_branch='master', repo_info_cache=cache)
+    assert repo_info.additional_tags.tags == ['spam']
+
+    if on_disk:
+        # new process, only disk entries are available
+        cache = RepoInfoCache(cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+
+    flexmock(utils).should_receive('checkout_git_repo').never()
+    cached = get_repo_info(repo, 'HEAD', git_branch='master', repo_info_cache=cache)
+    assert cached is not repo_info
+    assert cached.git_ref == 'HEAD'
+    assert cached.git_branch == 'master'
+    assert cached.base_image == 'fedora'
+    assert cached.additional_tags.tags == ['spam']
+    assert cached.configuration.container == repo_info.configuration.container
+
+
+def test_get_repo_info_new_commit(repo):
+    cache = RepoInfoCache()
+    get_repo_info(repo, 'master', git_branch='master', repo_info_cache=cache)
+
+    with open(os.path.join(repo, REPO_CONTAINER_CONFIG), 'w') as f:
+        f.write('tags: [bacon]\n')
+    git(repo, 'commit', '-q', '-a', '-m', 'change tags')
+
+    repo_info = get_repo_info(repo, 'master', git_branch='master', repo_info_cache=cache)
+    assert repo_info.additional_tags.tags == ['bacon']
+
+
+def test_cached_entries_not_shared(repo):
+    cache = RepoInfoCache()
+    key = RepoInfoKey(repo, git(repo, 'rev-parse', 'master'), None)
+    cache.put(key, get_repo_info(repo, 'master'))
+
+    cache.get(key).configuration.container['tags'].append('bacon')
+    assert cache.get(key).configuration.container['tags'] == ['spam']
+
+
+def test_schema_change_invalidates(tmpdir, repo):
+    cache = RepoInfoCache(str(tmpdir.join('cache')))
+    key = RepoInfoKey(repo, git(repo, 'rev-parse', 'master'), None)
+    get_repo_info(repo, 'master', repo_info_cache=cache)
+    assert cache.get(key) is not None
+
+    flexmock(repo_cache).should_receive('container_schema_digest').and_return('changed')
+    assert cache.get(key) is None
+
+
+def test_memory_entries_bounded(repo):
+    cache = RepoInfoCache(max_entries=1)
+    repo_info = get_repo_info(repo, 'master')
+    keys = [RepoInfoKey(repo, commit, None) for commit in ('a' * 40, 'b' * 40)]
+    for key in keys:
+        cache.put(key, repo_info)
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
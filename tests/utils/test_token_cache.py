@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from __future__ import absolute_import
+
+import os
+import stat
+import time
+
+from flexmock import flexmock
+import pytest
+
+from osbs.constants import OAUTH_TOKEN_REFRESH_MARGIN
+from osbs.utils.token_cache import OAuthToken, OAuthTokenCache
+
+
+@pytest.mark.parametrize(('expires_in', 'margin'), [
+    (86400, OAUTH_TOKEN_REFRESH_MARGIN),
+    (600, 60),
+])
+def test_issue(expires_in, margin):
+    flexmock(time).should_receive('time').and_return(1000)
+    oauth_token = OAuthToken.issue('token', expires_in)
+    assert oauth_token == OAuthToken('token', 1000 + expires_in, 1000 + expires_in - margin)
+    assert not oauth_token.needs_refresh()
+
+    flexmock(time).should_receive('time').and_return(1000 + expires_in - margin)
+    assert oauth_token.needs_refresh()
+
+
+def test_issue_unknown_lifetime():
+    oauth_token = OAuthToken.issue('token')
+    assert oauth_token == OAuthToken('token', None, None)
+    assert not oauth_token.needs_refresh()
+
+
+def test_refresh(tmpdir):
+    path = str(tmpdir.join('osbs', 'default.oauth.json'))
+    cache = OAuthTokenCache(path)
+    assert cache.get('key') is None
+
+    oauth_token = OAuthToken.issue('token', 3600)
+    assert cache.refresh('key', lambda: oauth_token) == oauth_token
+    assert cache.get('key') == oauth_token
+    assert cache.get('other key') is None
+    # only the user may read the token
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # another process got the token meanwhile
+    other_cache = OAuthTokenCache(path)
+    assert other_cache.refresh('key', lambda: pytest.fail('not fetched')) == oauth_token
+
+
+def test_refresh_expiring(tmpdir):
+    cache = OAuthTokenCache(str(tmpdir.join('default.oauth.json')))
+    cache.refresh('key', lambda: OAuthToken('old', time.time() + 10, time.time() - 1))
+    assert cache.get('key') is None
+
+    new_token = OAuthToken.issue('new', 3600)
+    assert cache.refresh('key', lambda: new_token) == new_token
+    assert cache.get('key') == new_token
+
+
+def test_refresh_stale(tmpdir):
+    cache = OAuthTokenCache(str(tmpdir.join('default.oauth.json')))
+    cache.refresh('key', lambda: OAuthToken.issue('revoked', 3600))
+
+    # the server issues no new token, the rejected one is not kept
+    assert cache.refresh('key', lambda: OAuthToken(None, None, None),
+                         stale_token='revoked') == OAuthToken(None, None, None)
+    assert cache.get('key') is None
+
+    cache.refresh('key', lambda: OAuthToken.issue('revoked', 3600))
+    new_token = OAuthToken.issue('new', 3600)
+    assert cache.refresh('key', lambda: new_token, stale_token='revoked') == new_token
+    assert cache.get('key') == new_token
+
+
+@pytest.mark.parametrize('content', ['', '{"key": ', '[]', '{"key": "key"}'])
+def test_get_invalid(tmpdir, content):
+    tmpdir.join('default.oauth.json').write(content)
+    assert OAuthTokenCache(str(tmpdir.join('default.oauth.json'))).get('key') is None
+
+
+def test_refresh_unwritable(tmpdir):
+    # cache directory cannot be created
+    tmpdir.join('home').write('')
+    cache = OAuthTokenCache(str(tmpdir.join('home', 'osbs', 'default.oauth.json')))
+    oauth_token = OAuthToken.issue('token', 3600)
+    assert cache.refresh('key', lambda: oauth_token) == oauth_token
+    assert cache.get('key') is None
+
+
+def test_refresh_write_fails(tmpdir):
+    path = str(tmpdir.join('default.oauth.json'))
+    tmpdir.join('default.oauth.json.tmp').ensure(dir=True)
+    cache = OAuthTokenCache(path)
+    oauth_token = OAuthToken.issue('token', 3600)
+    assert cache.refresh('key', lambda: oauth_token) == oauth_token
+    assert cache.get('key') is None
@@ -10,27 +10,33 @@ from __future__ import absolute_import
 from flexmock import flexmock
 import os
 import os.path
+import shutil
 import subprocess
 import pytest
 import datetime
 import re
 import sys
 import requests
-from time import tzset, sleep
-from pkg_resources import parse_version
+from io import BytesIO, StringIO
+from time import tzset
 from textwrap import dedent
 
-from osbs.constants import REPO_CONTAINER_CONFIG
+from osbs.constants import REPO_CONTAINER_CONFIG, PY3, BACKUP_COMPRESSIONS
 from osbs.repo_utils import RepoInfo
+from osbs.utils.labels import Labels
 from osbs.utils import (buildconfig_update,
                         git_repo_humanish_part_from_uri, sanitize_strings_for_openshift,
                         get_time_from_rfc3339, TarWriter, TarReader, make_name_from_git,
                         wrap_name_from_git, get_instance_token_file_name, sanitize_version,
-                        has_triggers, clone_git_repo, get_repo_info, ImageName)
-from osbs.exceptions import OsbsException, OsbsCommitNotFound
+                        has_triggers, clone_git_repo, get_repo_info, ImageName,
+                        json_merge_patch, normalize_build_config, normalize_triggers,
+                        external_sort, parse_version, Version, get_parallel_compressor,
+                        iter_json_items, Checkpoint)
+from osbs.exceptions import OsbsException, OsbsCommitNotFound, OsbsValidationException
 from tests.constants import (TEST_DOCKERFILE_GIT, TEST_DOCKERFILE_SHA1, TEST_DOCKERFILE_INIT_SHA1,
                              TEST_DOCKERFILE_BRANCH)
 import osbs.kerberos_ccache
+import osbs.utils
 
 
 BC_NAME_REGEX = r'^[a-z0-9]([-a-z0-9]*[a-z0-9])?(\.[a-z0-9]([-a-z0-9]*[a-z0-9])?)*$'
@@ -86,6 +92,145 @@ def test_buildconfig_update():
     assert x == {'a': 'A', 'strategy': {'b1': 'newB1', 'b3': 'B3', 'b11': {}}, 'c': 'C', 'd': 'D'}
 
 
+@pytest.mark.parametrize(('orig', 'new', 'patch'), [
+    ({'a': 1}, {'a': 1}, {}),
+    ({'a': 1, 'b': 2}, {'a': 2, 'c': 3}, {'a': 2, 'b': None, 'c': 3}),
+    ({'a': {'b': 1, 'c': 2}}, {'a': {'b': 1, 'c': 3}}, {'a': {'c': 3}}),
+    ({'a': {'b': 1}}, {'a': {}}, {'a': {'b': None}}),
+    ({'a': {'b': 1}}, {'a': 'b'}, {'a': 'b'}),
+    ({'a': [1, {'b': 2}]}, {'a': [1, {'b': 3}]}, {'a': [1, {'b': 3}]}),
+])
+def test_json_merge_patch(orig, new, patch):
+    assert json_merge_patch(orig, new) == patch
+
+
+def test_json_merge_patch_buildconfig():
+    orig = {
+        'metadata': {'name': 'bc', 'labels': {'koji-task-id': '123', 'git-branch': 'master'},
+                     'resourceVersion': '42'},
+        'spec': {'nodeSelector': {'arch': 'x86_64'}, 'strategy': {'env': [{'name': 'A'}]}},
+        'status': {'lastVersion': 1},
+    }
+    new = {
+        'metadata': {'name': 'bc', 'labels': {'git-branch': 'master'}, 'resourceVersion': '42'},
+        'spec': {'strategy': {'env': [{'name': 'A'}, {'name': 'B'}]}},
+        'status': {'lastVersion': 1},
+    }
+    assert json_merge_patch(orig, new) == {
+        'metadata': {'labels': {'koji-task-id': None}},
+        'spec': {'nodeSelector': None, 'strategy': {'env': [{'name': 'A'}, {'name': 'B'}]}},
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 10000])
+def test_external_sort(chunk_size):
+    items = [{'name': name, 'time': time} for name, time in
+             [('a', 3), ('b', 1), ('c', 2), ('d', 1), ('e', 5), ('f', 0), ('g', 2)]]
+    result = list(external_sort(iter(items), key=lambda item: item['time'],
+                                chunk_size=chunk_size))
+    # stable: items with the same key keep their order
+    assert [item['name'] for item in result] == ['f', 'b', 'd', 'c', 'g', 'a', 'e']
+    assert list(external_sort([], key=len, chunk_size=chunk_size)) == []
+
+
+def test_external_sort_spills_to_files():
+    runs = []
+    real_temporary_file = osbs.utils.tempfile.TemporaryFile
+
+    def temporary_file(*args, **kwargs):
+        run = real_temporary_file(*args, **kwargs)
+        runs.append(run)
+        return run
+
+    flexmock(osbs.utils.tempfile).should_receive('TemporaryFile').replace_with(temporary_file)
+
+    result = external_sort(range(10, 0, -1), key=lambda item: item, chunk_size=4)
+    assert next(result) == 1
+    # 4 + 4 items were written to files, 2 are kept in memory
+    assert len(runs) == 2
+    assert list(result) == list(range(2, 11))
+    assert all(run.closed for run in runs)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64 * 1024])
+@pytest.mark.parametrize(('document', 'expected'), [
+    ('{"kind": "List", "metadata": {"a": [1, {"b": "]}"}]}, '
+     '"items": [{"name": "x]}, ["}, 12345, -1.5e3, "\\"", null, [], {}], "z": 1}',
+     [{"name": "x]}, ["}, 12345, -1.5e3, '"', None, [], {}]),
+    ('  {\n "items" :\n [ 1 ,\t2 ] \n}\n', [1, 2]),
+    ('{"items": []}', []),
+    ('{"items": null}', []),
+    ('{"other": [1]}', []),
+    ('{}', []),
+])
+def test_iter_json_items(chunk_size, document, expected):
+    assert list(iter_json_items(StringIO(document), chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize('document', [
+    '',
+    '[1, 2]',
+    '{"items": [1, 2',
+    '{"items": [1 2]}',
+    '{"items": [{"name": }]}',
+])
+def test_iter_json_items_invalid(document):
+    with pytest.raises(ValueError):
+        list(iter_json_items(StringIO(document), chunk_size=3))
+
+
+def test_checkpoint(tmpdir):
+    path = str(tmpdir.join('checkpoint'))
+    with Checkpoint(path) as checkpoint:
+        assert 'a/1' not in checkpoint
+        checkpoint.add('a/1')
+        checkpoint.add('a/2')
+        assert 'a/1' in checkpoint
+        # written as soon as added
+        with open(path) as f:
+            assert f.read() == 'a/1\na/2\n'
+
+    with Checkpoint(path) as checkpoint:
+        assert len(checkpoint) == 2
+        assert 'a/2' in checkpoint
+        checkpoint.add('b/1')
+    with open(path) as f:
+        assert f.read() == 'a/1\na/2\nb/1\n'
+
+    Checkpoint(path).remove()
+    assert not os.path.exists(path)
+
+
+def test_normalize_build_config():
+    build_config = {
+        'metadata': {'name': 'bc', 'labels': {'koji-task-id': '123'}, 'resourceVersion': '42',
+                     'uid': 'abc', 'creationTimestamp': '2020-01-01T00:00:00Z', 'generation': 3},
+        'spec': {'nodeSelector': None, 'output': {}, 'postCommit': {},
+                 'strategy': {'customStrategy': {'env': [{'name': 'A', 'value': ''}]}}},
+        'status': {'lastVersion': 1},
+    }
+    assert normalize_build_config(build_config) == {
+        'metadata': {'name': 'bc', 'labels': {'koji-task-id': '123'}},
+        'spec': {'strategy': {'customStrategy': {'env': [{'name': 'A'}]}}},
+    }
+    # original is not modified
+    assert build_config['metadata']['resourceVersion'] == '42'
+
+
+def test_normalize_triggers():
+    triggers = [
+        {'type': 'ImageChange',
+         'imageChange': {'from': {'name': 'fedora:30'}, 'lastTriggeredImageID': 'sha'}},
+        {'type': 'Generic', 'generic': {'secret': 'secret101'}},
+    ]
+    assert normalize_triggers(triggers) == [
+        {'type': 'ImageChange', 'imageChange': {'from': {'name': 'fedora:30'}}},
+        {'type': 'Generic', 'generic': {'secret': 'secret101'}},
+    ]
+    assert triggers[0]['imageChange']['lastTriggeredImageID'] == 'sha'
+    assert normalize_triggers(None) == []
+
+
 def has_trigger(buildconfig, trigger_type):
     if not has_triggers(buildconfig):
         return False
@@ -429,6 +574,89 @@ def test_tarfile(tmpdir, prefix):
         assert content == b"foobar"
 
 
+@pytest.mark.parametrize("compression", BACKUP_COMPRESSIONS)
+def test_tarfile_compression(tmpdir, compression):
+    filename = str(tmpdir.join("archive.tar." + compression))
+
+    with TarWriter(filename, directory="backup", compression=compression) as t:
+        assert t.compressor is None
+        t.write_file("a.json", b"{}")
+        t.add_file("b.json", BytesIO(b'{"items": []}'), 13)
+
+    contents = [(f.filename, f.fileobj.read()) for f in TarReader(filename)]
+    assert contents == [("backup/a.json", b"{}"), ("backup/b.json", b'{"items": []}')]
+
+
+@pytest.mark.parametrize("to_file", [True, False])
+def test_tarfile_parallel_compression(tmpdir, to_file):
+    if get_parallel_compressor("xz") is None:
+        pytest.skip("xz is not installed")
+    filename = str(tmpdir.join("archive.tar.xz"))
+
+    def write(outfile):
+        with TarWriter(outfile, compression="xz", parallel=True) as t:
+            assert t.compressor is not None
+            t.write_file("a.json", b"{}")
+
+    if to_file:
+        with open(filename, "wb") as f:
+            write(f)
+    else:
+        write(filename)
+
+    assert [(f.filename, f.fileobj.read()) for f in TarReader(filename)] == [("a.json", b"{}")]
+
+
+def test_tarfile_parallel_compression_failure(tmpdir):
+    if getattr(shutil, "which", None) is None:
+        pytest.skip("shutil.which() is not available")
+    (flexmock(osbs.utils)
+        .should_receive("get_parallel_compressor")
+        .and_return(["sh", "-c", "cat >/dev/null; exit 3"]))
+
+    with pytest.raises(OsbsException) as exc:
+        with TarWriter(str(tmpdir.join("archive.tar.gz")), compression="gz",
+                       parallel=True) as t:
+            t.write_file("a.json", b"{}")
+    assert "exit code 3" in str(exc.value)
+
+
+def test_tarfile_compression_unsupported(tmpdir):
+    # Python 2
+    assert ("xz" in BACKUP_COMPRESSIONS) == PY3
+    flexmock(osbs.utils, BACKUP_COMPRESSIONS=("bz2", "gz"))
+
+    with pytest.raises(OsbsValidationException) as exc:
+        TarWriter(str(tmpdir.join("archive.tar.xz")), compression="xz")
+    assert "unsupported compression xz, use one of: bz2, gz" in str(exc.value)
+    assert not tmpdir.join("archive.tar.xz").exists()
+
+
+@pytest.mark.parametrize("installed", [True, False])
+def test_get_parallel_compressor(installed):
+    # find_executable() on Python 2
+    (flexmock(osbs.utils)
+        .should_receive("which")
+        .with_args("pigz")
+        .and_return("/usr/bin/pigz" if installed else None))
+    assert get_parallel_compressor("gz") == (["pigz", "-c"] if installed else None)
+    assert get_parallel_compressor("zip") is None
+
+
+def test_tarfile_parallel_compression_unavailable(tmpdir):
+    (flexmock(osbs.utils)
+        .should_receive("get_parallel_compressor")
+        .with_args("gz")
+        .and_return(None))
+    filename = str(tmpdir.join("archive.tar.gz"))
+
+    with TarWriter(filename, compression="gz", parallel=True) as t:
+        assert t.compressor is None
+        t.write_file("a.json", b"{}")
+
+    assert [f.filename for f in TarReader(filename)] == ["a.json"]
+
+
 def test_get_instance_token_file_name():
     expected = os.path.join(os.path.expanduser('~'), '.osbs', 'spam.token')
 
@@ -438,6 +666,60 @@ def test_get_instance_token_file_name():
 vstr_re = re.compile(r'\d+\.\d+\.\d+')
 
 
+@pytest.mark.parametrize(('lower', 'higher'), [
+    ('1.0.5', '1.0.6'),
+    ('1.9', '1.10'),
+    ('3.6', '3.6.1'),
+    ('1.15rc1', '1.15'),
+    ('1.15a2', '1.15b1'),
+    ('1.15b1', '1.15rc1'),
+    ('1.14.99', '1.15a1'),
+    ('2.0.0.dev0', '2.0.0a1'),
+    ('2.0.0.dev0', '2.0.0'),
+    ('1.26.5', '1.26.5.post1'),
+    ('1.26.5.post1', '1.26.6'),
+    ('1.26.18', '1.26.18+local'),
+    ('1.26.18+local', '1.26.19'),
+    ('1.0+abc.9', '1.0+abc.10'),
+    ('1.0+abc', '1.0+abc.1'),
+    ('1.0+abc.1', '1.0+1'),
+    ('3.11.0', '3.11.0-0.el7'),
+    ('3.11.0-0.el7', '3.11.1'),
+    ('3.11.0-0.el7', '3.11.0-1.el7'),
+    ('3.11.0-9.el7', '3.11.0-10.el7'),
+])
+def test_version_ordering(lower, higher):
+    assert parse_version(lower) < parse_version(higher)
+    assert parse_version(higher) > parse_version(lower)
+    assert parse_version(lower) != parse_version(higher)
+
+
+def test_version():
+    version = parse_version('v3.11.0-rc.2')
+    assert isinstance(version, Version)
+    assert version.base_version == '3.11.0'
+    assert str(version) == '3.11.0rc2'
+    assert version == parse_version('3.11rc2')
+    assert hash(version) == hash(parse_version('3.11rc2'))
+    assert parse_version('1.0') == parse_version('1.0.0')
+    assert parse_version('1.0+abc-10') == parse_version('1.0+abc.10')
+    assert parse_version('1.0.6') != '1.0.6'
+
+
+@pytest.mark.parametrize(('version', 'base_version', 'string'), [
+    ('2.0.0.dev0', '2.0.0', '2.0.0.dev0'),
+    ('1.26.5.post1', '1.26.5', '1.26.5.post1'),
+    ('1.26.18+Local', '1.26.18', '1.26.18+local'),
+    ('3.11.0-0.el7', '3.11.0', '3.11.0-0.el7'),
+    ('1.0beta2', '1.0', '1.0b2'),
+])
+def test_version_suffixes(version, base_version, string):
+    parsed = parse_version(version)
+    assert parsed.base_version == base_version
+    assert str(parsed) == string
+    assert parsed == parse_version(string)
+
+
 @pytest.mark.parametrize(('version', 'valid'), [
     ('1.0.4', True),
     ('5.3', True),
@@ -512,6 +794,46 @@ def test_clone_git_repo_commit_failure(tmpdir, commit, branch, depth):
     assert 'Commit {} is not reachable in branch {}'.format(commit, branch) in str(exc)
 
 
+def _commit_history(repo_path, commits):
+    initialize_git_repo(repo_path)
+    for i in range(commits):
+        subprocess.check_call(['git', 'commit', '--allow-empty', '-m', str(i)], cwd=repo_path)
+    return subprocess.check_output(['git', 'rev-list', 'HEAD'], cwd=repo_path,
+                                   universal_newlines=True).split()
+
+
+@pytest.mark.parametrize('offset', [0, 1, 4])
+def test_clone_git_repo_commit_depth(tmpdir, offset):
+    repo_path = tmpdir.mkdir("repo").strpath
+    history = _commit_history(repo_path, 5)
+
+    repo_data = clone_git_repo('file://' + repo_path, os.path.join(str(tmpdir), 'clone'),
+                               commit=history[offset], branch='master')
+    assert repo_data.commit_id == history[offset]
+    assert repo_data.commit_depth == offset + 1
+
+
+@pytest.mark.parametrize('direct_fetch', [True, False])
+def test_clone_git_repo_shallow_fetch(tmpdir, direct_fetch):
+    repo_path = tmpdir.mkdir("repo").strpath
+    history = _commit_history(repo_path, 5)
+    commit = history[3]
+
+    if direct_fetch:
+        flexmock(osbs.utils).should_receive('_deepen_until_found').never()
+    else:
+        flexmock(osbs.utils).should_receive('_fetch_commit').and_return(False).once()
+
+    target_dir = os.path.join(str(tmpdir), 'clone')
+    repo_data = clone_git_repo('file://' + repo_path, target_dir, commit=commit,
+                               branch='master', depth=1)
+    assert repo_data.commit_id == commit
+    assert repo_data.commit_depth is None
+    head = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=target_dir,
+                                   universal_newlines=True).strip()
+    assert head == commit
+
+
 def test_clone_git_repo_total_failure(tmpdir):
     tmpdir_path = str(tmpdir.realpath())
     with pytest.raises(OsbsException) as exc:
@@ -534,20 +856,106 @@ def test_get_repo_info(tmpdir):
     assert info.configuration.container == {'compose': {'modules': ['n:s:v']}}
 
 
+@pytest.mark.parametrize('sparse', [True, False])
+def test_get_repo_info_sparse(tmpdir, sparse):
+    repo_path = tmpdir.mkdir("repo").strpath
+    with open(os.path.join(repo_path, 'Dockerfile'), 'w') as f:
+        f.write(dedent("""\
+            FROM fedora
+            LABEL name=bacon com.redhat.component=bacon version=1
+            """))
+    with open(os.path.join(repo_path, REPO_CONTAINER_CONFIG), 'w') as f:
+        f.write('tags: [spam]\n')
+
+    initialize_git_repo(repo_path, files=['Dockerfile', REPO_CONTAINER_CONFIG])
+    subprocess.check_call(['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=repo_path)
+
+    info = get_repo_info('file://' + repo_path, 'HEAD~1', git_branch='master', sparse=sparse)
+    assert info.labels.get_name_and_value(Labels.LABEL_TYPE_COMPONENT)[1] == 'bacon'
+    assert info.base_image == 'fedora'
+    assert info.additional_tags.tags == ['spam']
+    assert info.git_commit_depth == 2
+
+
+@pytest.mark.parametrize('partial_clone', [True, False])
+def test_clone_git_repo_sparse(tmpdir, partial_clone):
+    repo_path = tmpdir.mkdir("repo").strpath
+    os.mkdir(os.path.join(repo_path, 'sub'))
+    with open(os.path.join(repo_path, 'sub', 'Dockerfile.real'), 'w') as f:
+        f.write('FROM fedora\n')
+    os.symlink(os.path.join('sub', 'Dockerfile.real'), os.path.join(repo_path, 'Dockerfile'))
+    with open(os.path.join(repo_path, 'unrelated'), 'w') as f:
+        f.write('spam\n')
+
+    initialize_git_repo(repo_path, files=['sub/Dockerfile.real', 'Dockerfile', 'unrelated'])
+    subprocess.check_call(['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=repo_path)
+    head = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repo_path,
+                                   universal_newlines=True).strip()
+
+    # older git versions don't know --filter
+    (flexmock(osbs.utils)
+        .should_receive('git_supports_partial_clone')
+        .and_return(partial_clone))
+    commands = []
+    check_output = subprocess.check_output
+
+    def record_check_output(cmd, **kwargs):
+        commands.append(cmd)
+        return check_output(cmd, **kwargs)
+
+    flexmock(subprocess).should_receive('check_output').replace_with(record_check_output)
+
+    target_dir = os.path.join(str(tmpdir), 'clone')
+    repo_data = clone_git_repo('file://' + repo_path, target_dir, commit='HEAD',
+                               sparse_paths=['Dockerfile', REPO_CONTAINER_CONFIG])
+    assert repo_data.commit_id == head
+    assert repo_data.commit_depth == 1
+
+    # symlink target is checked out too, other files aren't
+    with open(os.path.join(target_dir, 'Dockerfile')) as f:
+        assert f.read() == 'FROM fedora\n'
+    assert not os.path.exists(os.path.join(target_dir, 'unrelated'))
+    assert not os.path.exists(os.path.join(target_dir, REPO_CONTAINER_CONFIG))
+
+    clone_cmd = [cmd for cmd in commands if cmd[:2] == ['git', 'clone']][0]
+    assert ('--filter=blob:none' in clone_cmd) is partial_clone
+
+
+@pytest.mark.parametrize(('output', 'expected'), [
+    ('git version 2.39.2\n', True),
+    ('git version 2.19.0.windows.1\n', True),
+    ('git version 2.18.4\n', False),
+    ('git version 1.8.3.1\n', False),
+    ('', False),
+])
+def test_git_supports_partial_clone(monkeypatch, output, expected):
+    monkeypatch.setattr(osbs.utils, '_git_supports_partial_clone', None)
+    (flexmock(subprocess)
+        .should_receive('check_output')
+        .with_args(['git', '--version'], universal_newlines=True)
+        .once()
+        .and_return(output))
+    assert osbs.utils.git_supports_partial_clone() is expected
+    # the version is only checked once
+    assert osbs.utils.git_supports_partial_clone() is expected
+
+
 def initialize_git_repo(rpath, files=None):
-    subprocess.Popen(['git', 'init', rpath])
-    subprocess.Popen(['git', 'config', 'user.name', '"Gerald Host"'], cwd=rpath)
-    subprocess.Popen(['git', 'config', 'user.email', '"ghost@example.com"'], cwd=rpath)
+    subprocess.check_call(['git', 'init', rpath])
+    subprocess.check_call(['git', 'config', 'user.name', '"Gerald Host"'], cwd=rpath)
+    subprocess.check_call(['git', 'config', 'user.email', '"ghost@example.com"'], cwd=rpath)
+    # make sure the default branch name doesn't depend on git configuration
+    subprocess.check_call(['git', 'symbolic-ref', 'HEAD', 'refs/heads/master'], cwd=rpath)
     first_commit_ref = None
     for f in files or []:
-        subprocess.Popen(['touch', f], cwd=rpath)
-        subprocess.Popen(['git', 'add', f], cwd=rpath)
-        subprocess.Popen(['git', 'commit', '-m', 'new file {0}'.format(f)], cwd=rpath)
+        subprocess.check_call(['touch', f], cwd=rpath)
+        subprocess.check_call(['git', 'add', f], cwd=rpath)
+        subprocess.check_call(['git', 'commit', '-m', 'new file {0}'.format(f)], cwd=rpath)
         if not first_commit_ref:
-            sleep(2)  # when rev-parse is called too early after first commit, it fails
-            first_commit_ref = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=rpath)
+            first_commit_ref = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=rpath,
+                                                       universal_newlines=True)
             first_commit_ref = first_commit_ref.strip()
-    subprocess.Popen(['git', 'commit', '--allow-empty', '-m', 'code additions'], cwd=rpath)
+    subprocess.check_call(['git', 'commit', '--allow-empty', '-m', 'code additions'], cwd=rpath)
     return first_commit_ref
 
 
@@ -9,10 +9,15 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import absolute_import
 
 from flexmock import flexmock
+from osbs.utils import yaml as osbs_yaml
 from osbs.utils.yaml import (read_yaml,
                              read_yaml_from_file_path,
                              load_schema,
-                             validate_with_schema)
+                             validate_with_schema,
+                             get_schema_validator,
+                             safe_dump,
+                             safe_load,
+                             SchemaValidator)
 
 
 from osbs.exceptions import OsbsValidationException
@@ -20,11 +25,17 @@ from osbs.exceptions import OsbsValidationException
 import json
 import jsonschema
 import os
-import pkg_resources
+import pkgutil
 import pytest
 import yaml
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    osbs_yaml._validators.clear()
+    osbs_yaml._results.clear()
+
+
 def test_read_yaml_file_ioerrors(tmpdir):
     config_path = os.path.join(str(tmpdir), 'nosuchfile.yaml')
     with pytest.raises(IOError):
@@ -60,15 +71,9 @@ def test_read_yaml_bad_package(caplog):
 
 
 def test_read_yaml_file_bad_extract(tmpdir, caplog):
-    class FakeProvider(object):
-        def get_resource_stream(self, pkg, rsc):
-            raise IOError
-
-    # pkg_resources.resource_stream() cannot be mocked directly
-    # Instead mock the module-level function it calls.
-    (flexmock(pkg_resources)
-        .should_receive('get_provider')
-        .and_return(FakeProvider()))
+    (flexmock(pkgutil)
+        .should_receive('get_data')
+        .and_raise(IOError))
 
     config_path = os.path.join(str(tmpdir), 'config.yaml')
     with open(config_path, 'w'):
@@ -81,7 +86,7 @@ def test_read_yaml_file_bad_extract(tmpdir, caplog):
 
 def test_read_yaml_file_bad_decode(tmpdir, caplog):
     (flexmock(json)
-        .should_receive('load')
+        .should_receive('loads')
         .and_raise(ValueError))
 
     config_path = os.path.join(str(tmpdir), 'config.yaml')
@@ -138,7 +143,7 @@ def test_load_schema_schema(schema, schema_pass, caplog):
     package = 'osbs'
     if not schema_pass:
         (flexmock(json)
-            .should_receive('load')
+            .should_receive('loads')
             .and_raise(ValueError))
         with pytest.raises(ValueError):
             load_schema(package, schema)
@@ -201,3 +206,110 @@ def test_validate_with_schema_bad_schema(caplog):
     with pytest.raises(jsonschema.SchemaError):
         validate_with_schema(config, schema)
     assert 'invalid schema, cannot validate' in caplog.text
+
+
+def test_read_yaml_cached():
+    config = 'compose: {modules: [mod_name:mod_stream]}'
+    output = read_yaml(config, 'schemas/container.json')
+
+    flexmock(osbs_yaml).should_receive('safe_load').never()
+    flexmock(osbs_yaml).should_receive('load_schema').never()
+    cached = read_yaml(config, 'schemas/container.json')
+    assert cached == output
+
+    # every caller gets its own copy
+    cached['compose']['modules'].append('spam')
+    assert read_yaml(config, 'schemas/container.json') == output
+
+
+def test_read_yaml_cached_validation_error():
+    config = 'spam: eggs'
+    with pytest.raises(OsbsValidationException) as exc_info:
+        read_yaml(config, 'schemas/container.json')
+
+    flexmock(osbs_yaml).should_receive('safe_load').never()
+    with pytest.raises(OsbsValidationException) as cached_exc_info:
+        read_yaml(config, 'schemas/container.json')
+    assert str(cached_exc_info.value) == str(exc_info.value)
+
+
+def test_get_schema_validator():
+    validator = get_schema_validator('osbs', 'schemas/container.json')
+    assert isinstance(validator, SchemaValidator)
+
+    flexmock(osbs_yaml).should_receive('load_schema').never()
+    assert get_schema_validator('osbs', 'schemas/container.json') is validator
+
+
+@pytest.mark.parametrize('fast_valid', [True, False])
+def test_schema_validator_fast_backend(monkeypatch, fast_valid):
+    class FakeFastJsonSchema(object):
+        class JsonSchemaException(Exception):
+            pass
+
+        @classmethod
+        def compile(cls, schema, use_default, use_formats):
+            assert schema['$schema'] == SchemaValidator.DRAFT4
+            assert not use_default
+
+            def validate(data):
+                if not fast_valid:
+                    raise cls.JsonSchemaException
+            return validate
+
+    monkeypatch.setattr(osbs_yaml, 'fastjsonschema', FakeFastJsonSchema)
+    schema = {'type': 'object', 'properties': {'name': {'type': 'string'}}}
+    validator = SchemaValidator(schema)
+
+    if fast_valid:
+        flexmock(jsonschema.Draft4Validator).should_receive('iter_errors').never()
+        validator.validate({'name': 'foo'})
+    else:
+        # data rejected by the fast backend are checked again by jsonschema
+        validator.validate({'name': 'foo'})
+        with pytest.raises(OsbsValidationException) as exc_info:
+            validator.validate({'name': 1})
+        assert "'type' has failed" in str(exc_info.value)
+
+
+YAML_SAMPLES = [
+    {
+        'version': 1,
+        'clusters': {'x86_64': [{'name': 'worker-01', 'max_concurrent_builds': 3}]},
+        'koji': {'hub_url': 'https://koji.example.com/hub', 'auth': {}},
+        'image_labels': {'vendor': 'Spam Inc.', 'authoritative-source-url': 'registry.com'},
+        'registries': [{'url': 'https://registry.example.com/v2', 'insecure': False}],
+        'long': ' '.join(['eggs'] * 50),
+        'special': ['2020-01-01', 'yes', ' lead', 'a: b', '# x', "it's", 'a\tb', '\U0001F600'],
+        'multiline': 'spam\n\neggs\n',
+        'k' * 200: [1, 2.5, None, True, [], {}],
+    },
+    [{'name': 'spam'}, {'name': 'eggs'}],
+    'spam',
+    1,
+    None,
+]
+
+
+@pytest.mark.parametrize('data', YAML_SAMPLES)
+@pytest.mark.parametrize('kwargs', [{}, {'default_flow_style': False}, {'allow_unicode': True}])
+@pytest.mark.parametrize('libyaml', [True, False])
+def test_safe_dump(monkeypatch, data, kwargs, libyaml):
+    if not libyaml:
+        monkeypatch.setattr(osbs_yaml, 'FastSafeDumper', yaml.SafeDumper)
+    expected = yaml.dump(data, Dumper=yaml.SafeDumper, **kwargs)
+    assert safe_dump(data, **kwargs) == expected
+    assert safe_load(expected) == data
+
+
+@pytest.mark.parametrize('libyaml', [True, False])
+def test_safe_load_error(monkeypatch, libyaml):
+    if not libyaml:
+        monkeypatch.setattr(osbs_yaml, 'FastSafeLoader', yaml.SafeLoader)
+    content = 'hallo: 1\nbye'
+
+    with pytest.raises(yaml.YAMLError) as expected:
+        yaml.load(content, Loader=yaml.SafeLoader)
+    with pytest.raises(yaml.YAMLError) as exc_info:
+        safe_load(content)
+    assert str(exc_info.value) == str(expected.value)
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+"""
+Copyright (c) 2020 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+Measure how long it takes to load and dump a reactor config
+with the pure Python YAML implementation and with libyaml
+
+    python tests/yaml-benchmark.py --clusters 20 --number 100
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from osbs.utils import yaml as osbs_yaml  # noqa: E402
+
+
+ARCHES = ['x86_64', 'ppc64le', 's390x', 'aarch64']
+
+
+def make_reactor_config(clusters):
+    """
+    :param clusters: int, number of worker clusters per platform
+    :return: dict, reactor config similar to production ones
+    """
+    return {
+        'version': 1,
+        'koji': {
+            'hub_url': 'https://koji.example.com/kojihub',
+            'root_url': 'https://koji.example.com/',
+            'auth': {'krb_principal': 'osbs@EXAMPLE.COM',
+                     'krb_keytab_path': 'FILE:/etc/osbs/keytab'},
+        },
+        'odcs': {
+            'api_url': 'https://odcs.example.com/api/1',
+            'auth': {'ssl_certs_dir': '/etc/osbs/odcs'},
+            'signing_intents': [
+                {'name': name, 'keys': keys}
+                for name, keys in (('release', ['R123', 'R234']), ('beta', ['R123', 'B456']),
+                                   ('unsigned', ['']))
+            ],
+            'default_signing_intent': 'release',
+        },
+        'smtp': {
+            'host': 'smtp.example.com',
+            'from_address': 'osbs@example.com',
+            'error_addresses': ['osbs-errors@example.com'],
+            'domain': 'example.com',
+            'send_to_submitter': True,
+            'send_to_pkg_owner': True,
+        },
+        'openshift': {
+            'url': 'https://openshift.example.com',
+            'auth': {'enable': True, 'krb_principal': 'osbs@EXAMPLE.COM'},
+            'insecure': False,
+            'build_json_dir': '/usr/share/osbs/',
+        },
+        'clusters': {
+            arch: [{'name': '{}-worker-{:02d}'.format(arch, index),
+                    'max_concurrent_builds': 4 + index % 3,
+                    'enabled': index % 5 != 0}
+                   for index in range(clusters)]
+            for arch in ARCHES
+        },
+        'platform_descriptors': [
+            {'platform': arch, 'architecture': arch.replace('x86_64', 'amd64'),
+             'enable_v1': False}
+            for arch in ARCHES
+        ],
+        'registries': [
+            {'url': 'https://registry-{}.example.com/v2'.format(index),
+             'auth': {'cfg_path': '/var/run/secrets/atomic-reactor/registry-{}'.format(index)},
+             'insecure': False}
+            for index in range(3)
+        ],
+        'source_registry': {'url': 'registry.example.com', 'insecure': False},
+        'sources_command': 'fedpkg sources',
+        'required_secrets': ['kojisecret', 'odcs-secret', 'v2-registry-dockercfg'],
+        'worker_token_secrets': ['x86-64-worker-token', 'ppc64le-worker-token'],
+        'image_labels': {
+            'vendor': 'Example, Inc.',
+            'authoritative-source-url': 'registry.example.com',
+            'distribution-scope': 'public',
+        },
+        'image_label_info_url_format': 'https://catalog.example.com/{name}/{version}-{release}',
+        'image_equal_labels': [['description', 'io.k8s.description']],
+        'content_versions': ['v1', 'v2'],
+        'group_manifests': True,
+        'prefer_schema1_digest': False,
+        'build_image_override': {arch: 'registry.example.com/buildroot-{}:latest'.format(arch)
+                                 for arch in ARCHES},
+        'skip_koji_check_for_base_image': False,
+        'deep_manifest_list_inspection': True,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-3])
+    parser.add_argument('--clusters', type=int, default=20,
+                        help='number of worker clusters per platform')
+    parser.add_argument('--number', type=int, default=100,
+                        help='number of executions of each statement')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of repetitions, best one is reported')
+    args = parser.parse_args()
+
+    reactor_config = make_reactor_config(args.clusters)
+    content = yaml.safe_dump(reactor_config)
+    print('reactor config: {} bytes, libyaml {}'.format(
+        len(content), 'available' if yaml.__with_libyaml__ else 'not available'))
+    assert osbs_yaml.safe_dump(reactor_config) == content
+    assert osbs_yaml.safe_load(content) == reactor_config
+
+    statements = [
+        ('yaml.safe_load', lambda: yaml.safe_load(content)),
+        ('osbs safe_load', lambda: osbs_yaml.safe_load(content)),
+        ('yaml.safe_dump', lambda: yaml.safe_dump(reactor_config)),
+        ('osbs safe_dump', lambda: osbs_yaml.safe_dump(reactor_config)),
+    ]
+    for name, statement in statements:
+        best = min(timeit.repeat(statement, number=args.number, repeat=args.repeat))
+        print('{:20} {:8.1f} us per loop'.format(name, best / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()